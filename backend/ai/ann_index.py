@@ -0,0 +1,326 @@
+"""
+Configurable FAISS index types for the vector store
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Maps the stored vectors (flat codes, IVF lists, HNSW storage) instead of
+# reading them; FAISS before 1.11 does not have it
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+
+
+class AnnIndexConfig:
+    """
+    Which FAISS index the vector store uses and how it is tuned
+
+    Index types:
+        flat: Exact brute-force search (IndexFlatL2)
+        ivf:  Inverted lists over k-means cells (IndexIVFFlat), needs training;
+              ``nprobe`` cells are scanned per query
+        hnsw: Graph-based search (IndexHNSWFlat); ``ef_search`` sets the
+              candidate list size per query
+
+    A store always starts flat. Once it holds ``migrate_threshold`` vectors it
+    is rebuilt as the configured type, so small stores stay exact and IVF has
+    enough vectors to train on.
+    """
+
+    INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+    def __init__(
+        self,
+        index_type: str = "flat",
+        nlist: int = 1024,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        migrate_threshold: int = 100000
+    ):
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}, expected one of {self.INDEX_TYPES}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.migrate_threshold = migrate_threshold
+
+    def create_flat(self, dimension: int) -> faiss.Index:
+        """Empty exact index every store starts with"""
+        # Use L2 distance (Euclidean)
+        return faiss.IndexFlatL2(dimension)
+
+    def build(self, dimension: int, vectors: np.ndarray) -> faiss.Index:
+        """
+        Build the configured index type over ``vectors``
+
+        IVF is trained on the same vectors before they are added.
+        """
+        if self.index_type == "ivf":
+            # Cap the cell count so every cell gets some training vectors
+            nlist = max(1, min(self.nlist, len(vectors) // 39))
+            quantizer = faiss.IndexFlatL2(dimension)
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_L2)
+            index.train(vectors)
+        elif self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, self.hnsw_m)
+            index.hnsw.efConstruction = self.ef_construction
+        else:
+            index = self.create_flat(dimension)
+
+        index.add(vectors)
+        self.apply_search_params(index)
+        return index
+
+    def apply_search_params(self, index):
+        """Set query-time knobs (not all of them survive write/read_index)"""
+        if isinstance(index, MappedIndex):
+            index = index.base
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = self.nprobe
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.ef_search
+
+    def search_parameters(self, index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        """Per-query parameters restricting a search to ``selector``'s ids"""
+        if isinstance(index, MappedIndex):
+            index = index.base
+        if faiss.try_extract_index_ivf(index) is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def should_migrate(self, index) -> bool:
+        """Whether a flat index has grown enough to switch to the configured type"""
+        return (
+            self.index_type != "flat"
+            and describe_index(index) == "flat"
+            and index.ntotal >= self.migrate_threshold
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index_type": self.index_type,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "hnsw_m": self.hnsw_m,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "migrate_threshold": self.migrate_threshold
+        }
+
+
+class MappedIndex:
+    """
+    A memory-mapped snapshot plus an in-memory index of the vectors added since
+
+    FAISS serves a mapped index straight from the file: opening it costs no
+    reads, pages are faulted in by the searches that touch them and, being
+    page cache, are shared by every process mapping the same snapshot. A
+    mapped index cannot grow (``add`` aborts the process), so added vectors
+    go to ``delta``, an exact index whose ids continue after the snapshot's.
+    Searches query both and merge the hits.
+
+    Implements the part of the faiss.Index interface the vector store uses;
+    the module's helpers (describe_index, reconstruct_all, ...) accept it.
+    """
+
+    def __init__(self, path: str, base: faiss.Index):
+        self.path = path
+        self.base = base
+        self.d = base.d
+        self.metric_type = base.metric_type
+        # Ids of the delta are global, so id selectors work unchanged on both
+        self.delta = faiss.IndexIDMap(faiss.IndexFlat(base.d, base.metric_type))
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal + self.delta.ntotal
+
+    def add(self, vectors: np.ndarray):
+        if len(vectors):
+            ids = np.arange(self.ntotal, self.ntotal + len(vectors), dtype="int64")
+            self.delta.add_with_ids(vectors, ids)
+
+    def search(self, queries: np.ndarray, k: int, params: Optional[faiss.SearchParameters] = None):
+        distances, indices = self.base.search(queries, k, params=params)
+        if not self.delta.ntotal:
+            return distances, indices
+
+        # The delta is flat: only the selector of type-specific parameters applies
+        delta_params = faiss.SearchParameters(sel=params.sel) if params is not None and params.sel is not None else None
+        delta_distances, delta_indices = self.delta.search(queries, min(k, self.delta.ntotal), params=delta_params)
+        distances = np.hstack([distances, delta_distances])
+        indices = np.hstack([indices, delta_indices])
+        order = -distances if self.metric_type == faiss.METRIC_INNER_PRODUCT else distances.copy()
+        order[indices < 0] = np.inf
+        top = np.argsort(order, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, top, axis=1), np.take_along_axis(indices, top, axis=1)
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        split = self.base.ntotal
+        parts = []
+        if start < split:
+            _ensure_direct_map(self.base)
+            parts.append(self.base.reconstruct_n(start, min(count, split - start)))
+        end = start + count
+        if end > split:
+            delta_start = max(start, split) - split
+            parts.append(faiss.downcast_index(self.delta.index).reconstruct_n(delta_start, end - split - delta_start))
+        return np.vstack(parts) if parts else np.zeros((0, self.d), dtype="float32")
+
+    def copy(self) -> faiss.Index:
+        """An in-memory index with the same vectors, e.g. to write a new snapshot"""
+        index = faiss.read_index(self.path)
+        index.add(self.reconstruct_n(self.base.ntotal, self.delta.ntotal))
+        return index
+
+
+def read_index(path: str, mmap: bool = False):
+    """
+    Read an index file
+
+    Args:
+        path: Index written by faiss.write_index
+        mmap: Map the file instead of reading it (see MappedIndex); falls
+            back to reading where FAISS cannot map it
+
+    Returns:
+        faiss.Index, or MappedIndex when mapped
+    """
+    if mmap and MMAP_FLAGS is not None:
+        try:
+            return MappedIndex(path, faiss.read_index(path, MMAP_FLAGS))
+        except RuntimeError as e:
+            logger.warning(f"Cannot map {path}, reading it instead: {e}")
+    return faiss.read_index(path)
+
+
+def clone_index(index) -> faiss.Index:
+    """In-memory copy of an index that later writes to it do not change"""
+    if isinstance(index, MappedIndex):
+        return index.copy()
+    return faiss.clone_index(index)
+
+
+def describe_index(index) -> Optional[str]:
+    """Index type name as used by AnnIndexConfig"""
+    if index is None:
+        return None
+    if isinstance(index, MappedIndex):
+        return describe_index(index.base)
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    return type(index).__name__
+
+
+def index_memory_bytes(index) -> int:
+    """Approximate heap memory held by an index: its vectors plus the search structure"""
+    if index is None:
+        return 0
+    if isinstance(index, MappedIndex):
+        return index.delta.ntotal * (index.d * 4 + 8)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # Codes and ids in the inverted lists, plus the coarse centroids
+        return index.ntotal * (ivf.code_size + 8) + ivf.nlist * index.d * 4
+    if isinstance(index, faiss.IndexHNSW):
+        hnsw = index.hnsw
+        return index.ntotal * index.d * 4 + hnsw.neighbors.size() * 4 + hnsw.offsets.size() * 8 + hnsw.levels.size() * 4
+    return index.ntotal * index.d * 4
+
+
+def mapped_bytes(index) -> int:
+    """Approximate size of the part of an index served from a mapped file"""
+    if isinstance(index, MappedIndex):
+        return index_memory_bytes(index.base)
+    return 0
+
+
+def reconstruct_all(index, start: int = 0) -> np.ndarray:
+    """Copy the stored vectors from ``start`` onwards out of an index"""
+    count = index.ntotal - start
+    if count <= 0:
+        return np.zeros((0, index.d), dtype="float32")
+    if not isinstance(index, MappedIndex):
+        _ensure_direct_map(index)
+    return index.reconstruct_n(start, count)
+
+
+def _ensure_direct_map(index: faiss.Index):
+    """IVF indexes need an id -> list map before vectors can be reconstructed"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def id_selector(ids: np.ndarray) -> faiss.IDSelector:
+    """
+    Selector over a set of ids
+
+    The caller must keep ``ids`` alive while the selector is in use.
+    """
+    return faiss.IDSelectorBatch(ids.size, faiss.swig_ptr(ids))
+
+
+def excluding_selector(ids: np.ndarray) -> faiss.IDSelector:
+    """
+    Selector over every id except ``ids``
+
+    The caller must keep ``ids`` alive while the selector is in use.
+    """
+    inner = id_selector(ids)
+    selector = faiss.IDSelectorNot(inner)
+    # IDSelectorNot does not own ``inner``
+    selector.referenced_objects = [inner]
+    return selector
+
+
+def gather_vectors(index, ids: np.ndarray) -> np.ndarray:
+    """Stored vectors for ``ids``, without copying the whole index"""
+    if isinstance(index, MappedIndex):
+        split = index.base.ntotal
+        vectors = np.empty((len(ids), index.d), dtype="float32")
+        in_base = ids < split
+        vectors[in_base] = gather_vectors(index.base, ids[in_base])
+        delta = faiss.downcast_index(index.delta.index)
+        vectors[~in_base] = gather_vectors(delta, ids[~in_base] - split)
+        return vectors
+    storage = faiss.downcast_index(index.storage) if isinstance(index, faiss.IndexHNSW) else index
+    if isinstance(storage, faiss.IndexFlat):
+        flat = storage.ntotal * storage.d
+        vectors = faiss.rev_swig_ptr(storage.get_xb(), flat).reshape(storage.ntotal, storage.d)
+        return vectors[ids]
+    if not len(ids):
+        return np.zeros((0, index.d), dtype="float32")
+    _ensure_direct_map(index)
+    # One call into FAISS rather than one per id
+    return index.reconstruct_batch(np.ascontiguousarray(ids, dtype="int64"))
+
+
+def exact_search(index, query: np.ndarray, ids: np.ndarray, k: int):
+    """
+    Brute-force L2 search restricted to ``ids``
+
+    Returns (distances, indices) shaped like ``index.search`` for one query.
+    """
+    vectors = gather_vectors(index, ids)
+    distances = ((vectors - query[0]) ** 2).sum(axis=1)
+    k = min(k, len(ids))
+    top = np.argpartition(distances, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+    top = top[np.argsort(distances[top], kind="stable")]
+    return distances[top][None, :].astype("float32"), ids[top][None, :]
@@ -0,0 +1,227 @@
+"""
+Dynamic micro-batching for summarization requests
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai import metrics, profiling
+from ai.executors import DeadlineExceededError, InferencePool, PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryBatcher:
+    """
+    Collects concurrent summarize requests and runs them as one padded batch
+
+    Requests are queued and a single worker drains the queue: it waits up to
+    ``max_wait_ms`` after the first pending request (or until ``max_batch_size``
+    requests are waiting), then runs everything it collected through
+    ``ConversationSummarizer.summarize_batch``. Requests arriving while a batch
+    is running pile up and form the next batch.
+
+    Batches run on ``pool`` when one is given so generation never blocks the
+    event loop. ``max_queue_size`` bounds the number of waiting requests and
+    ``timeout`` is the per-request deadline; requests that expire while queued
+    are dropped from their batch.
+    """
+
+    def __init__(
+        self,
+        summarizer,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        pool: Optional[InferencePool] = None,
+        max_queue_size: int = 0,
+        timeout: Optional[float] = None,
+        stats_window: int = 1000
+    ):
+        self.summarizer = summarizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.pool = pool
+        self.max_queue_size = max(0, max_queue_size)
+        self.timeout = timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Stats
+        self._batches = 0
+        self._requests = 0
+        self._max_batch_size_seen = 0
+        self._batch_size_counts: Dict[int, int] = {}
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._recent_waits = deque(maxlen=stats_window)
+
+    async def submit(self, text: str, max_length: int = 150, min_length: int = 30) -> str:
+        """
+        Queue a text for summarization and wait for its summary
+
+        Args:
+            text: Input conversation text
+            max_length: Maximum length of summary
+            min_length: Minimum length of summary
+
+        Returns:
+            Summarized text
+
+        Raises:
+            PoolSaturatedError: Too many requests are already waiting
+            DeadlineExceededError: No summary was produced before the deadline
+        """
+        self._ensure_worker()
+        if self.max_queue_size and self._queue.qsize() >= self.max_queue_size:
+            raise PoolSaturatedError("summarizer queue is saturated, retry later")
+
+        future = asyncio.get_running_loop().create_future()
+        # The request's context, to hand it the batch's stage timings and profile
+        context = contextvars.copy_context()
+        self._queue.put_nowait((text, max_length, min_length, time.perf_counter(), future, context))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(f"summarizer request exceeded {self.timeout}s deadline")
+
+    def _ensure_worker(self):
+        """Start the batching worker on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # A fresh context: the worker outlives the request that started
+            # it and must not record into that request's stage timings
+            self._worker = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run())
+
+    async def close(self):
+        """Stop the batching worker"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Drain anything that is already waiting, up to the batch limit
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            await self._process(batch)
+
+    async def _process(self, batch: List[Tuple[Any, ...]]):
+        # Skip requests whose caller already gave up
+        batch = [item for item in batch if not item[4].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        self._record_batch(len(batch), [started - item[3] for item in batch])
+
+        # Generation kwargs are per pipeline call, so group by them
+        groups: Dict[Tuple[int, int], List[Tuple[Any, ...]]] = {}
+        for item in batch:
+            groups.setdefault((item[1], item[2]), []).append(item)
+
+        for (max_length, min_length), items in groups.items():
+            texts = [item[0] for item in items]
+            stages, token = metrics.begin_request()
+            # Sample the batch as part of every slow request waiting for it
+            profiles = {profile for item in items for profile in item[5].run(profiling.current_profiles)}
+            try:
+                with profiling.activate(profiles):
+                    summaries = await self._execute(texts, max_length, min_length)
+            except Exception as e:
+                logger.error(f"Error in batched summarization: {e}")
+                for item in items:
+                    if not item[4].done():
+                        item[4].set_exception(e)
+                continue
+            finally:
+                metrics.end_request(token)
+                # Every request in the batch waited for all of it
+                for item in items:
+                    item[5].run(metrics.merge_stages, stages)
+
+            for item, summary in zip(items, summaries):
+                if not item[4].done():
+                    item[4].set_result(summary)
+
+        logger.debug(
+            f"Summarized batch of {len(batch)} in {time.perf_counter() - started:.3f}s"
+        )
+
+    async def _execute(self, texts: List[str], max_length: int, min_length: int) -> List[str]:
+        if self.pool is not None:
+            # Per-request deadlines are enforced in submit(), not per batch
+            return await self.pool.run(self._summarize_batch, texts, max_length, min_length, timeout=0)
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            self._summarize_batch,
+            texts,
+            max_length,
+            min_length
+        )
+
+    def _summarize_batch(self, texts: List[str], max_length: int, min_length: int) -> List[str]:
+        return self.summarizer.summarize_batch(
+            texts,
+            max_length=max_length,
+            min_length=min_length
+        )
+
+    def _record_batch(self, size: int, waits: List[float]):
+        self._batches += 1
+        self._requests += size
+        self._max_batch_size_seen = max(self._max_batch_size_seen, size)
+        self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+        self._total_wait += sum(waits)
+        self._max_wait_seen = max(self._max_wait_seen, max(waits))
+        self._recent_waits.extend(waits)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batch size and queue wait statistics"""
+        recent = sorted(self._recent_waits)
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))]
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self._batches,
+            "requests": self._requests,
+            "max_queue_size": self.max_queue_size,
+            "timeout": self.timeout,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+            "max_batch_size_seen": self._max_batch_size_seen,
+            "batch_size_histogram": {
+                str(size): count for size, count in sorted(self._batch_size_counts.items())
+            },
+            "avg_queue_wait_ms": round(self._total_wait / self._requests * 1000.0, 3) if self._requests else 0.0,
+            "p50_queue_wait_ms": round(percentile(0.50) * 1000.0, 3),
+            "p95_queue_wait_ms": round(percentile(0.95) * 1000.0, 3),
+            "max_queue_wait_ms": round(self._max_wait_seen * 1000.0, 3)
+        }
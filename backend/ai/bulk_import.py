@@ -0,0 +1,460 @@
+"""
+Streaming bulk import of message history into the vector store
+
+Reads NDJSON (one message or Matrix event per line) or a Matrix room export
+(Element's JSON export: an object whose ``messages`` array holds the room's
+events) a block at a time and stores the messages ``chunk_size`` at a time.
+Each chunk is encoded in length-sorted batches and added with one
+``VectorStore.add_batch``, so memory stays at one read block plus one chunk
+however large the file is.
+
+After every chunk a checkpoint records how many input records are stored
+(and, for NDJSON, the byte offset after them). Running the same import
+again with its checkpoint skips those records. Messages are upserted by
+id, so a chunk that was cut off half way is simply stored again.
+"""
+
+import codecs
+import json
+import logging
+import os
+import queue
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ai.ingestion import length_sorted
+from ai.persistence import atomic_write
+from ai.vector_store import message_id
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "matrix")
+BLOCK_SIZE = 1 << 16
+# Matrix caps events at 64KB; a record this much larger is malformed, and
+# reading on to find its end would hold the rest of the file in memory
+MAX_RECORD_SIZE = 4 * BLOCK_SIZE
+
+# Import ids name checkpoint files
+IMPORT_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+_WHITESPACE = re.compile(r"\s*")
+
+# (byte offset after the record or None, record)
+Record = Tuple[Optional[int], Dict[str, Any]]
+
+
+def iter_ndjson(stream, offset: int = 0) -> Iterator[Record]:
+    """
+    Records of an NDJSON stream, one per non-empty line
+
+    Lines that are not JSON objects are yielded as ``{}`` so record numbers
+    stay stable between runs.
+
+    Args:
+        stream: Binary file object (``read(size)``)
+        offset: Byte offset ``stream`` starts at, to report absolute offsets
+
+    Raises:
+        ValueError: A line is longer than MAX_RECORD_SIZE
+    """
+    pending = b""
+    while True:
+        block = stream.read(BLOCK_SIZE)
+        lines = (pending + block).split(b"\n")
+        # The last piece is incomplete until the stream ends
+        pending = lines.pop() if block else b""
+        if len(pending) > MAX_RECORD_SIZE:
+            raise ValueError(f"NDJSON line at byte {offset} is longer than {MAX_RECORD_SIZE} bytes")
+        for number, line in enumerate(lines):
+            # The stream's last line may have no newline
+            offset += len(line) + (1 if block or number < len(lines) - 1 else 0)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield offset, record if isinstance(record, dict) else {}
+        if not block:
+            return
+
+
+class _JsonReader:
+    """Incremental scanner over a JSON text read a block at a time"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        block = self.stream.read(BLOCK_SIZE)
+        if not block:
+            self.eof = True
+            self.text += self.decoder.decode(b"", final=True)
+            return True
+        # Drop what was consumed before growing the buffer
+        self.text = self.text[self.pos:] + self.decoder.decode(block)
+        self.pos = 0
+        return True
+
+    def peek(self) -> Optional[str]:
+        """Next character after whitespace, without consuming it; None at the end"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in Matrix export, found {self.peek()!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next JSON value (at most MAX_RECORD_SIZE characters)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.text, self.pos)
+                # A number cut off by the block boundary still decodes
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof or len(self.text) - self.pos > MAX_RECORD_SIZE:
+                    raise
+            self._fill()
+
+
+def iter_matrix_export(stream, info: Optional[Dict[str, Any]] = None) -> Iterator[Record]:
+    """
+    Events of a Matrix room export, decoded one at a time
+
+    Args:
+        stream: Binary file object holding the export
+        info: Filled with the export's other top-level fields (room_name, ...)
+            as they are read
+    """
+    info = {} if info is None else info
+    reader = _JsonReader(stream)
+    reader.expect("{")
+    while True:
+        char = reader.peek()
+        if char == "}" or char is None:
+            return
+        if char == ",":
+            reader.pos += 1
+            continue
+        key = reader.value()
+        reader.expect(":")
+        if key != "messages":
+            info[key] = reader.value()
+            continue
+        reader.expect("[")
+        while True:
+            char = reader.peek()
+            if char == "]":
+                reader.pos += 1
+                break
+            if char == ",":
+                reader.pos += 1
+                continue
+            if char is None:
+                raise ValueError("Matrix export ends inside its messages")
+            event = reader.value()
+            yield None, event if isinstance(event, dict) else {}
+
+
+def _scalar(value: Any) -> Optional[str]:
+    """``value`` as a string if it is a string or number, else None"""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    return str(value)
+
+
+def message_from_record(record: Dict[str, Any], room_id: Optional[str] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    (conversation_id, message) of an input record
+
+    Accepts Matrix events (``type``, ``content.body``, ``sender``) and flat
+    messages (``body``, ``user_id``, as benchmarks.corpus writes them).
+    Records without an id get one from ``vector_store.message_id``, hashed
+    from their room, sender, time and body, so re-importing them upserts
+    instead of duplicating, and records of other files do not overwrite them.
+
+    Args:
+        record: Decoded record
+        room_id: Conversation of records that do not name one
+
+    Returns:
+        None for anything that is not a text message
+    """
+    if "content" in record or "type" in record:
+        content = record.get("content")
+        if record.get("type", "m.room.message") != "m.room.message" or not isinstance(content, dict):
+            return None
+        body = content.get("body")
+        user_id = record.get("sender")
+    else:
+        body = record.get("body")
+        user_id = record.get("user_id") or record.get("sender")
+    conversation_id = _scalar(record.get("room_id") or record.get("conversation_id") or room_id)
+    if not isinstance(body, str) or not body.strip() or not conversation_id:
+        return None
+    user_id = _scalar(user_id) or ""
+    timestamp = record.get("origin_server_ts") or record.get("timestamp")
+    timestamp = timestamp if _scalar(timestamp) is not None else None
+    message = {
+        "id": _scalar(record.get("event_id") or record.get("id")),
+        "body": body,
+        "user_id": user_id,
+        "timestamp": timestamp
+    }
+    message["id"] = message_id(conversation_id, message)
+    return conversation_id, message
+
+
+class ImportCheckpoint:
+    """
+    Progress of one import, saved as JSON after every stored chunk
+
+    Without a path the state is kept in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None, import_id: Optional[str] = None):
+        self.path = path
+        self.state: Dict[str, Any] = {
+            "import_id": import_id,
+            "status": "new",
+            "format": None,
+            "records": 0,
+            "bytes": 0,
+            "messages_stored": 0,
+            "records_skipped": 0,
+            "error": None,
+            "started_at": None,
+            "updated_at": None
+        }
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as f:
+                self.state.update(json.load(f))
+
+    @classmethod
+    def for_import(cls, directory: str, import_id: str) -> "ImportCheckpoint":
+        """Checkpoint of ``import_id`` under ``directory`` (e.g. <store>/imports)"""
+        if not IMPORT_ID_RE.match(import_id):
+            raise ValueError(f"Invalid import id {import_id!r}: use up to 128 letters, digits, '.', '_' or '-'")
+        os.makedirs(directory, exist_ok=True)
+        return cls(os.path.join(directory, f"{import_id}.json"), import_id)
+
+    def update(self, **values):
+        self.state.update(values, updated_at=round(time.time(), 3))
+        if self.path is not None:
+            atomic_write(self.path, lambda f: json.dump(self.state, f), mode="w")
+
+
+class BulkImporter:
+    """
+    Stores a stream of messages into a vector store in fixed-size chunks
+
+    Args:
+        vector_store: Store the messages go to
+        chunk_size: Messages per chunk: one add_batch, one segment and one
+            checkpoint each
+        encode_batch_size: Texts per encoder call within a chunk
+        encode: Called instead of ``vector_store.encode`` (e.g. to run on a pool)
+        add_batch: Called instead of ``vector_store.add_batch``
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        chunk_size: int = 1000,
+        encode_batch_size: int = 64,
+        encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+        add_batch: Optional[Callable[[List[Tuple]], List[int]]] = None
+    ):
+        self.vector_store = vector_store
+        self.chunk_size = max(1, chunk_size)
+        self.encode_batch_size = max(1, encode_batch_size)
+        self.encode = encode or vector_store.encode
+        self.add_batch = add_batch or vector_store.add_batch
+
+    def run(
+        self,
+        stream,
+        format: str = "ndjson",
+        checkpoint: Optional[ImportCheckpoint] = None,
+        room_id: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Import ``stream``, resuming after the records ``checkpoint`` has stored
+
+        Args:
+            stream: Binary file object; a seekable NDJSON file is resumed by
+                seeking, anything else by skipping records
+            format: "ndjson" or "matrix"
+            checkpoint: Progress to resume from and update (default: none)
+            room_id: Conversation of records that do not name one (default
+                for exports: their room_id or room_name)
+            progress: Called with the checkpoint state after every chunk
+
+        Returns:
+            Final checkpoint state
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unknown import format {format!r}, expected one of {FORMATS}")
+        checkpoint = checkpoint or ImportCheckpoint()
+        state = checkpoint.state
+        done_records = state["records"] if state["status"] != "done" else 0
+        if state["status"] == "done":
+            # Importing a finished id again starts over
+            checkpoint.update(records=0, bytes=0, messages_stored=0, records_skipped=0, started_at=None)
+        checkpoint.update(status="running", format=format, error=None, started_at=state["started_at"] or round(time.time(), 3))
+
+        info: Dict[str, Any] = {}
+        skip = done_records
+        if format == "ndjson":
+            offset = 0
+            if done_records and state["bytes"] and _seekable(stream):
+                stream.seek(state["bytes"])
+                offset, skip = state["bytes"], 0
+            records = iter_ndjson(stream, offset)
+        else:
+            records = iter_matrix_export(stream, info)
+
+        chunk: List[Tuple[str, Dict[str, Any]]] = []
+        skipped = 0
+        number = done_records - skip
+        end = state["bytes"] if not skip else None
+        try:
+            for end, record in records:
+                number += 1
+                if number <= done_records:
+                    continue
+                message = message_from_record(record, room_id or info.get("room_id") or info.get("room_name"))
+                if message is None:
+                    skipped += 1
+                else:
+                    chunk.append(message)
+                if len(chunk) >= self.chunk_size:
+                    self._store(chunk, skipped, checkpoint, number, end, progress)
+                    chunk, skipped = [], 0
+            if chunk:
+                self._store(chunk, skipped, checkpoint, number, end, progress)
+                skipped = 0
+        except Exception as e:
+            checkpoint.update(status="failed", error=str(e))
+            raise
+        checkpoint.update(
+            status="done",
+            records=number,
+            bytes=end if end is not None else state["bytes"],
+            records_skipped=state["records_skipped"] + skipped
+        )
+        logger.info(f"Imported {state['messages_stored']} messages from {number} records")
+        return dict(state)
+
+    def _store(self, chunk, skipped: int, checkpoint: ImportCheckpoint, records: int, end: Optional[int], progress):
+        """Encode and add one chunk, then move the checkpoint past it and the ``skipped`` records among it"""
+        conversations: Dict[str, List[Dict[str, Any]]] = {}
+        for conversation_id, message in chunk:
+            conversations.setdefault(conversation_id, []).append(message)
+        texts = [message["body"] for messages in conversations.values() for message in messages]
+
+        embeddings = None
+        for positions in length_sorted(texts, self.encode_batch_size):
+            vectors = self.encode([texts[position] for position in positions])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype="float32")
+            embeddings[positions] = vectors
+
+        entries = []
+        start = 0
+        for conversation_id, messages in conversations.items():
+            entries.append((conversation_id, messages, embeddings[start:start + len(messages)], None))
+            start += len(messages)
+        stored = sum(self.add_batch(entries))
+
+        state = checkpoint.state
+        checkpoint.update(
+            records=records,
+            # Matrix exports have no record offsets; they resume by skipping
+            bytes=end if end is not None else state["bytes"],
+            messages_stored=state["messages_stored"] + stored,
+            records_skipped=state["records_skipped"] + skipped
+        )
+        if progress is not None:
+            progress(dict(state))
+
+
+def _seekable(stream) -> bool:
+    try:
+        return stream.seekable()
+    except AttributeError:
+        return False
+
+
+class StreamReader:
+    """
+    Binary file object fed from another thread, e.g. an upload's body
+
+    Holds at most ``max_blocks`` blocks: ``put`` waits while the importer
+    is behind, so a fast upload cannot fill memory.
+    """
+
+    def __init__(self, max_blocks: int = 16):
+        self._blocks: queue.Queue = queue.Queue(maxsize=max(1, max_blocks))
+        self._buffer = b""
+        self._ended = False
+        self.error: Optional[str] = None
+        self.closed = False
+
+    def put(self, data: bytes) -> bool:
+        """Queue a block (b"" ends the stream); False once the reader is closed"""
+        while not self.closed:
+            try:
+                self._blocks.put(data, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fail(self, error: str):
+        """Make the reading side raise IOError instead of seeing the end of the stream"""
+        self.error = error
+
+    def close(self):
+        """Stop accepting blocks; a put() waiting for room gives up"""
+        self.closed = True
+
+    def _next_block(self) -> bytes:
+        while True:
+            if self.error is not None:
+                raise IOError(self.error)
+            try:
+                return self._blocks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._ended and (size < 0 or not self._buffer):
+            block = self._next_block()
+            if not block:
+                self._ended = True
+            self._buffer += block
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
@@ -0,0 +1,273 @@
+"""
+Incrementally maintained per-user, per-day report aggregates
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ai.metadata_store import timestamp_ms
+
+logger = logging.getLogger(__name__)
+
+
+def key_insights(total_messages: int, intent_distribution: Dict[str, int]) -> List[str]:
+    """Rule-based insights shown in a daily report"""
+    insights = []
+    if total_messages > 50:
+        insights.append("High message volume detected - may need attention")
+    if intent_distribution.get("complaint", 0) > 0:
+        insights.append(f"{intent_distribution['complaint']} complaint(s) require follow-up")
+    if intent_distribution.get("question", 0) > 5:
+        insights.append("Multiple questions detected - consider FAQ or documentation")
+    if not insights:
+        insights.append("Normal activity level")
+    return insights
+
+
+def message_date(message: Dict[str, Any]) -> Optional[str]:
+    """UTC date (YYYY-MM-DD) a message was sent on, from its timestamp"""
+    ms = timestamp_ms(message.get("timestamp") or message.get("origin_server_ts"))
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).date().isoformat()
+
+
+def parse_day(value: Any) -> Optional[date]:
+    """The date of a YYYY-MM-DD string, or None if it is not one"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+class DailyAggregate:
+    """
+    Running report state for one user and day
+
+    Counts, the intent distribution and a bounded min-heap of the top
+    messages are updated per ingested batch. Message texts wait in
+    ``pending`` until the next report summarizes them into one more entry of
+    ``partials``.
+    """
+
+    def __init__(self):
+        self.conversations: Set[str] = set()
+        self.total_messages = 0
+        self.intents: Counter = Counter()
+        # (score, -seq, message): the smallest entry is evicted first, and
+        # among equal scores the later message, matching rank()'s stable order
+        self.top: List[Tuple[float, int, Dict[str, Any]]] = []
+        self.seq = 0
+        self.seen: Set[Tuple[str, str]] = set()
+        self.pending: List[str] = []
+        self.partials: List[str] = []
+        self.summary: Optional[str] = None
+        self.lock = threading.Lock()
+        # Serializes summarization so concurrent reports see every partial
+        self.summary_lock = threading.Lock()
+
+
+class DailyReportAggregator:
+    """
+    Per-user, per-day report aggregates kept up to date at ingestion
+
+    ``ingest`` does the cheap per-message work (intent parsing and priority
+    scoring) as messages arrive. ``report`` only summarizes the texts that
+    arrived since the previous report and combines the partial summaries, so
+    its cost follows the new messages rather than the whole day. Priority
+    scores, including their recency component, are taken at ingestion.
+    Aggregates live in memory for ``retention_days`` days.
+    """
+
+    def __init__(
+        self,
+        intent_parser,
+        prioritizer,
+        summarizer,
+        top_n: int = 5,
+        max_partials: int = 8,
+        retention_days: int = 7
+    ):
+        """
+        Args:
+            intent_parser: IntentParser used at ingestion
+            prioritizer: MessagePrioritizer used at ingestion
+            summarizer: ConversationSummarizer used by report()
+            top_n: Priority messages kept per day
+            max_partials: Partial summaries kept before they are folded into
+                the current summary
+            retention_days: Days of aggregates kept, counted back from the
+                newest day seen
+        """
+        self.intent_parser = intent_parser
+        self.prioritizer = prioritizer
+        self.summarizer = summarizer
+        self.top_n = top_n
+        self.max_partials = max_partials
+        self.retention_days = retention_days
+        self._aggregates: Dict[Tuple[str, str], DailyAggregate] = {}
+        self._lock = threading.Lock()
+
+    def _aggregate(self, user_id: str, date: str, create: bool = False) -> Optional[DailyAggregate]:
+        with self._lock:
+            aggregate = self._aggregates.get((user_id, date))
+            if aggregate is None and create:
+                aggregate = self._aggregates[(user_id, date)] = DailyAggregate()
+            return aggregate
+
+    def _evict_old(self):
+        with self._lock:
+            if not self._aggregates:
+                return
+            days = [day for day in map(parse_day, {date for _, date in self._aggregates}) if day is not None]
+            if not days:
+                return
+            cutoff = (max(days) - timedelta(days=self.retention_days)).isoformat()
+            # Keys that are not dates are left alone rather than failing every ingest
+            for key in [key for key in self._aggregates if parse_day(key[1]) is not None and key[1] <= cutoff]:
+                del self._aggregates[key]
+
+    def ingest(
+        self,
+        user_id: str,
+        messages: List[Dict[str, Any]],
+        conversation_id: Optional[str] = None,
+        date: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Fold messages into the aggregates of the days they were sent on
+
+        Messages with an ``id`` already ingested for the same conversation
+        are skipped, so retried uploads are not counted twice.
+
+        Args:
+            user_id: User whose reports the messages belong to
+            messages: Message dictionaries
+            conversation_id: Conversation of all messages (default: each
+                message's ``room_id``)
+            date: Day for messages without a timestamp (default: today, UTC)
+
+        Returns:
+            Number of new messages per day
+
+        Raises:
+            ValueError: ``date`` is not a YYYY-MM-DD date
+        """
+        if date is not None:
+            day = parse_day(date)
+            if day is None:
+                raise ValueError(f"Invalid date {date!r}, expected YYYY-MM-DD")
+            date = day.isoformat()
+        default_date = date or datetime.now(timezone.utc).date().isoformat()
+        by_day: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for msg in messages:
+            conversation = str(conversation_id or msg.get("room_id") or "")
+            by_day.setdefault(message_date(msg) or default_date, []).append((conversation, msg))
+
+        added = {}
+        for day, day_messages in by_day.items():
+            aggregate = self._aggregate(user_id, day, create=True)
+            with aggregate.lock:
+                fresh = []
+                for conversation, msg in day_messages:
+                    message_id = msg.get("id") or msg.get("event_id")
+                    if message_id is not None:
+                        key = (conversation, str(message_id))
+                        if key in aggregate.seen:
+                            continue
+                        aggregate.seen.add(key)
+                    aggregate.conversations.add(conversation)
+                    fresh.append(msg)
+                aggregate.total_messages += len(fresh)
+
+            with_text = [msg for msg in fresh if msg.get("body")]
+            texts = [msg["body"] for msg in with_text]
+            intents = self.intent_parser.parse_batch(texts) if texts else []
+            scored = self.prioritizer.top(with_text, self.top_n)
+
+            with aggregate.lock:
+                aggregate.intents.update(result["intent"] for result in intents)
+                for msg in scored:
+                    aggregate.seq += 1
+                    entry = (msg["priority_score"], -aggregate.seq, msg)
+                    if len(aggregate.top) < self.top_n:
+                        heapq.heappush(aggregate.top, entry)
+                    elif entry[:2] > aggregate.top[0][:2]:
+                        heapq.heapreplace(aggregate.top, entry)
+                aggregate.pending.extend(texts)
+            added[day] = len(fresh)
+
+        self._evict_old()
+        logger.debug(f"Ingested {sum(added.values())} messages for {user_id} across {len(added)} day(s)")
+        return added
+
+    def report(
+        self,
+        user_id: str,
+        date: str,
+        max_length: int = 200,
+        min_length: int = 50,
+        token_budget: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Current report for a user and day, or None if nothing was ingested
+
+        Args:
+            user_id: User the report is for
+            date: Day (YYYY-MM-DD)
+            max_length, min_length, token_budget, time_budget: Passed to
+                ConversationSummarizer.summarize_long
+
+        Returns:
+            Fields of a daily report plus ``timings_ms``
+        """
+        aggregate = self._aggregate(user_id, date)
+        if aggregate is None:
+            return None
+
+        started = time.perf_counter()
+        summary_args = dict(max_length=max_length, min_length=min_length,
+                            token_budget=token_budget, time_budget=time_budget)
+        with aggregate.summary_lock:
+            with aggregate.lock:
+                pending, aggregate.pending = aggregate.pending, []
+                partials = list(aggregate.partials)
+                summary = aggregate.summary
+
+            if pending:
+                partials.append(self.summarizer.summarize_long(pending, **summary_args))
+                summary = partials[0] if len(partials) == 1 else self.summarizer.summarize_long(partials, **summary_args)
+                if len(partials) > self.max_partials:
+                    # Keep the combine step bounded: the summary stands in for them
+                    partials = [summary]
+                with aggregate.lock:
+                    aggregate.partials = partials
+                    aggregate.summary = summary
+
+        with aggregate.lock:
+            total_messages = aggregate.total_messages
+            intent_distribution = dict(aggregate.intents)
+            priority_messages = [
+                msg for _, _, msg in sorted(aggregate.top, key=lambda entry: (-entry[0], -entry[1]))
+            ]
+            total_conversations = len(aggregate.conversations)
+
+        summarize_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        logger.debug(f"Report for {user_id} on {date} summarized {len(pending)} new messages in {summarize_ms}ms")
+        return {
+            "user_id": user_id,
+            "date": date,
+            "total_conversations": total_conversations,
+            "total_messages": total_messages,
+            "summary": summary or "No messages to summarize.",
+            "priority_messages": priority_messages,
+            "intent_distribution": intent_distribution,
+            "key_insights": key_insights(total_messages, intent_distribution),
+            "timings_ms": {"summarize": summarize_ms}
+        }
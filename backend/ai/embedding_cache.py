@@ -0,0 +1,246 @@
+"""
+Content-hash embedding cache so repeated message texts skip the encoder
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def text_key(text: str) -> bytes:
+    """
+    Cache key for a text
+
+    Only case and whitespace are normalized: the all-MiniLM-L6-v2 tokenizer
+    lowercases its input and splits on whitespace, so texts that differ only
+    in those get the same embedding anyway.
+    """
+    normalized = _WHITESPACE.sub(" ", text.strip()).lower()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+
+class DiskEmbeddingTier:
+    """
+    Persistent cache tier: a memory-mapped float32 matrix plus a hash index
+
+    ``vectors.f32`` holds one embedding per row and ``keys.bin`` the 16-byte
+    key of each row in the same order. The key is appended only after its
+    row is written, so a key on disk always has its vector. The key -> row
+    map is rebuilt from ``keys.bin`` on open.
+
+    Only one process may write the files; others open them ``read_only``
+    and see the entries that existed when they opened them.
+    """
+
+    KEY_SIZE = 16
+    GROW_ROWS = 4096
+
+    def __init__(self, path: str, dimension: int, max_entries: int = 1000000, read_only: bool = False):
+        self.path = path
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.read_only = read_only
+        os.makedirs(path, exist_ok=True)
+
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._keys_path = os.path.join(path, "keys.bin")
+
+        self._rows: Dict[bytes, int] = {}
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "rb") as f:
+                keys = f.read()
+            usable = len(keys) - len(keys) % self.KEY_SIZE
+            for row, offset in enumerate(range(0, usable, self.KEY_SIZE)):
+                self._rows[keys[offset:offset + self.KEY_SIZE]] = row
+
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._keys_file = None
+        if read_only:
+            if self._rows:
+                rows = os.path.getsize(self._vectors_path) // (4 * self.dimension)
+                self._vectors = np.memmap(self._vectors_path, dtype="float32", mode="r", shape=(rows, self.dimension))
+                self._capacity = rows
+        else:
+            self._grow(max(len(self._rows), 1))
+            self._keys_file = open(self._keys_path, "ab")
+
+    def _grow(self, min_rows: int):
+        """Extend the backing file to at least ``min_rows`` rows and remap it"""
+        existing = os.path.getsize(self._vectors_path) // (4 * self.dimension) if os.path.exists(self._vectors_path) else 0
+        capacity = max(existing, min_rows)
+        if capacity > existing:
+            capacity = max(capacity, existing + self.GROW_ROWS)
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * 4 * self.dimension)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(self._vectors_path, dtype="float32", mode="r+", shape=(capacity, self.dimension))
+        self._capacity = capacity
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._vectors[row])
+
+    def put(self, key: bytes, vector: np.ndarray):
+        if self.read_only or key in self._rows or len(self._rows) >= self.max_entries:
+            return
+        row = len(self._rows)
+        if row >= self._capacity:
+            self._grow(row + 1)
+        self._vectors[row] = vector
+        self._keys_file.write(key)
+        self._keys_file.flush()
+        self._rows[key] = row
+
+    def close(self):
+        if self._keys_file is not None:
+            self._vectors.flush()
+            self._keys_file.close()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by a hash of the normalized text
+
+    An in-memory LRU holds the hottest ``max_entries`` embeddings; an
+    optional ``DiskEmbeddingTier`` keeps every embedding seen so far across
+    restarts. Only texts missing from both tiers are sent to the encoder,
+    and duplicates within one call are encoded once.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        max_entries: int = 50000,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 1000000,
+        disk_read_only: bool = False
+    ):
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        # Set for all but one of the processes sharing disk_path
+        self.disk_read_only = disk_read_only
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._disk: Optional[DiskEmbeddingTier] = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._deduplicated = 0
+
+    def _disk_tier(self) -> Optional[DiskEmbeddingTier]:
+        """Open the disk tier on first use"""
+        if self._disk is None and self.disk_path:
+            self._disk = DiskEmbeddingTier(
+                self.disk_path, self.dimension, self.disk_max_entries, read_only=self.disk_read_only
+            )
+            logger.info(f"Opened embedding cache with {len(self._disk)} entries on disk")
+        return self._disk
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def encode(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embeddings for ``texts``, calling ``encode`` only for unseen texts
+
+        Args:
+            texts: Texts to embed
+            encode: Encoder for a list of texts returning a float32 matrix
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        result = np.empty((len(texts), self.dimension), dtype="float32")
+        missing: Dict[bytes, List[int]] = {}
+        missing_texts: List[str] = []
+
+        with self._lock:
+            disk = self._disk_tier()
+            for position, text in enumerate(texts):
+                key = text_key(text)
+                if key in missing:
+                    # Repeated within this call; encoded once with the first
+                    missing[key].append(position)
+                    self._deduplicated += 1
+                    continue
+
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    result[position] = vector
+                    continue
+
+                vector = disk.get(key) if disk is not None else None
+                if vector is not None:
+                    self._remember(key, vector)
+                    self._disk_hits += 1
+                    result[position] = vector
+                    continue
+
+                missing[key] = [position]
+                missing_texts.append(text)
+                self._misses += 1
+
+        if not missing_texts:
+            return result
+
+        # Encode outside the lock so other callers can still hit the cache
+        encoded = encode(missing_texts)
+
+        with self._lock:
+            disk = self._disk_tier()
+            for (key, positions), vector in zip(missing.items(), encoded):
+                vector = np.array(vector, dtype="float32")
+                result[positions] = vector
+                self._remember(key, vector)
+                if disk is not None:
+                    disk.put(key, vector)
+
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Entry counts and hit rates per tier"""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits + self._deduplicated
+            lookups = hits + self._misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_max_entries": self.max_entries,
+                "disk_entries": len(self._disk) if self._disk is not None else 0,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "deduplicated": self._deduplicated,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+            }
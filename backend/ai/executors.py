@@ -0,0 +1,143 @@
+"""
+Bounded worker pools for running blocking model inference off the event loop
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ai import profiling
+
+logger = logging.getLogger(__name__)
+
+
+class PoolRejectedError(Exception):
+    """Base class for requests an inference pool refused to complete"""
+
+    status_code = 503
+
+
+class PoolSaturatedError(PoolRejectedError):
+    """Raised immediately when a pool's queue is full"""
+
+    status_code = 429
+
+
+class DeadlineExceededError(PoolRejectedError):
+    """Raised when a request did not finish before its deadline"""
+
+    status_code = 503
+
+
+class InferencePool:
+    """
+    Dedicated thread pool for one model with a bounded queue and deadlines
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more may
+    wait; anything beyond that is rejected straight away with
+    ``PoolSaturatedError`` instead of piling up behind a slow model. Jobs that
+    are still queued when their deadline passes are dropped without running.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 1,
+        max_queue: int = 16,
+        timeout: Optional[float] = 30.0
+    ):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"{name}-pool"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        # Stats
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result
+
+        Args:
+            fn: Blocking callable to run
+            timeout: Per-request deadline in seconds (defaults to the pool's,
+                0 disables it)
+
+        Raises:
+            PoolSaturatedError: The pool is running and queueing at capacity
+            DeadlineExceededError: The job did not finish before the deadline
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise PoolSaturatedError(f"{self.name} pool is saturated, retry later")
+            self._in_flight += 1
+
+        timeout = (self.timeout if timeout is None else timeout) or None
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        def job():
+            if deadline is not None and time.monotonic() > deadline:
+                raise DeadlineExceededError(f"{self.name} request expired in queue")
+            with profiling.attach_thread():
+                return fn(*args, **kwargs)
+
+        # Run in the caller's context so per-request state (stage timings,
+        # slow-request profiles) follows the job into the worker thread
+        future = self._executor.submit(contextvars.copy_context().run, job)
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # Drop the job if it has not started yet
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise DeadlineExceededError(f"{self.name} request exceeded {timeout}s deadline")
+        except DeadlineExceededError:
+            with self._lock:
+                self._timed_out += 1
+            raise
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled() and future.exception() is None:
+                self._completed += 1
+
+    def shutdown(self):
+        """Stop accepting work and cancel queued jobs"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and rejection counters"""
+        with self._lock:
+            in_flight = self._in_flight
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "timeout": self.timeout,
+                "in_flight": in_flight,
+                "queue_depth": max(0, in_flight - self.max_workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out
+            }
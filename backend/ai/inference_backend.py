@@ -0,0 +1,184 @@
+"""
+Selectable CPU inference backends for the summarization and embedding models
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ai import metrics
+
+logger = logging.getLogger(__name__)
+
+# torch: the Hugging Face model as published (fp32)
+# int8:  torch dynamic quantization; Linear layers run with int8 weights
+# onnx:  the model exported to ONNX and run by ONNX Runtime
+# stub:  deterministic stand-ins without weights (ai/stub_models.py), for
+#        benchmarks and local runs
+INFERENCE_BACKENDS = ("torch", "int8", "onnx", "stub")
+
+MODEL_STAGE_SECONDS = metrics.histogram(
+    "model_stage_seconds", "Model inference time per call, by model and stage", ["model", "stage"]
+)
+# Methods timed by instrument_model: transformers pipelines tokenize in
+# preprocess, generate in _forward and decode in postprocess; sentence
+# encoders tokenize and run the transformer (pooling included) in forward
+PIPELINE_STAGES = {"preprocess": "tokenize", "_forward": "forward", "postprocess": "decode"}
+ENCODER_STAGES = {"tokenize": "tokenize", "forward": "forward"}
+
+
+def check_backend(backend: str) -> str:
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+    return backend
+
+
+def model_tag(model_name: str, backend: str) -> str:
+    """
+    Identifier of a model as run by a backend
+
+    Quantized and exported models give slightly different outputs, so
+    anything cached per model (summaries) must not mix backends.
+    """
+    return model_name if backend == "torch" else f"{model_name}:{backend}"
+
+
+def instrument_model(model, model_name: str, prefix: str, stages: Dict[str, str]):
+    """
+    Time a loaded model's stages into MODEL_STAGE_SECONDS and Server-Timing
+
+    Methods the model does not have (the stubs have none) are skipped.
+    """
+    metrics.instrument_stages(model, stages, MODEL_STAGE_SECONDS, prefix, model=model_name)
+
+
+def quantize_dynamic(model):
+    """Copy of a torch model whose Linear layers use int8 weights"""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_model(model_class, model_name: str, export_dir: Optional[str]):
+    """
+    ONNX Runtime model for ``model_name``, exported on first use
+
+    With ``export_dir`` set, the exported graph is saved under it and loaded
+    from there on later starts instead of being exported again.
+    """
+    path = os.path.join(export_dir, model_name.replace("/", "--")) if export_dir else None
+    if path and os.path.exists(os.path.join(path, "config.json")):
+        logger.info(f"Loading ONNX export of {model_name} from {path}")
+        return model_class.from_pretrained(path)
+
+    logger.info(f"Exporting {model_name} to ONNX...")
+    model = model_class.from_pretrained(model_name, export=True)
+    if path:
+        model.save_pretrained(path)
+        logger.info(f"Saved ONNX export of {model_name} to {path}")
+    return model
+
+
+def load_summarization_pipeline(
+    model_name: str,
+    backend: str = "torch",
+    device: Optional[int] = -1,
+    export_dir: Optional[str] = None
+):
+    """
+    transformers summarization pipeline running ``model_name`` on ``backend``
+
+    ``device`` None picks the GPU when there is one; int8 and onnx always
+    run on the CPU.
+    """
+    check_backend(backend)
+    if backend == "stub":
+        from ai.stub_models import StubSummarizationPipeline
+
+        return StubSummarizationPipeline()
+
+    # Note: transformers and torch are installed in Docker container
+    from transformers import pipeline
+    import torch
+
+    if device is None:
+        device = 0 if torch.cuda.is_available() else -1
+    if backend == "onnx":
+        # Optional dependency: pip install optimum[onnxruntime]
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        from transformers import AutoTokenizer
+
+        return pipeline(
+            "summarization",
+            model=_onnx_model(ORTModelForSeq2SeqLM, model_name, export_dir),
+            tokenizer=AutoTokenizer.from_pretrained(model_name),
+            device=-1
+        )
+
+    summarizer = pipeline("summarization", model=model_name, device=device if backend == "torch" else -1)
+    if backend == "int8":
+        summarizer.model = quantize_dynamic(summarizer.model)
+    return summarizer
+
+
+class OnnxSentenceEncoder:
+    """
+    ONNX Runtime replacement for a SentenceTransformer's ``encode``
+
+    Reproduces the all-MiniLM-L6-v2 pipeline: the transformer, mean pooling
+    over non-padding tokens, then L2 normalization.
+    """
+
+    def __init__(self, model_name: str, export_dir: Optional[str] = None, max_seq_length: int = 256):
+        # Optional dependency: pip install optimum[onnxruntime]
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = _onnx_model(ORTModelForFeatureExtraction, model_name, export_dir)
+        self.max_seq_length = max_seq_length
+
+    def tokenize(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        return self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+
+    def forward(self, tokens: Dict[str, np.ndarray]) -> np.ndarray:
+        hidden = self.model(**tokens).last_hidden_state
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = [
+            self.forward(self.tokenize(texts[offset:offset + batch_size]))
+            for offset in range(0, len(texts), batch_size)
+        ]
+        if not embeddings:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return np.vstack(embeddings)
+
+
+def load_sentence_encoder(model_name: str, backend: str = "torch", export_dir: Optional[str] = None):
+    """Sentence encoder with a SentenceTransformer-style ``encode`` on ``backend``"""
+    check_backend(backend)
+    if backend == "stub":
+        from ai.stub_models import StubSentenceEncoder
+
+        return StubSentenceEncoder()
+    if backend == "onnx":
+        return OnnxSentenceEncoder(model_name, export_dir)
+
+    from sentence_transformers import SentenceTransformer
+
+    encoder = SentenceTransformer(model_name, device="cpu" if backend == "int8" else None)
+    if backend == "int8":
+        encoder = quantize_dynamic(encoder)
+    return encoder
@@ -0,0 +1,384 @@
+"""
+Asynchronous batched ingestion for the vector store
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ai import metrics
+from ai.executors import InferencePool, PoolSaturatedError
+from ai.vector_store import message_id
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_MESSAGES = metrics.histogram(
+    "ingest_batch_messages", "Messages per background ingestion batch", buckets=metrics.SIZE_BUCKETS
+)
+INGEST_QUEUE_SECONDS = metrics.histogram(
+    "ingest_queue_seconds", "Time from accepting an ingestion job until its batch starts"
+)
+
+
+def length_sorted(texts: List[str], batch_size: int) -> List[np.ndarray]:
+    """Positions of ``texts`` ordered by length and cut into encoder batches of ``batch_size``"""
+    order = np.argsort([len(text) for text in texts], kind="stable")
+    return [order[offset:offset + batch_size] for offset in range(0, len(order), batch_size)]
+
+
+async def run_on_pool(pool: Optional[InferencePool], fn, *args, retry_delay: float = 0.05):
+    """Run background work on ``pool``, waiting out saturation instead of failing"""
+    if pool is None:
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+    while True:
+        try:
+            # Background work has no caller waiting on a deadline
+            return await pool.run(fn, *args, timeout=0)
+        except PoolSaturatedError:
+            await asyncio.sleep(retry_delay)
+
+
+# Optional message fields and the types the vector store can store
+_MESSAGE_FIELDS = (
+    ("id", (str, int)),
+    ("user_id", (str,)),
+    ("timestamp", (str, int, float)),
+    ("origin_server_ts", (int, float))
+)
+
+
+def check_messages(messages: List[Dict[str, Any]]):
+    """
+    Reject messages the vector store cannot store
+
+    Checked before queueing, so one bad request cannot fail the batch it
+    would have shared with others.
+
+    Raises:
+        ValueError: A message is not an object, or a field has the wrong type
+    """
+    for position, msg in enumerate(messages):
+        if not isinstance(msg, dict):
+            raise ValueError(f"Message {position} is not an object")
+        body = msg.get("body")
+        if body is not None and not isinstance(body, str):
+            raise ValueError(f"Message {position}: body must be a string")
+        for field, types in _MESSAGE_FIELDS:
+            value = msg.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, types)):
+                raise ValueError(f"Message {position}: {field} must be a {' or '.join(t.__name__ for t in types)}")
+
+
+class IngestionJob:
+    """One queued store request: its messages until they are stored, then the outcome"""
+
+    def __init__(self, job_id: str, conversation_id: str, messages: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]]):
+        self.id = job_id
+        self.conversation_id = conversation_id
+        self.messages = messages
+        self.metadata = metadata
+        self.message_count = len(messages)
+        self.status = "queued"
+        self.stored = 0
+        self.error: Optional[str] = None
+        self.submitted = time.perf_counter()
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def finish(self, stored: int = 0, error: Optional[str] = None):
+        self.status = "failed" if error else "done"
+        self.stored = stored
+        self.error = error
+        self.finished_at = time.time()
+        # The messages are in the store (or lost); do not keep them around
+        self.messages = None
+        self.metadata = None
+        self.done.set()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "conversation_id": self.conversation_id,
+            "messages": self.message_count,
+            "messages_stored": self.stored,
+            "error": self.error,
+            "submitted_at": round(self.submitted_at, 3),
+            "finished_at": round(self.finished_at, 3) if self.finished_at is not None else None
+        }
+
+
+class IngestionQueue:
+    """
+    Stores conversations in the background, many requests per encoder batch
+
+    ``submit`` queues a request's messages as a job and returns right away.
+    A single worker waits up to ``max_wait_ms`` after the first pending job
+    (or until ``max_batch_messages`` are pending), takes the waiting jobs,
+    sorts all their texts by length and encodes them ``encode_batch_size``
+    at a time, so every encoder call pads to similar lengths. The vectors of
+    all the jobs are then added with one ``VectorStore.add_batch``: one
+    segment, one index add and one metadata transaction for the lot.
+
+    Encoding runs on ``encoder_pool``, one pool job per chunk so searches
+    get their turn in between, and the index add on ``faiss_pool``; while a
+    pool is saturated the worker waits and retries. ``max_queue_size`` bounds
+    the messages waiting to be stored: beyond it ``submit`` raises
+    PoolSaturatedError. The last ``job_history`` finished jobs are kept for
+    status lookups.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        encoder_pool: Optional[InferencePool] = None,
+        faiss_pool: Optional[InferencePool] = None,
+        max_batch_messages: int = 1024,
+        max_wait_ms: float = 50.0,
+        encode_batch_size: int = 64,
+        max_queue_size: int = 20000,
+        job_history: int = 10000,
+        retry_delay: float = 0.05
+    ):
+        self.vector_store = vector_store
+        self.encoder_pool = encoder_pool
+        self.faiss_pool = faiss_pool
+        self.max_batch_messages = max(1, max_batch_messages)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.encode_batch_size = max(1, encode_batch_size)
+        self.max_queue_size = max(0, max_queue_size)
+        self.job_history = max(1, job_history)
+        self.retry_delay = retry_delay
+
+        self._pending: deque = deque()
+        self._pending_messages = 0
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._finished: deque = deque()
+        self._ids = itertools.count(1)
+        # Job ids stay unique across restarts and serve.py workers
+        self._id_prefix = f"{os.getpid():x}-{int(time.time()):x}"
+        self._wake: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._running: List[IngestionJob] = []
+
+        # Stats
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._batches = 0
+        self._batch_messages = 0
+        self._encoder_calls = 0
+
+    def submit(
+        self,
+        conversation_id: str,
+        messages: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> IngestionJob:
+        """
+        Queue messages to be embedded and stored
+
+        Args:
+            conversation_id: Unique identifier for conversation
+            messages: List of message dictionaries
+            metadata: Additional metadata to store
+
+        Returns:
+            The job, queued
+
+        Raises:
+            ValueError: A message cannot be stored (see check_messages)
+            PoolSaturatedError: Too many messages are already waiting
+        """
+        check_messages(messages)
+        # Jobs share add_batch calls; without their own ids, messages of
+        # different jobs would collide on positional keys
+        messages = [
+            msg if msg.get("id") is not None else {**msg, "id": message_id(conversation_id, msg)}
+            for msg in messages
+        ]
+        self._ensure_worker()
+        # A job larger than the whole queue is still taken when nothing waits
+        if self.max_queue_size and self._pending and self._pending_messages + len(messages) > self.max_queue_size:
+            self._rejected += 1
+            raise PoolSaturatedError("ingestion queue is saturated, retry later")
+
+        job = IngestionJob(f"{self._id_prefix}-{next(self._ids)}", conversation_id, messages, metadata)
+        self._jobs[job.id] = job
+        self._pending.append(job)
+        self._pending_messages += job.message_count
+        self._submitted += 1
+        self._wake.set()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def _ensure_worker(self):
+        """Start the ingestion worker on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._wake = asyncio.Event()
+            # A fresh context: the worker outlives the request that started it
+            self._worker = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run())
+
+    async def close(self, timeout: float = 30.0):
+        """Store the jobs still queued (for up to ``timeout`` seconds), then stop the worker"""
+        if self._worker is None:
+            return
+        waiting = [job.done.wait() for job in list(self._pending) + self._running]
+        if waiting:
+            try:
+                await asyncio.wait_for(asyncio.gather(*waiting), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Stopping with {len(self._pending)} ingestion jobs not stored")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+
+            # Give other requests the window to join the batch
+            deadline = loop.time() + self.max_wait
+            while self._pending_messages < self.max_batch_messages:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._take_batch()
+            self._running = batch
+            try:
+                await self._process(batch)
+            finally:
+                self._running = []
+
+    def _take_batch(self) -> List[IngestionJob]:
+        """Waiting jobs up to max_batch_messages, oldest first (at least one)"""
+        batch = []
+        count = 0
+        while self._pending and (not batch or count + self._pending[0].message_count <= self.max_batch_messages):
+            job = self._pending.popleft()
+            self._pending_messages -= job.message_count
+            count += job.message_count
+            batch.append(job)
+        return batch
+
+    async def _process(self, batch: List[IngestionJob]):
+        started = time.perf_counter()
+        for job in batch:
+            job.status = "running"
+            INGEST_QUEUE_SECONDS.observe(started - job.submitted)
+        count = sum(job.message_count for job in batch)
+        INGEST_BATCH_MESSAGES.observe(count)
+
+        try:
+            await self._store(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+            else:
+                # Store the jobs one at a time so only the one that caused the error fails
+                logger.warning(f"Batch of {len(batch)} ingestion jobs failed ({e}), storing them one at a time")
+                for job in batch:
+                    try:
+                        await self._store([job])
+                    except Exception as e:
+                        self._fail(job, e)
+        finally:
+            self._forget(batch)
+
+        self._batches += 1
+        self._batch_messages += count
+        logger.debug(
+            f"Stored {count} messages from {len(batch)} jobs in {time.perf_counter() - started:.3f}s"
+        )
+
+    async def _store(self, jobs: List[IngestionJob]):
+        """Encode and add the messages of ``jobs`` together, then finish them"""
+        texts = []
+        bounds = []
+        for job in jobs:
+            job_texts = self.vector_store.message_texts(job.messages)
+            bounds.append((len(texts), len(texts) + len(job_texts)))
+            texts.extend(job_texts)
+
+        embeddings = await self._encode(texts)
+        entries = [
+            (job.conversation_id, job.messages, embeddings[start:end], job.metadata)
+            for job, (start, end) in zip(jobs, bounds)
+        ]
+        stored = await run_on_pool(self.faiss_pool, self.vector_store.add_batch, entries, retry_delay=self.retry_delay)
+        # A message also sent by a later job in the batch counts for that job only
+        for job, count in zip(jobs, stored):
+            job.finish(stored=count)
+        self._completed += len(jobs)
+
+    def _fail(self, job: IngestionJob, error: Exception):
+        logger.error(f"Error in batched ingestion of job {job.id}: {error}")
+        job.finish(error=str(error))
+        self._failed += 1
+
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` in length-sorted chunks; rows come back in the original order"""
+        if not texts:
+            return np.zeros((0, self.vector_store.dimension), dtype="float32")
+        embeddings = None
+        for positions in length_sorted(texts, self.encode_batch_size):
+            vectors = await run_on_pool(
+                self.encoder_pool,
+                self.vector_store.encode,
+                [texts[position] for position in positions],
+                retry_delay=self.retry_delay
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype="float32")
+            embeddings[positions] = vectors
+            self._encoder_calls += 1
+        return embeddings
+
+    def _forget(self, batch: List[IngestionJob]):
+        """Keep only the last job_history finished jobs"""
+        for job in batch:
+            self._finished.append(job.id)
+        while len(self._finished) > self.job_history:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, job counters and batch sizes"""
+        return {
+            "max_batch_messages": self.max_batch_messages,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "encode_batch_size": self.encode_batch_size,
+            "max_queue_size": self.max_queue_size,
+            "queued_jobs": len(self._pending),
+            "queued_messages": self._pending_messages,
+            "running_jobs": len(self._running),
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "batches": self._batches,
+            "avg_batch_messages": round(self._batch_messages / self._batches, 2) if self._batches else 0.0,
+            "encoder_calls": self._encoder_calls
+        }
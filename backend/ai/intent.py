@@ -1,18 +1,19 @@
 """
-Intent Parsing using NLP and Hugging Face models
+Intent Parsing using rule-based NLP patterns
 """
 
 import logging
-import re
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import torch
+from typing import List
+
+from ai.intent_matcher import IntentMatcher
+from ai.loading import LazyComponent
 
 logger = logging.getLogger(__name__)
 
 
-class IntentParser:
+class IntentParser(LazyComponent):
     """
-    Parses user intent from messages using DistilBERT and rule-based methods
+    Parses user intent from messages using rule-based methods
     """
     
     # Intent categories
@@ -24,20 +25,15 @@ class IntentParser:
         "general"
     ]
     
-    def __init__(self):
-        logger.info("Loading intent classification model...")
-        try:
-            # Use a fine-tuned model or base model with custom classification
-            # For MVP, we'll use distilbert with custom logic
-            self.classifier = pipeline(
-                "text-classification",
-                model="distilbert-base-uncased",
-                device=-1 if not torch.cuda.is_available() else 0
-            )
-            logger.info("Intent model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading intent model: {e}")
-            self.classifier = None
+    component_name = "intent_parser"
+    
+    def __init__(self, lazy: bool = False):
+        """
+        Args:
+            lazy: Defer compiling the matcher until first use (or ensure_loaded())
+        """
+        super().__init__()
+        self.matcher = None
         
         # Keyword patterns for intent detection
         self.intent_patterns = {
@@ -83,6 +79,16 @@ class IntentParser:
                 r"customer\s+service",
             ],
         }
+        
+        if not lazy:
+            self.ensure_loaded()
+    
+    def _load(self):
+        # Precompiled single-pass matcher over all patterns
+        self.matcher = IntentMatcher(self.intent_patterns)
+    
+    def _warm_up(self):
+        self.parse("Can you help me track my order?")
     
     def parse(self, message: str) -> dict:
         """
@@ -94,6 +100,8 @@ class IntentParser:
         Returns:
             Dictionary with intent, confidence, and entities
         """
+        self.ensure_loaded()
+        
         if not message or len(message.strip()) == 0:
             return {
                 "intent": "general",
@@ -104,13 +112,7 @@ class IntentParser:
         message_lower = message.lower()
         
         # Rule-based intent detection (primary method for MVP)
-        intent_scores = {}
-        for intent, patterns in self.intent_patterns.items():
-            score = 0
-            for pattern in patterns:
-                matches = len(re.findall(pattern, message_lower, re.IGNORECASE))
-                score += matches
-            intent_scores[intent] = score
+        intent_scores = self.matcher.score(message_lower)
         
         # Find highest scoring intent
         if intent_scores and max(intent_scores.values()) > 0:
@@ -123,7 +125,7 @@ class IntentParser:
         # Extract entities (simple keyword extraction)
         entities = self._extract_entities(message)
         
-        logger.info(f"Detected intent: {detected_intent} (confidence: {confidence:.2f})")
+        logger.debug(f"Detected intent: {detected_intent} (confidence: {confidence:.2f})")
         
         return {
             "intent": detected_intent,
@@ -131,28 +133,22 @@ class IntentParser:
             "entities": entities
         }
     
+    def parse_batch(self, messages: List[str]) -> List[dict]:
+        """
+        Parse intent for many messages
+        
+        Args:
+            messages: Input message texts
+            
+        Returns:
+            One parse() result per message, in order
+        """
+        results = [self.parse(message) for message in messages]
+        logger.debug(f"Parsed intent for {len(results)} messages")
+        return results
+    
     def _extract_entities(self, message: str) -> list:
         """
         Extract simple entities from message
         """
-        entities = []
-        
-        # Email pattern
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, message)
-        for email in emails:
-            entities.append({"type": "email", "value": email})
-        
-        # URL pattern
-        url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-        urls = re.findall(url_pattern, message)
-        for url in urls:
-            entities.append({"type": "url", "value": url})
-        
-        # Phone number pattern (simple)
-        phone_pattern = r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
-        phones = re.findall(phone_pattern, message)
-        for phone in phones:
-            entities.append({"type": "phone", "value": phone})
-        
-        return entities
+        return self.matcher.extract_entities(message)
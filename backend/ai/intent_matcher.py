@@ -0,0 +1,191 @@
+"""
+Precompiled single-pass matcher for rule-based intent detection
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+# Characters that may appear escaped in a pattern's literal prefix
+_ESCAPABLE = set(r"?.*+()[]{}|^$\/-")
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """Whether ``pattern`` has a ``|`` outside any group or character class"""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _literal_prefix(pattern: str) -> str:
+    """
+    Leading literal text every match of ``pattern`` must start with
+
+    Stops at the first regex construct; returns "" if the pattern does not
+    start with a literal.
+    """
+    if _has_top_level_alternation(pattern):
+        return ""
+
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if i + 1 < len(pattern) and pattern[i + 1] in _ESCAPABLE:
+                prefix.append(pattern[i + 1])
+                i += 2
+                continue
+            break
+        if char.isalnum() or char in " '_":
+            # A quantifier applies to the previous char, which is then optional
+            if i + 1 < len(pattern) and pattern[i + 1] in "?*{":
+                break
+            prefix.append(char)
+            i += 1
+            continue
+        break
+    return "".join(prefix)
+
+
+class IntentMatcher:
+    """
+    Scores every intent in one scan of the message
+
+    All patterns are indexed by their literal prefix and a single combined
+    regex finds every position where any prefix occurs. Only the patterns
+    whose prefix sits at that position are tried there, and each pattern
+    keeps the end of its last match so counts follow ``re.findall``'s
+    non-overlapping semantics exactly.
+    """
+
+    # Entity patterns, in the order entities are reported
+    EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+    URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+    PHONE_PATTERN = re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+    _DIGIT = re.compile(r'\d')
+
+    def __init__(self, intent_patterns: Dict[str, List[str]]):
+        self.intents = list(intent_patterns)
+
+        # (intent position, compiled pattern) per pattern
+        self._patterns: List[Tuple[int, "re.Pattern"]] = []
+        self._unanchored: List[int] = []
+        prefixes: Dict[str, List[int]] = {}
+
+        for intent_pos, intent in enumerate(self.intents):
+            for pattern in intent_patterns[intent]:
+                pattern_id = len(self._patterns)
+                self._patterns.append((intent_pos, re.compile(pattern, re.IGNORECASE)))
+                prefix = _literal_prefix(pattern)
+                if prefix:
+                    prefixes.setdefault(prefix.lower(), []).append(pattern_id)
+                else:
+                    self._unanchored.append(pattern_id)
+
+        # Longest prefix first so the combined regex reports the longest
+        # prefix at a position; shorter prefixes there are prefixes of it
+        anchors = sorted(prefixes, key=len, reverse=True)
+
+        # One branch per first character, consuming only that character, so
+        # the regex engine can skip ahead on a character set and overlapping
+        # prefixes are still all found. Group n maps to anchors[n - 1].
+        branches: Dict[str, List[str]] = {}
+        for anchor in anchors:
+            branches.setdefault(anchor[0], []).append(anchor)
+        self._candidates: List[List[int]] = [None]
+        scanner_parts = []
+        for first, group in branches.items():
+            rests = []
+            for anchor in group:
+                rests.append(f"({re.escape(anchor[1:])})")
+                self._candidates.append(sorted(
+                    pattern_id
+                    for prefix, pattern_ids in prefixes.items()
+                    if anchor.startswith(prefix)
+                    for pattern_id in pattern_ids
+                ))
+            scanner_parts.append(f"{re.escape(first)}(?={'|'.join(rests)})")
+
+        scanner = "|".join(scanner_parts)
+        self._scanner = re.compile(scanner, re.IGNORECASE) if anchors else None
+        # For ASCII text, matching lowercase ASCII anchors case-insensitively
+        # is the same as matching them against the lowercased text
+        self._ascii_scanner = (
+            re.compile(scanner) if anchors and all(a.isascii() for a in anchors) else None
+        )
+
+    def score(self, text: str) -> Dict[str, int]:
+        """
+        Count pattern matches per intent
+
+        Equivalent to summing ``len(re.findall(pattern, text, re.IGNORECASE))``
+        over each intent's patterns.
+        """
+        counts = [0] * len(self.intents)
+        patterns = self._patterns
+
+        if self._scanner is not None:
+            if self._ascii_scanner is not None and text.isascii():
+                anchor_matches = self._ascii_scanner.finditer(text.lower())
+            else:
+                anchor_matches = self._scanner.finditer(text)
+
+            last_end = [0] * len(patterns)
+            candidates = self._candidates
+            for anchor_match in anchor_matches:
+                position = anchor_match.start()
+                for pattern_id in candidates[anchor_match.lastindex]:
+                    if position < last_end[pattern_id]:
+                        continue
+                    intent_pos, compiled = patterns[pattern_id]
+                    match = compiled.match(text, position)
+                    if match:
+                        counts[intent_pos] += 1
+                        last_end[pattern_id] = match.end()
+
+        for pattern_id in self._unanchored:
+            intent_pos, compiled = patterns[pattern_id]
+            counts[intent_pos] += len(compiled.findall(text))
+
+        return dict(zip(self.intents, counts))
+
+    def extract_entities(self, message: str) -> List[Dict[str, str]]:
+        """
+        Extract email, URL and phone entities
+
+        Each pattern only runs when the message contains the character it
+        cannot match without, so plain chat text is rejected by cheap
+        membership checks.
+        """
+        entities = []
+
+        if "@" in message:
+            for email in self.EMAIL_PATTERN.findall(message):
+                entities.append({"type": "email", "value": email})
+
+        if "http" in message:
+            for url in self.URL_PATTERN.findall(message):
+                entities.append({"type": "url", "value": url})
+
+        if self._DIGIT.search(message):
+            for phone in self.PHONE_PATTERN.findall(message):
+                entities.append({"type": "phone", "value": phone})
+
+        return entities
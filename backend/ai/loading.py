@@ -0,0 +1,101 @@
+"""
+Lazy model loading and readiness tracking for AI components
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentState:
+    """Lifecycle states reported by /ready"""
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class LazyComponent:
+    """
+    Mixin for components whose models load on first use or in the background
+
+    Subclasses implement ``_load`` (and optionally ``_warm_up``) and call
+    ``ensure_loaded`` at the top of every public method that needs the
+    models. Loading happens at most once; concurrent callers wait for it.
+    """
+
+    component_name = "component"
+
+    def __init__(self):
+        self._state = ComponentState.PENDING
+        self._load_lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.warm_up_seconds: Optional[float] = None
+        self.load_error: Optional[str] = None
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _warm_up(self):
+        """Run one small inference so first real requests skip lazy init costs"""
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def ready(self) -> bool:
+        return self._state == ComponentState.READY
+
+    def ensure_loaded(self):
+        """
+        Load the component's models if they are not loaded yet
+
+        Raises:
+            RuntimeError: Loading failed (now or on an earlier attempt)
+        """
+        if self._state == ComponentState.READY:
+            return
+
+        with self._load_lock:
+            if self._state == ComponentState.READY:
+                return
+            if self._state == ComponentState.FAILED:
+                raise RuntimeError(f"{self.component_name} failed to load: {self.load_error}")
+
+            self._state = ComponentState.LOADING
+            started = time.perf_counter()
+            try:
+                self._load()
+            except Exception as e:
+                self._state = ComponentState.FAILED
+                self.load_error = str(e)
+                logger.error(f"Error loading {self.component_name}: {e}")
+                raise RuntimeError(f"{self.component_name} failed to load: {e}") from e
+            self.load_seconds = time.perf_counter() - started
+            self._state = ComponentState.READY
+
+        logger.info(f"{self.component_name} loaded in {self.load_seconds:.2f}s")
+
+    def warm_up(self):
+        """Load the component and run a warm-up inference"""
+        self.ensure_loaded()
+        started = time.perf_counter()
+        self._warm_up()
+        self.warm_up_seconds = time.perf_counter() - started
+        logger.info(f"{self.component_name} warmed up in {self.warm_up_seconds:.2f}s")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Readiness state and load timings"""
+        status = {
+            "state": self._state,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "warm_up_seconds": round(self.warm_up_seconds, 3) if self.warm_up_seconds is not None else None
+        }
+        if self.load_error:
+            status["error"] = self.load_error
+        return status
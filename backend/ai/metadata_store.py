@@ -0,0 +1,385 @@
+"""
+SQLite-backed metadata rows for the vector store
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS metadata_blobs (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation INTEGER NOT NULL,
+    message_id TEXT,
+    body TEXT NOT NULL,
+    user INTEGER NOT NULL,
+    timestamp TEXT,
+    metadata INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS store_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Added after the first release; applied to existing databases on open
+_FILTER_COLUMNS = "ALTER TABLE messages ADD COLUMN timestamp_ms REAL"
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS messages_key ON messages (conversation, message_id);
+CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation, timestamp_ms);
+CREATE INDEX IF NOT EXISTS messages_user ON messages (user, timestamp_ms);
+CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (timestamp_ms);
+"""
+
+
+def timestamp_ms(value: Any) -> Optional[float]:
+    """
+    Normalize a message timestamp to epoch milliseconds
+
+    Numbers are taken as milliseconds (Matrix ``origin_server_ts``), strings
+    as numbers or ISO-8601 dates; dates without an offset are UTC. Returns
+    None when it cannot be parsed.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    text = str(value).strip()
+    # fromisoformat only takes "Z" from Python 3.11 on
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp() * 1000.0
+
+
+class MetadataStore:
+    """
+    Per-vector metadata rows keyed by FAISS id
+
+    Rows live in SQLite rather than in process memory, so startup does not
+    parse every row and search only reads the rows of its top-k hits.
+    Conversation ids, user ids and the request-level ``metadata`` dict
+    (identical for every message of one store call) are interned in side
+    tables so each distinct value is stored once. Indexes on conversation,
+    user and timestamp act as inverted lists for filtered search.
+
+    Deleted rows are removed from ``messages`` and their ids recorded in
+    ``tombstones`` until the vector store purges their vectors.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+
+        # Interned name -> id, filled on demand
+        self._interned: Dict[str, Dict[str, int]] = {
+            "conversations": {},
+            "users": {},
+            "metadata_blobs": {}
+        }
+
+    def _migrate(self):
+        """Bring databases written by older versions up to the current schema"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+        if "timestamp_ms" not in columns:
+            self._conn.execute(_FILTER_COLUMNS)
+        self._conn.executescript(_INDEXES)
+        # Rows stored before the column existed, or with timestamps older
+        # versions could not parse (e.g. a "Z" suffix on Python 3.10)
+        updates = [
+            (ms, row_id)
+            for row_id, timestamp in self._conn.execute(
+                "SELECT id, timestamp FROM messages WHERE timestamp_ms IS NULL AND timestamp IS NOT NULL"
+            )
+            for ms in [timestamp_ms(json.loads(timestamp))]
+            if ms is not None
+        ]
+        if updates:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("UPDATE messages SET timestamp_ms = ? WHERE id = ?", updates)
+            self._conn.execute("COMMIT")
+            logger.info(f"Backfilled timestamp_ms for {len(updates)} metadata rows")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def max_id(self) -> int:
+        """Highest stored FAISS id, or -1 when empty"""
+        with self._lock:
+            value = self._conn.execute("SELECT MAX(id) FROM messages").fetchone()[0]
+        return -1 if value is None else value
+
+    def _intern(self, table: str, column: str, value: str) -> int:
+        cache = self._interned[table]
+        interned = cache.get(value)
+        if interned is not None:
+            return interned
+        self._conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+        interned = self._conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+        cache[value] = interned
+        return interned
+
+    def add_rows(self, start_id: int, rows: Iterable[Dict[str, Any]], deleted: Iterable[int] = ()):
+        """
+        Store rows for FAISS ids ``start_id``, ``start_id + 1``, ...
+
+        Ids that already exist are left untouched, so replaying a segment
+        whose rows were already committed is harmless.
+
+        Args:
+            start_id: FAISS id of the first row
+            rows: Metadata rows
+            deleted: Ids to tombstone in the same transaction (the rows an
+                upsert replaces, or a delete)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                deleted = [(int(i),) for i in deleted]
+                if deleted:
+                    self._conn.executemany("DELETE FROM messages WHERE id = ?", deleted)
+                    self._conn.executemany("INSERT OR IGNORE INTO tombstones (id) VALUES (?)", deleted)
+                values = []
+                for offset, row in enumerate(rows):
+                    values.append((
+                        start_id + offset,
+                        self._intern("conversations", "name", str(row.get("conversation_id", ""))),
+                        row.get("message_id"),
+                        row.get("body", ""),
+                        self._intern("users", "name", str(row.get("user_id") or "")),
+                        json.dumps(row.get("timestamp")),
+                        timestamp_ms(row.get("timestamp")),
+                        self._intern(
+                            "metadata_blobs",
+                            "value",
+                            json.dumps(row.get("metadata") or {}, sort_keys=True, separators=(",", ":"))
+                        )
+                    ))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO messages "
+                    "(id, conversation, message_id, body, user, timestamp, timestamp_ms, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    values
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                # Interned ids of the rolled back inserts are gone
+                for cache in self._interned.values():
+                    cache.clear()
+                raise
+
+    def get_rows(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Rows for the given FAISS ids, in the shape search results use"""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            records = self._conn.execute(
+                "SELECT m.id, c.name, m.message_id, m.body, u.name, m.timestamp, b.value "
+                "FROM messages m "
+                "JOIN conversations c ON c.id = m.conversation "
+                "JOIN users u ON u.id = m.user "
+                "JOIN metadata_blobs b ON b.id = m.metadata "
+                f"WHERE m.id IN ({placeholders})",
+                [int(i) for i in ids]
+            ).fetchall()
+
+        rows = {}
+        for row_id, conversation_id, message_id, body, user_id, timestamp, metadata in records:
+            rows[row_id] = {
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "body": body,
+                "user_id": user_id,
+                "timestamp": json.loads(timestamp) if timestamp is not None else None,
+                "metadata": json.loads(metadata)
+            }
+        return rows
+
+    def _lookup(self, table: str, value: str) -> Optional[int]:
+        """Interned id of ``value`` without creating it"""
+        interned = self._interned[table].get(value)
+        if interned is not None:
+            return interned
+        row = self._conn.execute(f"SELECT id FROM {table} WHERE name = ?", (value,)).fetchone()
+        return row[0] if row else None
+
+    def filter_ids(
+        self,
+        conversation_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        start_time: Optional[Any] = None,
+        end_time: Optional[Any] = None
+    ) -> np.ndarray:
+        """
+        FAISS ids of rows matching every given filter
+
+        Args:
+            conversation_id: Only rows of this conversation
+            user_id: Only rows sent by this user
+            start_time: Inclusive lower bound (epoch ms or ISO-8601)
+            end_time: Inclusive upper bound (epoch ms or ISO-8601)
+
+        Returns:
+            Sorted int64 array of ids
+
+        Raises:
+            ValueError: ``start_time`` or ``end_time`` cannot be parsed
+        """
+        # A bound that does not parse would compare with NULL and match nothing
+        bounds = {}
+        for name, value in (("start_time", start_time), ("end_time", end_time)):
+            if value is not None:
+                bounds[name] = timestamp_ms(value)
+                if bounds[name] is None:
+                    raise ValueError(f"Invalid {name} {value!r}: expected epoch milliseconds or an ISO-8601 date")
+
+        clauses = []
+        params: List[Any] = []
+        with self._lock:
+            if conversation_id is not None:
+                conversation = self._lookup("conversations", str(conversation_id))
+                if conversation is None:
+                    return np.empty(0, dtype="int64")
+                clauses.append("conversation = ?")
+                params.append(conversation)
+            if user_id is not None:
+                user = self._lookup("users", str(user_id))
+                if user is None:
+                    return np.empty(0, dtype="int64")
+                clauses.append("user = ?")
+                params.append(user)
+            if "start_time" in bounds:
+                clauses.append("timestamp_ms >= ?")
+                params.append(bounds["start_time"])
+            if "end_time" in bounds:
+                clauses.append("timestamp_ms <= ?")
+                params.append(bounds["end_time"])
+
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            ids = [row[0] for row in self._conn.execute(f"SELECT id FROM messages {where} ORDER BY id", params)]
+        return np.array(ids, dtype="int64")
+
+    def find_ids(self, conversation_id: str, message_ids: Optional[List[str]] = None) -> List[int]:
+        """
+        Ids of the live rows of a conversation
+
+        Args:
+            conversation_id: Conversation to look in
+            message_ids: Only rows with these message ids (default: all rows)
+        """
+        with self._lock:
+            conversation = self._lookup("conversations", str(conversation_id))
+            if conversation is None:
+                return []
+            if message_ids is None:
+                records = self._conn.execute(
+                    "SELECT id FROM messages WHERE conversation = ?", (conversation,)
+                )
+                return [row[0] for row in records]
+
+            ids = []
+            # Stay below SQLite's bound parameter limit
+            for offset in range(0, len(message_ids), 500):
+                chunk = [str(m) for m in message_ids[offset:offset + 500]]
+                placeholders = ",".join("?" * len(chunk))
+                records = self._conn.execute(
+                    f"SELECT id FROM messages WHERE conversation = ? AND message_id IN ({placeholders})",
+                    [conversation] + chunk
+                )
+                ids.extend(row[0] for row in records)
+            return ids
+
+    def tombstone_ids(self) -> np.ndarray:
+        """Sorted int64 array of deleted ids whose vectors are still indexed"""
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM tombstones ORDER BY id")]
+        return np.array(ids, dtype="int64")
+
+    def get_state(self) -> Dict[str, Any]:
+        """Vector store bookkeeping saved with the last purge"""
+        with self._lock:
+            return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM store_state")}
+
+    def remap_ids(self, purged: np.ndarray, state: Dict[str, Any]):
+        """
+        Renumber rows after the vectors of ``purged`` ids left the index
+
+        Every id moves down by the number of purged ids below it, matching
+        the positions of the rebuilt index. ``state`` is saved in the same
+        transaction so a crash before the new snapshot is published can be
+        finished on the next start.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "DELETE FROM tombstones WHERE id = ?", [(int(i),) for i in purged]
+                )
+                for table in ("messages", "tombstones"):
+                    ids = np.array(
+                        [row[0] for row in self._conn.execute(f"SELECT id FROM {table} ORDER BY id")],
+                        dtype="int64"
+                    )
+                    shifted = ids - np.searchsorted(purged, ids)
+                    # Ascending order: each target id is already free
+                    self._conn.executemany(
+                        f"UPDATE {table} SET id = ? WHERE id = ?",
+                        [(int(new), int(old)) for new, old in zip(shifted, ids) if new != old]
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO store_state (key, value) VALUES (?, ?)",
+                    [(key, json.dumps(value)) for key, value in state.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def count_conversations(self) -> int:
+        """Distinct conversations with at least one stored message"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT conversation) FROM messages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,225 @@
+"""
+Prometheus-style metrics and per-request stage timings
+
+Components declare their histograms and counters at import time with
+``histogram`` / ``counter`` and observe into them; ``/metrics`` renders the
+registry in the Prometheus text format. Values that already live in a
+component's ``get_stats`` (queue depths, cache hit counts, index size) are
+read at scrape time by collectors instead of being tracked twice.
+
+Stage timings are also gathered per request for the ``Server-Timing``
+header: ``begin_request`` starts a collection in a context variable and
+``stage_timer`` / ``record_stage`` add to it. InferencePool copies the
+context into its worker threads, so model stages timed there count too.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; the long tail covers BART generation
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# (labels, value) or (labels, value, name suffix such as "_bucket")
+Sample = tuple
+# (metric name, type, description, samples)
+Family = Tuple[str, str, str, List[Sample]]
+
+_request_stages: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar(
+    "request_stages", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label combination"""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> Family:
+        with self._lock:
+            samples = [(dict(zip(self.labels, key)), value) for key, value in self._values.items()]
+        return self.name, "counter", self.description, samples
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination"""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (count per bucket, sum, count)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][position] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> Family:
+        samples = []
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(({**labels, "le": _format_value(float(bound))}, cumulative, "_bucket"))
+            samples.append(({**labels, "le": "+Inf"}, count, "_bucket"))
+            samples.append((labels, total, "_sum"))
+            samples.append((labels, count, "_count"))
+        return self.name, "histogram", self.description, samples
+
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-importing a module must not create a second series
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Register a callable returning (name, type, description, samples) families at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            families = [metric.collect() for metric in self._metrics.values()]
+            collectors = list(self._collectors)
+        for collector in collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, kind, description, samples in families:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                labels, value = sample[0], sample[1]
+                suffix = sample[2] if len(sample) > 2 else ""
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+histogram = registry.histogram
+counter = registry.counter
+
+
+def begin_request() -> Tuple[Dict[str, List[float]], contextvars.Token]:
+    """Start collecting stage timings for the current request"""
+    stages: Dict[str, List[float]] = {}
+    return stages, _request_stages.set(stages)
+
+
+def end_request(token: contextvars.Token):
+    _request_stages.reset(token)
+
+
+def record_stage(name: str, seconds: float):
+    """Add a stage's duration to the current request's Server-Timing, if any"""
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.setdefault(name, []).append(seconds)
+
+
+def merge_stages(stages: Dict[str, List[float]]):
+    """Add stages collected elsewhere (e.g. a shared batch) to the current request"""
+    for name, durations in stages.items():
+        for seconds in durations:
+            record_stage(name, seconds)
+
+
+@contextmanager
+def stage_timer(histogram: Optional[Histogram], timing: str, /, **labels):
+    """Time a block into ``histogram`` and the request's Server-Timing entry ``timing``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+        record_stage(timing, elapsed)
+
+
+def instrument_stages(target, stages: Dict[str, str], histogram: Histogram, prefix: str, **labels):
+    """
+    Wrap methods of a model object so each call is timed as a stage
+
+    Args:
+        target: Object whose methods are replaced on the instance
+        stages: Method name -> stage label; missing methods are skipped
+        histogram: Histogram with a ``stage`` label plus ``labels``
+        prefix: Server-Timing names are ``<prefix>.<stage>``
+    """
+    for method_name, stage in stages.items():
+        method = getattr(target, method_name, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, _stage=stage, **kwargs):
+            with stage_timer(histogram, f"{prefix}.{_stage}", stage=_stage, **labels):
+                return _method(*args, **kwargs)
+
+        setattr(target, method_name, timed)
+
+
+def server_timing(stages: Dict[str, List[float]], total: float) -> str:
+    """Server-Timing header value: total plus the summed duration of each stage"""
+    entries = [f"total;dur={total * 1000.0:.1f}"]
+    for name, durations in stages.items():
+        entries.append(f"{name};dur={sum(durations) * 1000.0:.1f}")
+    return ", ".join(entries)
@@ -0,0 +1,293 @@
+"""
+Append-only segment log and snapshot files for the vector store
+"""
+
+import json
+import logging
+import os
+import re
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process per store
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_RE = re.compile(r"^seg-(\d{12})\.npz$")
+
+
+def atomic_write(path: str, write: Callable[[Any], None], mode: str = "wb"):
+    """
+    Write a file so readers only ever see the old or the complete new version
+
+    ``write`` receives an open file object for a temp file next to ``path``;
+    the temp file is fsynced and renamed over ``path``.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class StoreLock:
+    """
+    Exclusive lock on a store directory shared by several processes
+
+    ``flock`` on ``write.lock``: processes serving the same store (serve.py
+    workers) take it around every change to the segment log, manifest and
+    metadata, so segment numbers and ids stay consistent. Nested use within
+    one process is counted, not re-locked; callers serialize their own
+    threads (VectorStore holds its lock around it).
+    """
+
+    def __init__(self, store_path: str):
+        self.path = os.path.join(store_path, "write.lock")
+        self._file = None
+        self._pid = None
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0 and fcntl is not None:
+            # flock belongs to the open file, which a forked child shares
+            # with its parent: every process opens its own
+            if self._pid != os.getpid():
+                self._file = open(self.path, "a")
+                self._pid = os.getpid()
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+
+class SegmentLog:
+    """
+    On-disk layout of the vector store
+
+    ``manifest.json`` names the current base snapshot (a FAISS index) and the
+    sequence number of the last segment folded into it. Every ingestion
+    appends one small segment file under ``segments/`` holding just its
+    vectors, metadata rows and the ids it deletes, so write cost does not
+    grow with the store. Compaction writes a new snapshot, swaps the
+    manifest and deletes the segments it absorbed. All files are written
+    with ``atomic_write`` so a crash never leaves a half-written file in
+    place.
+
+    Several processes may share one log (see StoreLock); ``last_seq`` is
+    then the last segment this process has applied, and ``reload_manifest``
+    picks up snapshots published by another one.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, store_path: str, clean: bool = True):
+        """
+        Args:
+            store_path: Store directory
+            clean: Remove temp files left by a crash; only the process that
+                writes snapshots may, others could delete one in progress
+        """
+        self.store_path = store_path
+        self.segments_path = os.path.join(store_path, "segments")
+        os.makedirs(self.segments_path, exist_ok=True)
+        if clean:
+            self._remove_temp_files()
+
+        self.manifest = self._read_manifest()
+        segments = self.list_segments()
+        self.last_seq = max(
+            [self.manifest["last_segment"]] + [seq for seq, _ in segments]
+        )
+
+    def _remove_temp_files(self):
+        """Drop temp files left behind by a crash mid-write"""
+        for directory in (self.store_path, self.segments_path):
+            for name in os.listdir(directory):
+                if ".tmp-" in name:
+                    os.remove(os.path.join(directory, name))
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        path = os.path.join(self.store_path, self.MANIFEST)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f)
+        return {"version": 1, "base": None, "last_segment": 0, "count": 0, "generation": 0}
+
+    def reload_manifest(self) -> Dict[str, Any]:
+        """Re-read the manifest, which another process may have replaced"""
+        self.manifest = self._read_manifest()
+        return self.manifest
+
+    def change_token(self) -> Tuple[int, ...]:
+        """Changes whenever a segment or snapshot is added or removed"""
+        tokens = []
+        for path in (self._path(self.MANIFEST), self.segments_path):
+            try:
+                stat = os.stat(path)
+                tokens.extend((stat.st_mtime_ns, stat.st_ino, stat.st_size))
+            except FileNotFoundError:
+                tokens.extend((0, 0, 0))
+        return tuple(tokens)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.store_path, name)
+
+    # Segments
+
+    def list_segments(self, after_seq: int = 0) -> List[Tuple[int, str]]:
+        """(seq, path) of segment files newer than ``after_seq``, oldest first"""
+        segments = []
+        for name in os.listdir(self.segments_path):
+            match = _SEGMENT_RE.match(name)
+            if match and int(match.group(1)) > after_seq:
+                segments.append((int(match.group(1)), os.path.join(self.segments_path, name)))
+        return sorted(segments)
+
+    @property
+    def pending_segments(self) -> int:
+        """Segments written since the current base snapshot"""
+        return self.last_seq - self.manifest["last_segment"]
+
+    @property
+    def generation(self) -> int:
+        """Number of purges the current base snapshot has been through"""
+        return self.manifest.get("generation", 0)
+
+    def append(
+        self,
+        vectors: np.ndarray,
+        rows: List[Dict[str, Any]],
+        deleted: Optional[np.ndarray] = None
+    ) -> int:
+        """
+        Persist one batch of vectors and their metadata rows as a new segment
+
+        Args:
+            vectors: Vectors appended to the index
+            rows: One metadata row per vector
+            deleted: Ids tombstoned by this batch
+
+        Returns:
+            Sequence number of the segment
+        """
+        seq = self.last_seq + 1
+        path = os.path.join(self.segments_path, f"seg-{seq:012d}.npz")
+        payload = np.frombuffer(json.dumps(rows, separators=(",", ":")).encode("utf-8"), dtype=np.uint8)
+        deleted = np.asarray(deleted if deleted is not None else [], dtype="int64")
+        atomic_write(path, lambda f: np.savez(f, vectors=vectors, metadata=payload, deleted=deleted))
+        self.last_seq = seq
+        return seq
+
+    def replay(self, after_seq: int) -> Iterator[Tuple[int, np.ndarray, List[Dict[str, Any]], np.ndarray]]:
+        """Yield (seq, vectors, rows, deleted ids) for every segment newer than ``after_seq``"""
+        for seq, path in self.list_segments(after_seq):
+            with np.load(path) as segment:
+                vectors = segment["vectors"]
+                rows = json.loads(segment["metadata"].tobytes().decode("utf-8"))
+                # Segments written before deletes existed have no ``deleted``
+                deleted = segment["deleted"] if "deleted" in segment.files else np.empty(0, dtype="int64")
+            yield seq, vectors, rows, deleted
+
+    # Snapshots
+
+    def snapshot_paths(self, name: Optional[str] = None) -> Tuple[str, str]:
+        """(index path, metadata path) of a base snapshot"""
+        name = name or self.manifest["base"]
+        return self._path(f"{name}.faiss"), self._path(f"{name}.meta.jsonl")
+
+    def read_snapshot_metadata(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Metadata rows stored alongside the current base snapshot
+
+        Only snapshots written before metadata moved to SQLite have them;
+        returns None otherwise.
+        """
+        _, metadata_path = self.snapshot_paths()
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @staticmethod
+    def snapshot_name(seq: int, generation: int = 0) -> str:
+        """Base snapshot name; purged snapshots get their own name per generation"""
+        return f"base-{seq:012d}" if generation == 0 else f"base-{seq:012d}-g{generation}"
+
+    def write_snapshot(
+        self,
+        seq: int,
+        write_index: Callable[[str], None],
+        count: int,
+        generation: Optional[int] = None,
+        index_type: Optional[str] = None,
+        lock: Optional[ContextManager] = None
+    ):
+        """
+        Publish a base snapshot covering every segment up to ``seq``
+
+        Args:
+            seq: Last segment folded into the snapshot
+            write_index: Writes the FAISS index to the path it is given
+            count: Number of vectors in the snapshot
+            generation: Purge generation of the snapshot (default: unchanged)
+            index_type: Index type recorded in the manifest
+            lock: Held while publishing (not while writing the index file),
+                so processes sharing the log never see segments vanish mid-read
+        """
+        generation = self.generation if generation is None else generation
+        name = self.snapshot_name(seq, generation)
+        self.write_index_file(name, write_index)
+        with lock if lock is not None else nullcontext():
+            self.publish(name, seq, count, generation, index_type)
+
+    def write_index_file(self, name: str, write_index: Callable[[str], None]):
+        """Write the FAISS index of snapshot ``name`` without publishing it"""
+        index_path, _ = self.snapshot_paths(name)
+
+        tmp_index_path = f"{index_path}.tmp-{os.getpid()}"
+        try:
+            write_index(tmp_index_path)
+            with open(tmp_index_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_index_path, index_path)
+        finally:
+            if os.path.exists(tmp_index_path):
+                os.remove(tmp_index_path)
+
+    def publish(self, name: str, seq: int, count: int, generation: int, index_type: Optional[str] = None):
+        """Point the manifest at snapshot ``name`` and drop what it replaced"""
+        previous = self.manifest.get("base")
+        manifest = {"version": 1, "base": name, "last_segment": seq, "count": count, "generation": generation}
+        if index_type is not None:
+            # Lets other processes notice an index type migration
+            manifest["index_type"] = index_type
+        atomic_write(self._path(self.MANIFEST), lambda f: json.dump(manifest, f), mode="w")
+        self.manifest = manifest
+
+        # The manifest now points at the new snapshot; drop what it replaced
+        for old_seq, path in self.list_segments():
+            if old_seq <= seq:
+                os.remove(path)
+        if previous and previous != name:
+            for path in self.snapshot_paths(previous):
+                if os.path.exists(path):
+                    os.remove(path)
+        for legacy in ("index.faiss", "metadata.json"):
+            if os.path.exists(self._path(legacy)):
+                os.remove(self._path(legacy))
+
+        logger.info(f"Compacted vector store into {name} with {count} entries")
@@ -3,13 +3,117 @@ Message Prioritization - Ranks messages by importance
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from datetime import datetime
 import re
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
+class KeywordMatcher:
+    """
+    Finds which of a fixed set of keywords occur in each text of a batch
+    
+    The keywords form a byte trie. A batch is encoded into one buffer and the
+    trie is walked over all start positions at once: one scan over byte
+    pairs finds where a keyword can start, each node keeps the positions
+    whose bytes so far spell its prefix, and its children narrow them down
+    with one vectorized comparison per byte. Keywords sharing a
+    prefix ("wh" in "what", "when", "where", "why") share that work, and
+    every text is covered in the same pass.
+    
+    Matching is on UTF-8 bytes, which gives the same answer as ``keyword in
+    text``: ASCII bytes never occur inside a multi-byte character.
+    """
+    
+    # Smaller batches are checked one text at a time
+    MIN_BATCH = 100
+    
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = list(keywords)
+        # node: (children by byte, indices of keywords ending here)
+        self._root = ({}, [])
+        self._max_length = 0
+        for index, keyword in enumerate(self.keywords):
+            encoded = keyword.encode("utf-8")
+            if not encoded:
+                raise ValueError("Keywords must not be empty")
+            node = self._root
+            for byte in encoded:
+                node = node[0].setdefault(byte, ({}, []))
+            node[1].append(index)
+            self._max_length = max(self._max_length, len(encoded))
+        # The walk starts from byte pairs: single bytes are too common to
+        # make good first candidates. Keywords of one byte are found directly.
+        self._single_bytes = [(byte, child[1]) for byte, child in self._root[0].items() if child[1]]
+        self._pair_nodes = {
+            (first << 8) | second: grandchild
+            for first, child in self._root[0].items()
+            for second, grandchild in child[0].items()
+        }
+        self._pair_starts = np.zeros(1 << 16, dtype=bool)
+        self._pair_starts[list(self._pair_nodes)] = True
+    
+    def match(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Which keywords each text contains
+        
+        Args:
+            texts: Texts to search
+            
+        Returns:
+            Boolean array of shape (len(texts), len(keywords))
+        """
+        if len(texts) < self.MIN_BATCH:
+            # Setting up the walk costs more than it saves on a few texts
+            return np.array(
+                [[keyword in text for keyword in self.keywords] for text in texts], dtype=bool
+            ).reshape(len(texts), len(self.keywords))
+        found = np.zeros((len(texts), len(self.keywords)), dtype=bool)
+        if not self.keywords:
+            return found
+        
+        encoded = [text.encode("utf-8") for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        starts = np.zeros(len(encoded), dtype=np.int64)
+        np.cumsum(lengths[:-1] + 1, out=starts[1:])
+        # Texts are separated by NUL and the buffer is padded so that reading
+        # past a text's end never leaves the buffer; no keyword contains NUL
+        data = np.frombuffer(b"\0".join(encoded) + b"\0" * self._max_length, dtype=np.uint8)
+        
+        # (trie node, positions where its prefix starts, prefix length)
+        pending = [(({}, ends), np.flatnonzero(data == byte), 1) for byte, ends in self._single_bytes]
+        
+        # One scan of the whole buffer finds the positions that can start a
+        # keyword of two or more bytes; deeper nodes only look at their
+        # parent's positions
+        pairs = (data[:-1].astype(np.uint16) << 8) | data[1:]
+        candidates = np.flatnonzero(self._pair_starts[pairs])
+        # Group them by pair in one stable sort, keeping each group in buffer order
+        codes = pairs[candidates]
+        order = np.argsort(codes, kind="stable")
+        candidates, codes = candidates[order], codes[order]
+        for code, node in self._pair_nodes.items():
+            low, high = np.searchsorted(codes, code, side="left"), np.searchsorted(codes, code, side="right")
+            pending.append((node, candidates[low:high], 2))
+        
+        while pending:
+            (children, ends), positions, depth = pending.pop()
+            if positions.size == 0:
+                continue
+            if ends:
+                rows = np.searchsorted(starts, positions, side="right") - 1
+                for index in ends:
+                    found[rows, index] = True
+            if children:
+                following = data[positions + depth]
+                for byte, child in children.items():
+                    pending.append((child, positions[following == byte], depth + 1))
+        return found
+
+
 class MessagePrioritizer:
     """
     Ranks messages by importance using multiple factors
@@ -31,6 +135,9 @@ class MessagePrioritizer:
     ]
     
     def __init__(self):
+        self._matcher = KeywordMatcher(
+            self.URGENT_KEYWORDS + self.PROBLEM_KEYWORDS + self.QUESTION_KEYWORDS
+        )
         logger.info("MessagePrioritizer initialized")
     
     def rank(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -46,21 +153,147 @@ class MessagePrioritizer:
         if not messages:
             return []
         
-        # Score each message
-        scored_messages = []
-        for msg in messages:
-            score = self._calculate_priority_score(msg)
-            msg_copy = msg.copy()
-            msg_copy["priority_score"] = score
-            scored_messages.append(msg_copy)
-        
-        # Sort by score (descending)
-        ranked = sorted(scored_messages, key=lambda x: x["priority_score"], reverse=True)
+        # Score each message and sort by score (descending)
+        positions, scores = self.select(messages)
+        ranked = []
+        for position in positions:
+            msg_copy = messages[position].copy()
+            msg_copy["priority_score"] = scores[position]
+            ranked.append(msg_copy)
         
-        logger.info(f"Ranked {len(ranked)} messages")
+        logger.debug(f"Ranked {len(ranked)} messages")
         return ranked
     
-    def _calculate_priority_score(self, message: Dict[str, Any]) -> float:
+    def top(self, messages: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """
+        The k highest-priority messages, in the same order as rank()[:k]
+        
+        Selects with select() instead of sorting everything, and only copies
+        the messages it returns.
+        
+        Args:
+            messages: List of message dictionaries with at least 'body' field
+            k: Number of messages to return
+            
+        Returns:
+            Up to k messages with their priority_score, highest first
+        """
+        if not messages or k <= 0:
+            return []
+        
+        positions, scores = self.select(messages, k)
+        
+        top = []
+        for position in positions:
+            msg_copy = messages[position].copy()
+            msg_copy["priority_score"] = scores[position]
+            top.append(msg_copy)
+        
+        logger.debug(f"Selected top {len(top)} of {len(messages)} messages")
+        return top
+    
+    def select(self, messages: List[Dict[str, Any]], k: Optional[int] = None) -> Tuple[List[int], List[float]]:
+        """
+        Positions of the k highest-priority messages, without copying them
+        
+        The order is the same as rank(): highest score first, input order
+        among equal scores. With k smaller than the batch, the k best are
+        picked by partial selection and only those are sorted.
+        
+        Args:
+            messages: List of message dictionaries with at least 'body' field
+            k: Number of positions to return (default: all)
+            
+        Returns:
+            (positions into ``messages`` in rank order, score of every message)
+        """
+        scores = self.score_batch(messages)
+        if k is not None and k <= 0:
+            return [], scores
+        negated = -np.asarray(scores, dtype=np.float64)
+        if k is None or k >= len(scores):
+            return np.argsort(negated, kind="stable").tolist(), scores
+        
+        # Everything scoring above the k-th score, then the earliest of the
+        # messages tied with it
+        cutoff = np.partition(negated, k - 1)[k - 1]
+        above = np.flatnonzero(negated < cutoff)
+        tied = np.flatnonzero(negated == cutoff)[:k - len(above)]
+        chosen = np.sort(np.concatenate((above, tied)))
+        return chosen[np.argsort(negated[chosen], kind="stable")].tolist(), scores
+    
+    def score_batch(self, messages: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[float]:
+        """
+        Priority scores for a batch of messages
+        
+        Same scores as _calculate_priority_score, computed as arrays over the
+        whole batch: keywords are found with one KeywordMatcher pass and the
+        factors are added in the same order, so the floats come out
+        identical. Recency is measured against a single reference time.
+        
+        Args:
+            messages: List of message dictionaries with at least 'body' field
+            now: Reference time for recency (default: datetime.now())
+            
+        Returns:
+            One score per message, in input order
+        """
+        if not messages:
+            return []
+        now = now or datetime.now()
+        count = len(messages)
+        bodies = [msg.get("body", "").lower() for msg in messages]
+        found = self._matcher.match(bodies).astype(np.int64)
+        urgent_end = len(self.URGENT_KEYWORDS)
+        problem_end = urgent_end + len(self.PROBLEM_KEYWORDS)
+        
+        word_counts = np.fromiter((len(body.split()) for body in bodies), dtype=np.int64, count=count)
+        recency = np.fromiter((self._recency_score(msg, now) for msg in messages), dtype=np.float64, count=count)
+        # Batches come from a handful of senders: check each one once
+        user_ids = [msg.get("user_id", "") for msg in messages]
+        important = {user_id: self._is_important_user({"user_id": user_id}) for user_id in set(user_ids)}
+        important_user = np.fromiter(map(important.__getitem__, user_ids), dtype=bool, count=count)
+        mentions = np.fromiter(("@" in body for body in bodies), dtype=bool, count=count)
+        exclamations = np.fromiter((body.count("!") for body in bodies), dtype=np.int64, count=count)
+        
+        score = np.zeros(count, dtype=np.float64)
+        score += np.minimum(word_counts / 50.0, 2.0)
+        score += found[:, :urgent_end].sum(axis=1) * 3.0
+        score += found[:, urgent_end:problem_end].sum(axis=1) * 2.0
+        score += found[:, problem_end:].sum(axis=1) * 1.0
+        score += recency
+        score += np.where(important_user, 1.5, 0.0)
+        score += np.where(mentions, 1.0, 0.0)
+        score += np.minimum(exclamations * 0.5, 2.0)
+        
+        # Python's round, not np.round: they differ on some halfway cases
+        return [round(value, 2) for value in score.tolist()]
+    
+    def _recency_score(self, message: Dict[str, Any], now: datetime) -> float:
+        """Up to 2.0 for messages from the last 24 hours, decaying linearly"""
+        timestamp = message.get("timestamp") or message.get("origin_server_ts")
+        if timestamp:
+            try:
+                # Convert to datetime if it's a timestamp
+                if isinstance(timestamp, (int, float)):
+                    msg_time = datetime.fromtimestamp(timestamp / 1000)
+                else:
+                    msg_time = datetime.fromisoformat(str(timestamp))
+                
+                # More recent = higher score
+                hours_ago = (now - msg_time).total_seconds() / 3600
+                if hours_ago < 24:
+                    return 2.0 - (hours_ago / 24.0)  # Decay over 24 hours
+            except Exception as e:
+                logger.warning(f"Error parsing timestamp: {e}")
+        return 0.0
+    
+    @staticmethod
+    def _is_important_user(message: Dict[str, Any]) -> bool:
+        user_id = message.get("user_id", "")
+        return "admin" in user_id.lower() or "support" in user_id.lower()
+    
+    def _calculate_priority_score(self, message: Dict[str, Any], now: Optional[datetime] = None) -> float:
         """
         Calculate priority score for a message
         
@@ -71,6 +304,9 @@ class MessagePrioritizer:
         - Question keywords
         - Timestamp (recent = more important)
         - User importance (if available)
+        
+        Scores one message at a time; score_batch gives the same results
+        for whole batches faster.
         """
         score = 0.0
         body = message.get("body", "").lower()
@@ -92,26 +328,10 @@ class MessagePrioritizer:
         score += question_count * 1.0
         
         # Timestamp factor (if available)
-        timestamp = message.get("timestamp") or message.get("origin_server_ts")
-        if timestamp:
-            try:
-                # Convert to datetime if it's a timestamp
-                if isinstance(timestamp, (int, float)):
-                    msg_time = datetime.fromtimestamp(timestamp / 1000)
-                else:
-                    msg_time = datetime.fromisoformat(str(timestamp))
-                
-                # More recent = higher score
-                now = datetime.now()
-                hours_ago = (now - msg_time).total_seconds() / 3600
-                if hours_ago < 24:
-                    score += 2.0 - (hours_ago / 24.0)  # Decay over 24 hours
-            except Exception as e:
-                logger.warning(f"Error parsing timestamp: {e}")
+        score += self._recency_score(message, now or datetime.now())
         
         # User importance (if available)
-        user_id = message.get("user_id", "")
-        if "admin" in user_id.lower() or "support" in user_id.lower():
+        if self._is_important_user(message):
             score += 1.5
         
         # Mentions or @ symbols
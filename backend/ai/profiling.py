@@ -0,0 +1,257 @@
+"""
+Slow-request flight recorder
+
+Every request is registered with the recorder when it starts. A sampler
+thread sleeps until the oldest in-flight request passes ``threshold_ms``,
+then samples the stacks of the threads working for the slow requests every
+``interval_ms``: the event loop thread plus the pool workers running their
+jobs (``attach_thread``). Requests that finish over the threshold keep their
+samples in a ring buffer of the last ``capacity`` profiles, which
+``collapsed`` renders as collapsed stacks (``frame;frame;frame count``) for
+flamegraph.pl or speedscope.
+
+While every request is fast nothing is sampled: the cost is registering
+each request and one context variable lookup per pool job.
+"""
+
+import contextvars
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_active_profiles: contextvars.ContextVar[Tuple["RequestProfile", ...]] = contextvars.ContextVar(
+    "active_profiles", default=()
+)
+
+
+class RequestProfile:
+    """One request: the threads working for it and the stacks sampled from them"""
+
+    def __init__(self, profile_id: int, method: str, path: str, loop_thread: int):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        # Collapsed stack -> sample count
+        self.samples: Dict[str, int] = {}
+        self._threads: Dict[int, int] = {loop_thread: 1}
+        self._lock = threading.Lock()
+
+    def attach(self, thread_id: int):
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def detach(self, thread_id: int):
+        with self._lock:
+            count = self._threads.get(thread_id, 0) - 1
+            if count > 0:
+                self._threads[thread_id] = count
+            else:
+                self._threads.pop(thread_id, None)
+
+    def threads(self) -> List[int]:
+        with self._lock:
+            return list(self._threads)
+
+    def add_sample(self, stack: str):
+        with self._lock:
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def sample_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.samples)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.sample_counts().values())
+        }
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    short = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+    # co_qualname (3.11+) includes the class
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({short}:{code.co_firstlineno})"
+
+
+def _collapse(frame, max_depth: int) -> str:
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(label.replace(";", ":") for label in labels)
+
+
+class FlightRecorder:
+    """
+    Samples requests slower than ``threshold_ms`` and keeps the last ``capacity``
+
+    Args:
+        threshold_ms: Requests running longer than this are sampled and kept
+        capacity: Number of slow-request profiles kept
+        interval_ms: Time between stack samples of a slow request
+        max_depth: Frames kept per stack, counted from the innermost
+    """
+
+    def __init__(self, threshold_ms: float, capacity: int = 20, interval_ms: float = 5.0, max_depth: int = 128):
+        self.threshold = max(0.0, threshold_ms) / 1000.0
+        self.capacity = max(1, capacity)
+        self.interval = max(0.1, interval_ms) / 1000.0
+        self.max_depth = max(1, max_depth)
+
+        self._active: Dict[int, RequestProfile] = {}
+        self._profiles = deque(maxlen=self.capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._sampler: Optional[threading.Thread] = None
+        self._stopped = False
+
+        # Stats
+        self._recorded = 0
+        self._sample_passes = 0
+
+    def start(self, method: str, path: str) -> RequestProfile:
+        """Register a request; call on the event loop thread that serves it"""
+        profile = RequestProfile(next(self._ids), method, path, threading.get_ident())
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="flight-recorder", daemon=True)
+                self._sampler.start()
+            elif len(self._active) == 1:
+                # The sampler sleeps without a deadline while nothing is in flight
+                self._wake.notify()
+        return profile
+
+    def finish(self, profile: RequestProfile, status: int, path: Optional[str] = None):
+        """Unregister a request and keep its profile if it was slow"""
+        duration = time.monotonic() - profile.started
+        profile.status = status
+        profile.duration_ms = round(duration * 1000.0, 1)
+        if path is not None:
+            profile.path = path
+        with self._lock:
+            self._active.pop(profile.id, None)
+            if duration >= self.threshold:
+                self._profiles.append(profile)
+                self._recorded += 1
+
+    def profiles(self) -> List[RequestProfile]:
+        """Kept profiles, oldest first"""
+        with self._lock:
+            return list(self._profiles)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold * 1000.0,
+                "capacity": self.capacity,
+                "interval_ms": self.interval * 1000.0,
+                "in_flight": len(self._active),
+                "recorded": self._recorded,
+                "sample_passes": self._sample_passes
+            }
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._wake.notify()
+
+    def _slow_profiles(self) -> Optional[List[RequestProfile]]:
+        """Wait until some in-flight request is over the threshold; None once stopped"""
+        with self._lock:
+            while not self._stopped:
+                now = time.monotonic()
+                slow = [profile for profile in self._active.values() if now - profile.started >= self.threshold]
+                if slow:
+                    self._sample_passes += 1
+                    return slow
+                if self._active:
+                    # Sleep until the oldest request turns slow
+                    self._wake.wait(min(profile.started for profile in self._active.values()) + self.threshold - now)
+                else:
+                    self._wake.wait()
+        return None
+
+    def _run(self):
+        while True:
+            slow = self._slow_profiles()
+            if slow is None:
+                return
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            try:
+                for profile in slow:
+                    for thread_id in profile.threads():
+                        frame = frames.get(thread_id)
+                        if frame is None:
+                            continue
+                        profile.add_sample(f"{names.get(thread_id, thread_id)};{_collapse(frame, self.max_depth)}")
+            finally:
+                # Frames reference their locals; do not keep them alive
+                del frames
+            time.sleep(self.interval)
+
+
+def current_profiles() -> Tuple[RequestProfile, ...]:
+    """Profiles of the request(s) the current context works for"""
+    return _active_profiles.get()
+
+
+@contextmanager
+def activate(profiles: Iterable[RequestProfile]):
+    """Attribute work started in this context (e.g. pool jobs) to ``profiles``"""
+    token = _active_profiles.set(tuple(profiles))
+    try:
+        yield
+    finally:
+        _active_profiles.reset(token)
+
+
+@contextmanager
+def attach_thread():
+    """Sample the current thread as part of the context's requests while the block runs"""
+    profiles = _active_profiles.get()
+    if not profiles:
+        yield
+        return
+    thread_id = threading.get_ident()
+    for profile in profiles:
+        profile.attach(thread_id)
+    try:
+        yield
+    finally:
+        for profile in profiles:
+            profile.detach(thread_id)
+
+
+def collapsed(profiles: Iterable[RequestProfile]) -> str:
+    """
+    Collapsed stacks of ``profiles``, one ``stack count`` line each
+
+    The root frame is the request (``POST /summarize #12 2310ms``), then the
+    thread name, so flame graphs of several requests stay apart.
+    """
+    lines = []
+    for profile in profiles:
+        root = f"{profile.method} {profile.path} #{profile.id} {profile.duration_ms:.0f}ms"
+        for stack, count in sorted(profile.sample_counts().items()):
+            lines.append(f"{root};{stack} {count}")
+    return "\n".join(lines) + ("\n" if lines else "")
@@ -0,0 +1,82 @@
+"""
+Deterministic stand-ins for the transformer models, for benchmarks and local runs
+
+They load instantly and need no weights, torch or transformers. Outputs are
+shaped like the real models' so every code path around them runs, but they
+carry no meaning: summaries are the leading words of the input and
+embeddings are sums of per-word random vectors (texts sharing words end up
+close, nothing more).
+"""
+
+import hashlib
+import re
+import threading
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the calling conventions of a transformers tokenizer"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._words: List[str] = []
+        self._lock = threading.Lock()
+
+    def _encode(self, text: str) -> List[int]:
+        ids = []
+        with self._lock:
+            for word in text.split():
+                token_id = self._ids.get(word)
+                if token_id is None:
+                    token_id = self._ids[word] = len(self._words)
+                    self._words.append(word)
+                ids.append(token_id)
+        return ids
+
+    def __call__(self, text: Union[str, List[str]], add_special_tokens: bool = True, **kwargs) -> Dict[str, Any]:
+        if isinstance(text, str):
+            return {"input_ids": self._encode(text)}
+        return {"input_ids": [self._encode(item) for item in text]}
+
+    def decode(self, ids: List[int], skip_special_tokens: bool = True) -> str:
+        return " ".join(self._words[token_id] for token_id in ids)
+
+
+class StubSummarizationPipeline:
+    """Summarization pipeline returning the first ``max_length`` words of each text"""
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, texts: Union[str, List[str]], max_length: int = 150, **kwargs) -> List[Dict[str, str]]:
+        if isinstance(texts, str):
+            texts = [texts]
+        return [{"summary_text": " ".join(text.split()[:max_length])} for text in texts]
+
+
+class StubSentenceEncoder:
+    """SentenceTransformer-style encoder built from seeded per-word vectors"""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._vectors: Dict[str, np.ndarray] = {}
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        vector = self._vectors.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = self._vectors[word] = np.random.default_rng(seed).standard_normal(self.dimension)
+        return vector
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            if words:
+                vector = sum(self._word_vector(word) for word in words)
+                embeddings[row] = vector / max(np.linalg.norm(vector), 1e-12)
+        return embeddings
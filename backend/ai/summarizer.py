@@ -3,38 +3,95 @@ Conversation Summarization using Hugging Face BART model
 """
 
 import logging
-# Note: transformers and torch are installed in Docker container
-# For local IDE support, install: pip install -r requirements.txt
-from transformers import pipeline
-import torch
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from ai import metrics
+from ai.inference_backend import (
+    MODEL_STAGE_SECONDS,
+    PIPELINE_STAGES,
+    check_backend,
+    instrument_model,
+    load_summarization_pipeline,
+    model_tag
+)
+from ai.loading import LazyComponent
+from ai.summary_cache import SummaryCache, summary_key
 
 logger = logging.getLogger(__name__)
 
 
-class ConversationSummarizer:
+class ConversationSummarizer(LazyComponent):
     """
     Summarizes conversations using facebook/bart-large-cnn model
     """
     
-    def __init__(self):
-        logger.info("Loading BART summarization model...")
+    component_name = "summarizer"
+    
+    def __init__(
+        self,
+        lazy: bool = False,
+        chunk_tokens: int = 900,
+        chunk_batch_size: int = 8,
+        cache: Optional[SummaryCache] = None,
+        backend: str = "torch",
+        onnx_export_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            lazy: Defer loading the model until first use (or ensure_loaded())
+            chunk_tokens: Size of the chunks summarize_long splits its input
+                into (BART reads at most 1024 tokens)
+            chunk_batch_size: Chunks summarized per pipeline call in summarize_long
+            cache: Cache consulted before the model (default: none)
+            backend: Inference backend, one of INFERENCE_BACKENDS
+                (torch fp32, int8 dynamic quantization or onnx)
+            onnx_export_dir: Where the onnx backend keeps exported models
+                between starts (default: export on every start)
+        """
+        super().__init__()
+        self.summarizer = None
+        self.tokenizer = None
+        self.model_id = None
+        self.cache = cache
+        self.backend = check_backend(backend)
+        self.onnx_export_dir = onnx_export_dir
+        self.chunk_tokens = chunk_tokens
+        self.chunk_batch_size = chunk_batch_size
+        # Partial summaries must be several times shorter than a chunk so
+        # every reduce level packs a few of them into one chunk
+        self.chunk_summary_tokens = max(32, chunk_tokens // 7)
+        if not lazy:
+            self.ensure_loaded()
+    
+    def _load(self):
+        # transformers and torch are imported by the backend loader, so the
+        # service starts without paying for them
+        # For local IDE support, install: pip install -r requirements.txt
+        logger.info(f"Loading BART summarization model ({self.backend} backend)...")
         try:
             # Use pipeline for easier usage
-            self.summarizer = pipeline(
-                "summarization",
-                model="facebook/bart-large-cnn",
-                device=-1 if not torch.cuda.is_available() else 0
+            self.summarizer = load_summarization_pipeline(
+                "facebook/bart-large-cnn",
+                backend=self.backend,
+                device=None,
+                export_dir=self.onnx_export_dir
             )
+            self.model_id = model_tag("facebook/bart-large-cnn", self.backend)
             logger.info("BART model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading BART model: {e}")
             # Fallback to a smaller model if BART fails
             logger.info("Falling back to distilbart model...")
-            self.summarizer = pipeline(
-                "summarization",
-                model="sshleifer/distilbart-cnn-12-6",
-                device=-1
+            self.summarizer = load_summarization_pipeline(
+                "sshleifer/distilbart-cnn-12-6",
+                backend=self.backend,
+                device=-1,
+                export_dir=self.onnx_export_dir
             )
+            self.model_id = model_tag("sshleifer/distilbart-cnn-12-6", self.backend)
+        self.tokenizer = self.summarizer.tokenizer
+        instrument_model(self.summarizer, "summarizer", "summarize", PIPELINE_STAGES)
     
     def summarize(self, text: str, max_length: int = 150, min_length: int = 30) -> str:
         """
@@ -48,31 +105,244 @@ class ConversationSummarizer:
         Returns:
             Summarized text
         """
-        if not text or len(text.strip()) == 0:
-            return "No text to summarize."
+        return self.summarize_batch([text], max_length=max_length, min_length=min_length)[0]
+    
+    def summarize_batch(
+        self,
+        texts: List[str],
+        max_length: int = 150,
+        min_length: int = 30
+    ) -> List[str]:
+        """
+        Summarize several texts in a single padded pipeline call
         
-        # BART has token limit, truncate if needed
-        max_input_length = 1024
-        if len(text) > max_input_length:
-            text = text[:max_input_length]
-            logger.warning(f"Text truncated to {max_input_length} characters")
+        Cached summaries are returned without running the model, and a text
+        repeated within the batch is summarized once.
+        
+        Args:
+            texts: Input conversation texts
+            max_length: Maximum length of each summary
+            min_length: Minimum length of each summary
+            
+        Returns:
+            Summaries in the same order as the inputs
+        """
+        self.ensure_loaded()
+        
+        summaries = [None] * len(texts)
+        # Truncated text -> positions waiting for its summary
+        pending: Dict[str, List[int]] = {}
         
+        for position, text in enumerate(texts):
+            if not text or len(text.strip()) == 0:
+                summaries[position] = "No text to summarize."
+                continue
+            text = self._truncate(text)
+            if text in pending:
+                pending[text].append(position)
+                continue
+            if self.cache is not None:
+                cached = self.cache.get(summary_key(text, max_length, min_length, self.model_id))
+                if cached is not None:
+                    summaries[position] = cached
+                    continue
+            pending[text] = [position]
+        
+        if not pending:
+            return summaries
+        
+        batch_texts = list(pending)
         try:
-            result = self.summarizer(
-                text,
-                max_length=max_length,
-                min_length=min_length,
-                do_sample=False
-            )
+            with metrics.stage_timer(MODEL_STAGE_SECONDS, "summarize", model="summarizer", stage="total"):
+                results = self.summarizer(
+                    batch_texts,
+                    max_length=max_length,
+                    min_length=min_length,
+                    do_sample=False,
+                    truncation=True,
+                    batch_size=len(batch_texts)
+                )
             
-            summary = result[0]["summary_text"]
-            logger.info(f"Generated summary of length {len(summary)}")
-            return summary
+            for text, result in zip(batch_texts, results):
+                for position in pending[text]:
+                    summaries[position] = result["summary_text"]
+                if self.cache is not None:
+                    self.cache.put(summary_key(text, max_length, min_length, self.model_id), result["summary_text"])
+            logger.debug(f"Generated {len(batch_texts)} summaries in one batch")
             
         except Exception as e:
             logger.error(f"Error during summarization: {e}")
-            # Fallback: return first sentence or truncated text
-            sentences = text.split(". ")
-            if sentences:
-                return sentences[0] + "."
-            return text[:200] + "..."
+            # Fallbacks are not cached so the model is retried next time
+            for text in batch_texts:
+                for position in pending[text]:
+                    summaries[position] = self._fallback_summary(text)
+        
+        return summaries
+    
+    def summarize_long(
+        self,
+        messages: Union[str, List[str]],
+        max_length: int = 150,
+        min_length: int = 30,
+        token_budget: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> str:
+        """
+        Map-reduce summary of input longer than the model's context
+        
+        Messages are packed into chunks of at most ``chunk_tokens`` tokens on
+        message boundaries (a longer message is split on token boundaries)
+        and the chunks are summarized in batches. The partial summaries are
+        packed and summarized again until they fit in one chunk, which gets
+        the final summary.
+        
+        Args:
+            messages: Conversation messages in order, or one text whose lines
+                are the messages
+            max_length: Maximum length of the final summary
+            min_length: Minimum length of the final summary
+            token_budget: Most input tokens to read; longer input is sampled
+                evenly across the conversation
+            time_budget: Seconds after which no further model calls are
+                started; the summary is then assembled extractively from
+                what has been summarized so far
+            
+        Returns:
+            Summarized text
+        """
+        self.ensure_loaded()
+        if isinstance(messages, str):
+            messages = messages.split("\n")
+        messages = [message.strip() for message in messages if message and message.strip()]
+        if not messages:
+            return "No text to summarize."
+        
+        started = time.perf_counter()
+        deadline = time.monotonic() + time_budget if time_budget else None
+        
+        def expired() -> bool:
+            return deadline is not None and time.monotonic() > deadline
+        
+        pieces = self._split_tokens(messages)
+        total_tokens = sum(count for _, count in pieces)
+        if token_budget and total_tokens > token_budget:
+            pieces = self._sample(pieces, token_budget)
+        
+        chunks = self._pack(pieces)
+        levels = 0
+        while len(chunks) > 1 and not expired():
+            levels += 1
+            partials = self._summarize_chunks(chunks, deadline)
+            packed = self._pack(self._split_tokens(partials))
+            if len(packed) >= len(chunks):
+                # Partials did not shrink (fallback summaries); stop here
+                chunks = partials
+                break
+            chunks = packed
+        
+        if len(chunks) == 1 and not expired():
+            summary = self.summarize_batch(chunks, max_length=max_length, min_length=min_length)[0]
+        else:
+            # Give every chunk an equal share so the whole input is represented
+            share = max(1, max_length // len(chunks))
+            summary = " ".join(
+                self._truncate_tokens(self._fallback_summary(chunk), share) for chunk in chunks
+            )
+            logger.warning("Long summary stopped early (time budget or failed chunk summaries), returning an extract")
+        
+        logger.debug(
+            f"Summarized {len(messages)} messages ({total_tokens} tokens) through "
+            f"{levels} reduce levels in {time.perf_counter() - started:.2f}s"
+        )
+        return summary
+    
+    def _split_tokens(self, texts: List[str]) -> List[Tuple[str, int]]:
+        """(text, token count) pieces, splitting texts longer than a chunk"""
+        pieces = []
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        for text, ids in zip(texts, encoded):
+            if len(ids) <= self.chunk_tokens:
+                pieces.append((text, len(ids)))
+                continue
+            for offset in range(0, len(ids), self.chunk_tokens):
+                piece = ids[offset:offset + self.chunk_tokens]
+                pieces.append((self.tokenizer.decode(piece, skip_special_tokens=True), len(piece)))
+        return pieces
+    
+    @staticmethod
+    def _sample(pieces: List[Tuple[str, int]], token_budget: int) -> List[Tuple[str, int]]:
+        """Keep about ``token_budget`` tokens of pieces, spread evenly over the input"""
+        ratio = token_budget / sum(count for _, count in pieces)
+        kept = []
+        credit = 0.0
+        for text, count in pieces:
+            credit += count * ratio
+            if credit >= count:
+                kept.append((text, count))
+                credit -= count
+        return kept
+    
+    def _pack(self, pieces: List[Tuple[str, int]]) -> List[str]:
+        """Greedily join pieces into chunks of at most ``chunk_tokens`` tokens"""
+        chunks = []
+        current: List[str] = []
+        current_tokens = 0
+        for text, count in pieces:
+            # One extra token for the newline separator
+            if current and current_tokens + count + 1 > self.chunk_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += count + 1
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+    
+    def _summarize_chunks(self, chunks: List[str], deadline: Optional[float]) -> List[str]:
+        """Summarize chunks in batches, falling back to extracts past the deadline"""
+        summaries = []
+        for offset in range(0, len(chunks), self.chunk_batch_size):
+            batch = chunks[offset:offset + self.chunk_batch_size]
+            if deadline is not None and time.monotonic() > deadline:
+                summaries.extend(self._fallback_summary(chunk) for chunk in chunks[offset:])
+                break
+            summaries.extend(self.summarize_batch(
+                batch,
+                max_length=self.chunk_summary_tokens,
+                min_length=self.chunk_summary_tokens // 4
+            ))
+        return summaries
+    
+    def _truncate_tokens(self, text: str, max_tokens: int) -> str:
+        ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= max_tokens:
+            return text
+        return self.tokenizer.decode(ids[:max_tokens], skip_special_tokens=True)
+    
+    def _warm_up(self):
+        self.summarize(
+            "The team met to review the release. Two bugs were fixed and the launch is on track for Friday.",
+            max_length=30,
+            min_length=5
+        )
+    
+    def _truncate(self, text: str) -> str:
+        """
+        Bound the text handed to the tokenizer
+        
+        The pipeline truncates to BART's 1024-token limit itself
+        (truncation=True); this only avoids tokenizing far more text than the
+        model can read. Use summarize_long to read long text in full.
+        """
+        max_input_length = 1024 * 8
+        if len(text) > max_input_length:
+            logger.warning(f"Text truncated to {max_input_length} characters")
+            return text[:max_input_length]
+        return text
+    
+    def _fallback_summary(self, text: str) -> str:
+        """Fallback: return first sentence or truncated text"""
+        sentences = text.split(". ")
+        if sentences:
+            return sentences[0] + "."
+        return text[:200] + "..."
@@ -0,0 +1,188 @@
+"""
+Content-addressed cache of generated summaries
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def summary_key(text: str, max_length: int, min_length: int, model_id: str) -> bytes:
+    """
+    Cache key for one summary request
+
+    Covers everything that changes the output: the exact input text, the
+    length bounds and the model that produced it.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([model_id, max_length, min_length]).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+class DiskSummaryTier:
+    """
+    Persistent cache tier in a SQLite file
+
+    Entries carry their creation time so the TTL still applies after a
+    restart. Once the table grows past ``max_entries`` the oldest tenth is
+    dropped.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key BLOB PRIMARY KEY, summary TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_created ON summaries (created)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: bytes) -> Optional[Tuple[str, float]]:
+        """(summary, creation time) or None"""
+        return self._conn.execute("SELECT summary, created FROM summaries WHERE key = ?", (key,)).fetchone()
+
+    def put(self, key: bytes, summary: str, created: float):
+        inserted = self._conn.execute(
+            "INSERT OR IGNORE INTO summaries (key, summary, created) VALUES (?, ?, ?)",
+            (key, summary, created)
+        ).rowcount
+        self._count += inserted
+        if self._count > self.max_entries:
+            drop = max(1, self.max_entries // 10)
+            self._conn.execute(
+                "DELETE FROM summaries WHERE key IN (SELECT key FROM summaries ORDER BY created LIMIT ?)",
+                (drop,)
+            )
+            self._count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def delete(self, key: bytes):
+        self._count -= self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,)).rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+class SummaryCache:
+    """
+    Two-tier summary cache keyed by ``summary_key``
+
+    An in-memory LRU holds the hottest ``max_entries`` summaries; an optional
+    ``DiskSummaryTier`` keeps them across restarts. With ``ttl_seconds`` set,
+    entries older than that are treated as misses in both tiers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: Optional[float] = None,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100000
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds or None
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        # key -> (summary, creation time)
+        self._memory: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._disk: Optional[DiskSummaryTier] = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._expired = 0
+
+    def _disk_tier(self) -> Optional[DiskSummaryTier]:
+        """Open the disk tier on first use"""
+        if self._disk is None and self.disk_path:
+            self._disk = DiskSummaryTier(self.disk_path, self.disk_max_entries)
+            logger.info(f"Opened summary cache with {len(self._disk)} entries on disk")
+        return self._disk
+
+    def _fresh(self, created: float) -> bool:
+        return self.ttl_seconds is None or time.time() - created <= self.ttl_seconds
+
+    def _remember(self, key: bytes, entry: Tuple[str, float]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Cached summary for ``key``, or None on a miss"""
+        with self._lock:
+            expired = False
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._fresh(entry[1]):
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+                expired = True
+
+            disk = self._disk_tier()
+            entry = disk.get(key) if disk is not None else None
+            if entry is not None:
+                if self._fresh(entry[1]):
+                    self._remember(key, entry)
+                    self._disk_hits += 1
+                    return entry[0]
+                disk.delete(key)
+                expired = True
+
+            self._misses += 1
+            self._expired += expired
+            return None
+
+    def put(self, key: bytes, summary: str):
+        entry = (summary, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            disk = self._disk_tier()
+            if disk is not None:
+                disk.put(key, *entry)
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Entry counts and hit rates per tier"""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_max_entries": self.max_entries,
+                "disk_entries": len(self._disk) if self._disk is not None else 0,
+                "ttl_seconds": self.ttl_seconds,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "expired": self._expired,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+            }
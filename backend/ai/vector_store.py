@@ -2,45 +2,342 @@
 Vector Storage and Retrieval using FAISS
 """
 
+import hashlib
 import logging
 import os
 import json
+import threading
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
-from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+from ai import metrics
+from ai.embedding_cache import EmbeddingCache
+from ai.ann_index import (
+    MMAP_FLAGS,
+    AnnIndexConfig,
+    clone_index,
+    describe_index,
+    exact_search,
+    excluding_selector,
+    id_selector,
+    index_memory_bytes,
+    mapped_bytes,
+    read_index,
+    reconstruct_all
+)
+from ai.inference_backend import (
+    ENCODER_STAGES,
+    MODEL_STAGE_SECONDS,
+    check_backend,
+    instrument_model,
+    load_sentence_encoder
+)
+from ai.loading import LazyComponent
+from ai.metadata_store import MetadataStore
+from ai.persistence import SegmentLog, StoreLock
 
 logger = logging.getLogger(__name__)
 
+ENCODER_BATCH_SIZE = metrics.histogram(
+    "encoder_batch_size", "Texts per encoder call, after the embedding cache", buckets=metrics.SIZE_BUCKETS
+)
+FAISS_SEARCH_SECONDS = metrics.histogram(
+    "faiss_search_seconds", "Index search time per call (unfiltered batch or one filtered query)", ["kind"]
+)
+
+
+def message_id(conversation_id: str, message: Dict[str, Any]) -> Any:
+    """
+    Upsert key of a message: its ``id``, or else a hash of its conversation,
+    sender, time and body
+
+    The hash is stable, so storing the same id-less message again replaces
+    it, while other id-less messages of the conversation are kept.
+    """
+    if message.get("id") is not None:
+        return message["id"]
+    key = [
+        conversation_id,
+        message.get("user_id") or message.get("sender") or "",
+        message.get("timestamp") or message.get("origin_server_ts"),
+        message.get("body", "")
+    ]
+    return f"msg-{hashlib.sha1(json.dumps(key, default=str).encode('utf-8')).hexdigest()[:20]}"
+
 
-class VectorStore:
+class VectorStore(LazyComponent):
     """
     Manages vector embeddings and semantic search using FAISS
     """
     
-    def __init__(self, store_path: str = "/app/vector_store"):
+    component_name = "vector_store"
+    # Seconds between checks of the primary of a shared store for work
+    # (compaction, purge, migration) caused by other processes' writes
+    MAINTENANCE_INTERVAL = 1.0
+    
+    def __init__(
+        self,
+        store_path: str = "/app/vector_store",
+        lazy: bool = False,
+        compact_after_segments: int = 64,
+        index_config: Optional[AnnIndexConfig] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        exact_filter_threshold: int = 20000,
+        purge_ratio: float = 0.2,
+        encoder_backend: str = "torch",
+        onnx_export_dir: Optional[str] = None,
+        shared: bool = False,
+        primary: bool = True,
+        mmap: bool = True
+    ):
+        """
+        Args:
+            store_path: Directory holding the index and metadata
+            lazy: Defer loading the encoder and index until first use (or ensure_loaded())
+            compact_after_segments: Fold the segment log into a new base
+                snapshot in the background once this many segments are pending
+            index_config: Index type and tuning (default: exact flat index)
+            embedding_cache: Cache consulted before the encoder (default: none)
+            exact_filter_threshold: Filtered searches matching at most this
+                many vectors scan them exactly instead of searching the index
+            purge_ratio: Rebuild the index without deleted vectors in the
+                background once this fraction of it is deleted (0 disables)
+            encoder_backend: Inference backend of the sentence encoder, one
+                of INFERENCE_BACKENDS (torch fp32, int8 or onnx)
+            onnx_export_dir: Where the onnx backend keeps exported models
+                between starts (default: export on every start)
+            shared: Other processes use the same store_path (serve.py
+                workers); reads and writes first apply their changes
+            primary: This process compacts, migrates and purges the store;
+                exactly one process sharing a store may be primary
+            mmap: Serve base snapshots from memory-mapped files rather than
+                reading them into memory (see ann_index.MappedIndex)
+        """
+        super().__init__()
         self.store_path = store_path
+        self.encoder = None
+        self.encoder_backend = check_backend(encoder_backend)
+        self.onnx_export_dir = onnx_export_dir
         self.index = None
-        self.metadata = []
+        self.metadata_store = None
         self.dimension = 384  # all-MiniLM-L6-v2 dimension
+        # Guards the index and metadata; encoding happens outside the lock
+        self._lock = threading.RLock()
+        
+        self.compact_after_segments = compact_after_segments
+        self.segment_log = None
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread = None
+        
+        self.shared = shared
+        self.primary = primary
+        self._store_lock = None
+        # segment_log.change_token() as of the last catch-up
+        self._change_token = None
+        
+        if mmap and MMAP_FLAGS is None:
+            logger.warning(f"FAISS {faiss.__version__} cannot memory-map indexes, reading snapshots instead")
+        self.mmap = mmap and MMAP_FLAGS is not None
+        
+        self.index_config = index_config or AnnIndexConfig()
+        self._migration_lock = threading.Lock()
+        self._migration_thread = None
+        
+        self.embedding_cache = embedding_cache
+        self.exact_filter_threshold = exact_filter_threshold
+        
+        # Ids of deleted messages whose vectors are still in the index
+        self.purge_ratio = purge_ratio
+        self._tombstones = np.empty(0, dtype="int64")
+        self._tombstone_selector = None
+        self._purge_thread = None
+        
+        if not lazy:
+            self.ensure_loaded()
+    
+    def _load(self):
+        if self.encoder is None:
+            self.load_encoder()
+        
+        # Create store directory if it doesn't exist
+        os.makedirs(self.store_path, exist_ok=True)
         
-        # Initialize embedding model
-        logger.info("Loading sentence transformer model...")
+        # Load existing index if available
+        self._load_index()
+    
+    def load_encoder(self):
+        """Load the sentence encoder alone; serve.py does so before forking workers"""
+        # Initialize embedding model (torch is imported inside, on first load)
+        logger.info(f"Loading sentence transformer model ({self.encoder_backend} backend)...")
         try:
-            self.encoder = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            self.encoder = load_sentence_encoder(
+                'sentence-transformers/all-MiniLM-L6-v2',
+                backend=self.encoder_backend,
+                export_dir=self.onnx_export_dir
+            )
+            instrument_model(self.encoder, "encoder", "encode", ENCODER_STAGES)
             logger.info("Embedding model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading embedding model: {e}")
             raise
+    
+    def _warm_up(self):
+        self.encode(["warm up the sentence encoder"])
+    
+    def _load_index(self):
+        """Load the base snapshot and replay the segment log on top of it"""
+        self._store_lock = StoreLock(self.store_path)
+        with self._write_lock():
+            self._load_index_locked()
+        self.index_config.apply_search_params(self.index)
+        self._maybe_migrate()
+        self._maybe_purge()
+        if self.shared and self.primary:
+            threading.Thread(target=self._maintain, name="vector-maintenance", daemon=True).start()
+    
+    def _maintain(self):
+        """Primary of a shared store: start background work that other processes' writes call for"""
+        while True:
+            time.sleep(self.MAINTENANCE_INTERVAL)
+            try:
+                if self.refresh():
+                    self._maybe_migrate()
+                    self._maybe_purge()
+                    self._maybe_compact()
+            except Exception as e:
+                logger.error(f"Error in vector-maintenance: {e}")
+    
+    def _load_index_locked(self):
+        self.segment_log = SegmentLog(self.store_path, clean=self.primary)
+        self.metadata_store = MetadataStore(os.path.join(self.store_path, "metadata.sqlite3"))
+        if self.primary:
+            self._finish_purge()
+        manifest = self.segment_log.manifest
         
-        # Create store directory if it doesn't exist
-        os.makedirs(store_path, exist_ok=True)
+        if manifest["base"]:
+            try:
+                self.index = self._read_snapshot()
+                self._import_rows(self.segment_log.read_snapshot_metadata())
+                logger.info(
+                    f"Loaded base snapshot with {self.index.ntotal} entries{' (mapped)' if self.mmap else ''}"
+                )
+            except Exception as e:
+                logger.warning(f"Error loading base snapshot: {e}, creating new one")
+                self._create_new_index()
+        else:
+            self._load_legacy_index()
         
-        # Load existing index if available
-        self._load_index()
+        replayed = 0
+        for _, vectors, rows, deleted in self.segment_log.replay(manifest["last_segment"]):
+            start_id = self.index.ntotal
+            if len(vectors):
+                self.index.add(vectors)
+            if self.primary:
+                # Rows a crash kept from reaching SQLite
+                self.metadata_store.add_rows(start_id, rows, deleted)
+            replayed += 1
+        if replayed:
+            logger.info(f"Replayed {replayed} segments, index has {self.index.ntotal} entries")
+        
+        self._set_tombstones(self.metadata_store.tombstone_ids())
+        self._change_token = self.segment_log.change_token()
     
-    def _load_index(self):
-        """Load existing FAISS index from disk"""
+    @contextmanager
+    def _write_lock(self):
+        """The in-process lock plus the store lock other processes take"""
+        with self._lock, self._store_lock:
+            yield
+    
+    def refresh(self) -> bool:
+        """
+        Apply segments and snapshots written by other processes sharing the store
+        
+        Cheap when nothing changed: two stat calls. Called before every read
+        and write of a shared store.
+        
+        Returns:
+            Whether anything was written since the last refresh
+        """
+        self.ensure_loaded()
+        if self.segment_log.change_token() == self._change_token:
+            return False
+        with self._write_lock():
+            self._catch_up()
+        return True
+    
+    def _sync(self):
+        """refresh() for callers already holding the write lock"""
+        if self.shared and self.segment_log.change_token() != self._change_token:
+            self._catch_up()
+    
+    def _catch_up(self):
+        """Bring the index up to date with the store on disk; the caller holds the write lock"""
+        previous = self.segment_log.manifest
+        manifest = self.segment_log.reload_manifest()
+        rebased = not self.primary and manifest.get("base") != previous.get("base") and (
+            self.mmap
+            or manifest.get("index_type", describe_index(self.index)) != describe_index(self.index)
+        )
+        if (
+            manifest.get("generation", 0) != previous.get("generation", 0)
+            or manifest["last_segment"] > self.segment_log.last_seq
+            or rebased
+        ):
+            # A purge renumbered the ids, segments this process never applied
+            # were compacted away, or the primary published a snapshot to
+            # map instead of the vectors held in memory (or of a new type)
+            self._reload_snapshot()
+        else:
+            applied = 0
+            for seq, vectors, _, _ in self.segment_log.replay(self.segment_log.last_seq):
+                if len(vectors):
+                    self.index.add(vectors)
+                self.segment_log.last_seq = seq
+                applied += 1
+            if applied:
+                self._set_tombstones(self.metadata_store.tombstone_ids())
+        self._change_token = self.segment_log.change_token()
+    
+    def _reload_snapshot(self):
+        """Replace the index with the published snapshot and the segments after it"""
+        manifest = self.segment_log.manifest
+        if manifest["base"]:
+            index = self._read_snapshot()
+        else:
+            index = self.index_config.create_flat(self.dimension)
+        seq = manifest["last_segment"]
+        for seq, vectors, _, _ in self.segment_log.replay(seq):
+            if len(vectors):
+                index.add(vectors)
+        self.index = index
+        self.segment_log.last_seq = seq
+        self._set_tombstones(self.metadata_store.tombstone_ids())
+        logger.info(f"Reloaded snapshot {manifest['base']} with {index.ntotal} entries")
+    
+    def _read_snapshot(self):
+        """The current base snapshot, mapped unless mmap is off"""
+        index = read_index(self.segment_log.snapshot_paths()[0], mmap=self.mmap)
+        self.index_config.apply_search_params(index)
+        return index
+    
+    def _finish_purge(self):
+        """Publish a purged snapshot if a crash hit after its ids were renumbered"""
+        state = self.metadata_store.get_state()
+        if state.get("generation", 0) > self.segment_log.generation:
+            logger.info(f"Finishing interrupted purge into {state['base']}")
+            self.segment_log.publish(state["base"], state["last_segment"], state["count"], state["generation"])
+    
+    def _import_rows(self, rows: Optional[List[Dict[str, Any]]]):
+        """Move metadata rows from an older on-disk format into SQLite"""
+        if rows and self.primary and self.metadata_store.max_id() < len(rows) - 1:
+            self.metadata_store.add_rows(0, rows)
+            logger.info(f"Imported {len(rows)} metadata rows into SQLite")
+    
+    def _load_legacy_index(self):
+        """Load an index written before the segment log existed"""
         index_path = os.path.join(self.store_path, "index.faiss")
         metadata_path = os.path.join(self.store_path, "metadata.json")
         
@@ -48,8 +345,8 @@ class VectorStore:
             try:
                 self.index = faiss.read_index(index_path)
                 with open(metadata_path, 'r') as f:
-                    self.metadata = json.load(f)
-                logger.info(f"Loaded existing index with {len(self.metadata)} entries")
+                    self._import_rows(json.load(f))
+                logger.info(f"Loaded existing index with {self.index.ntotal} entries")
             except Exception as e:
                 logger.warning(f"Error loading existing index: {e}, creating new one")
                 self._create_new_index()
@@ -58,24 +355,190 @@ class VectorStore:
     
     def _create_new_index(self):
         """Create a new FAISS index"""
-        # Use L2 distance (Euclidean)
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.metadata = []
+        self.index = self.index_config.create_flat(self.dimension)
         logger.info("Created new FAISS index")
     
-    def _save_index(self):
-        """Save FAISS index and metadata to disk"""
-        try:
-            index_path = os.path.join(self.store_path, "index.faiss")
-            metadata_path = os.path.join(self.store_path, "metadata.json")
+    def compact(self):
+        """
+        Fold every pending segment into a new base snapshot
+        
+        The index is copied under the lock and written outside it, so
+        ingestion and search keep running while the snapshot is written.
+        With mmap the new snapshot then replaces the vectors held in memory.
+        """
+        self.ensure_loaded()
+        with self._compaction_lock:
+            with self._write_lock():
+                self._sync()
+                seq = self.segment_log.last_seq
+                if seq == self.segment_log.manifest["last_segment"] and self.segment_log.manifest["base"]:
+                    return
+                source = self.index
+                index = clone_index(source)
             
-            faiss.write_index(self.index, index_path)
-            with open(metadata_path, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
+            self.segment_log.write_snapshot(
+                seq,
+                lambda path: faiss.write_index(index, path),
+                index.ntotal,
+                index_type=describe_index(index),
+                lock=self._write_lock()
+            )
+            if self.mmap:
+                with self._write_lock():
+                    # Unless a migration swapped the index in the meantime
+                    if self.index is source:
+                        self._remap(index.ntotal)
+    
+    def _remap(self, count: int):
+        """Serve the first ``count`` vectors from the published snapshot; caller holds the write lock"""
+        mapped = self._read_snapshot()
+        mapped.add(reconstruct_all(self.index, start=count))
+        self.index = mapped
+    
+    def migrate_index(self):
+        """
+        Rebuild the index as the configured ANN type
+        
+        The new index is trained and filled from a copy of the current vectors
+        outside the lock; vectors added in the meantime are appended before
+        it is swapped in. A new base snapshot is written afterwards.
+        """
+        self.ensure_loaded()
+        with self._migration_lock:
+            with self._lock:
+                if not self.index_config.should_migrate(self.index):
+                    return
+                count = self.index.ntotal
+                vectors = reconstruct_all(self.index)
             
-            logger.info(f"Saved index with {len(self.metadata)} entries")
-        except Exception as e:
-            logger.error(f"Error saving index: {e}")
+            logger.info(f"Migrating {count} vectors to a {self.index_config.index_type} index")
+            new_index = self.index_config.build(self.dimension, vectors)
+            
+            with self._write_lock():
+                self._sync()
+                new_index.add(reconstruct_all(self.index, start=count))
+                self.index = new_index
+            logger.info(f"Migrated index to {self.index_config.index_type}")
+        
+        self.compact()
+    
+    def purge_deleted(self):
+        """
+        Rebuild the index without the vectors of deleted messages
+        
+        Like migrate_index, the new index is built from a copy outside the
+        lock. Removing vectors shifts the ids of every later vector, so the
+        metadata rows are renumbered and a new base snapshot is published
+        while the lock is held.
+        """
+        self.ensure_loaded()
+        with self._migration_lock, self._compaction_lock:
+            with self._lock:
+                purged = self._tombstones
+                if not purged.size:
+                    return
+                count = self.index.ntotal
+                vectors = reconstruct_all(self.index)
+                index_type = describe_index(self.index)
+            
+            logger.info(f"Purging {purged.size} deleted vectors from {count}")
+            live = np.delete(vectors, purged, axis=0)
+            del vectors
+            if index_type == "flat" or not len(live):
+                new_index = self.index_config.create_flat(self.dimension)
+                new_index.add(live)
+            else:
+                new_index = self.index_config.build(self.dimension, live)
+            
+            with self._write_lock():
+                self._sync()
+                new_index.add(reconstruct_all(self.index, start=count))
+                seq = self.segment_log.last_seq
+                generation = self.segment_log.generation + 1
+                name = self.segment_log.snapshot_name(seq, generation)
+                self.segment_log.write_index_file(name, lambda path: faiss.write_index(new_index, path))
+                # From here on the metadata matches the new snapshot; a crash
+                # before publish() is finished by _finish_purge on startup
+                self.metadata_store.remap_ids(purged, {
+                    "generation": generation,
+                    "base": name,
+                    "last_segment": seq,
+                    "count": new_index.ntotal
+                })
+                self.segment_log.publish(name, seq, new_index.ntotal, generation, describe_index(new_index))
+                self.index = new_index
+                if self.mmap:
+                    self._remap(new_index.ntotal)
+                self._set_tombstones(self.metadata_store.tombstone_ids())
+            logger.info(f"Purged index has {new_index.ntotal} entries")
+    
+    def _maybe_purge(self):
+        """Start a background purge once enough of the index is deleted"""
+        if not self.primary or self.purge_ratio <= 0 or not self._tombstones.size:
+            return
+        if self._tombstones.size < self.purge_ratio * self.index.ntotal:
+            return
+        self._purge_thread = self._start_background(
+            self._purge_thread, self.purge_deleted, "vector-purge"
+        )
+    
+    def _set_tombstones(self, ids: np.ndarray):
+        """Replace the tombstone set; the search selector is rebuilt on demand"""
+        self._tombstones = ids
+        self._tombstone_selector = None
+    
+    def _maybe_migrate(self):
+        """Start a background migration once a flat index passes the threshold"""
+        if not self.primary or not self.index_config.should_migrate(self.index):
+            return
+        self._migration_thread = self._start_background(
+            self._migration_thread, self.migrate_index, "vector-migration"
+        )
+    
+    def _maybe_compact(self):
+        """Start a background compaction once enough segments are pending"""
+        if not self.primary or self.segment_log.pending_segments < self.compact_after_segments:
+            return
+        self._compaction_thread = self._start_background(
+            self._compaction_thread, self.compact, "vector-compaction"
+        )
+    
+    @staticmethod
+    def _start_background(thread: Optional[threading.Thread], job, name: str) -> threading.Thread:
+        """Run ``job`` on a daemon thread unless ``thread`` is still running it"""
+        if thread is not None and thread.is_alive():
+            return thread
+        
+        def run():
+            try:
+                job()
+            except Exception as e:
+                logger.error(f"Error in {name}: {e}")
+        
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts with the sentence transformer
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        self.ensure_loaded()
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(texts, self._encode_uncached)
+        return self._encode_uncached(texts)
+    
+    def _encode_uncached(self, texts: List[str]) -> np.ndarray:
+        ENCODER_BATCH_SIZE.observe(len(texts))
+        with metrics.stage_timer(MODEL_STAGE_SECONDS, "encode", model="encoder", stage="total"):
+            embeddings = self.encoder.encode(texts, show_progress_bar=False)
+        return np.array(embeddings).astype('float32')
     
     def store_conversation(
         self,
@@ -95,85 +558,387 @@ class VectorStore:
             logger.warning("No messages to store")
             return
         
-        # Combine messages into conversation text
-        conversation_texts = []
-        for msg in messages:
-            body = msg.get("body", "")
-            if body:
-                conversation_texts.append(body)
-        
+        conversation_texts = self.message_texts(messages)
         if not conversation_texts:
             logger.warning("No text content in messages")
             return
         
         # Generate embeddings
         logger.info(f"Generating embeddings for {len(conversation_texts)} messages")
-        embeddings = self.encoder.encode(conversation_texts, show_progress_bar=False)
-        
-        # Convert to numpy array
-        embeddings = np.array(embeddings).astype('float32')
-        
-        # Add to index
-        self.index.add(embeddings)
-        
-        # Store metadata for each message
-        for i, msg in enumerate(messages):
-            if msg.get("body"):
-                self.metadata.append({
-                    "conversation_id": conversation_id,
-                    "message_id": msg.get("id", f"msg_{i}"),
-                    "body": msg.get("body", ""),
-                    "user_id": msg.get("user_id", ""),
-                    "timestamp": msg.get("timestamp") or msg.get("origin_server_ts"),
-                    "metadata": metadata or {}
-                })
+        embeddings = self.encode(conversation_texts)
+        
+        self.add_embeddings(conversation_id, messages, embeddings, metadata)
+    
+    @staticmethod
+    def message_texts(messages: List[Dict[str, Any]]) -> List[str]:
+        """Message bodies to embed, in the order add_embeddings expects"""
+        return [msg.get("body", "") for msg in messages if msg.get("body", "")]
+    
+    def add_embeddings(
+        self,
+        conversation_id: str,
+        messages: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Add precomputed message embeddings to the index and persist them
+        
+        Messages are upserted by (conversation_id, message_id): a stored
+        message with the same id is replaced. Within one call the last copy
+        of a message id wins.
+        
+        Args:
+            conversation_id: Unique identifier for conversation
+            messages: List of message dictionaries
+            embeddings: One row per message with a body (see message_texts)
+            metadata: Additional metadata to store
+        """
+        stored = sum(self.add_batch([(conversation_id, messages, embeddings, metadata)]))
+        logger.info(f"Stored conversation {conversation_id} with {stored} messages")
+    
+    def add_batch(
+        self,
+        entries: List[Tuple[str, List[Dict[str, Any]], np.ndarray, Optional[Dict[str, Any]]]]
+    ) -> List[int]:
+        """
+        Add the embeddings of several conversations at once
+        
+        Everything goes into one segment, one index add and one metadata
+        transaction. Upserts work as in add_embeddings; across entries the
+        last copy of a (conversation_id, message_id) wins.
+        
+        Args:
+            entries: (conversation_id, messages, embeddings, metadata) per
+                conversation, as add_embeddings takes them
+            
+        Returns:
+            Number of messages stored per entry, not counting copies that a
+            later entry replaced
+        """
+        self.ensure_loaded()
+        
+        # Metadata for each message, and the entry it came from
+        rows = []
+        sources = []
+        for entry, (conversation_id, messages, _, metadata) in enumerate(entries):
+            for msg in messages:
+                if msg.get("body"):
+                    sources.append(entry)
+                    rows.append({
+                        "conversation_id": conversation_id,
+                        "message_id": message_id(conversation_id, msg),
+                        "body": msg.get("body", ""),
+                        "user_id": msg.get("user_id", ""),
+                        "timestamp": msg.get("timestamp") or msg.get("origin_server_ts"),
+                        "metadata": metadata or {}
+                    })
+        if not rows:
+            return [0] * len(entries)
+        embeddings = np.vstack([entry[2] for entry in entries])
+        
+        latest = {(row["conversation_id"], row["message_id"]): position for position, row in enumerate(rows)}
+        keep = sorted(latest.values())
+        if len(keep) < len(rows):
+            rows = [rows[position] for position in keep]
+            embeddings = embeddings[keep]
+        stored = [0] * len(entries)
+        for position in keep:
+            stored[sources[position]] += 1
         
-        # Save to disk
-        self._save_index()
-        logger.info(f"Stored conversation {conversation_id} with {len(conversation_texts)} messages")
+        message_ids: Dict[str, List[str]] = {}
+        for row in rows:
+            message_ids.setdefault(row["conversation_id"], []).append(row["message_id"])
+        
+        with self._write_lock():
+            self._sync()
+            replaced = [
+                stored_id
+                for conversation_id, ids in message_ids.items()
+                for stored_id in self.metadata_store.find_ids(conversation_id, ids)
+            ]
+            # Log first so nothing is visible in memory that is not on disk;
+            # replay re-adds rows missing from SQLite after a crash
+            start_id = self.index.ntotal
+            self.segment_log.append(embeddings, rows, replaced)
+            self.index.add(embeddings)
+            self.metadata_store.add_rows(start_id, rows, replaced)
+            if replaced:
+                self._set_tombstones(np.union1d(self._tombstones, replaced))
+            self._change_token = self.segment_log.change_token()
+        
+        self._maybe_migrate()
+        self._maybe_purge()
+        self._maybe_compact()
+        return stored
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def delete(self, conversation_id: str, message_ids: Optional[List[str]] = None) -> int:
+        """
+        Delete messages from the store
+        
+        Deleted vectors are tombstoned and skipped by search; they are
+        physically removed by the next purge.
+        
+        Args:
+            conversation_id: Conversation to delete from
+            message_ids: Messages to delete (default: the whole conversation)
+            
+        Returns:
+            Number of messages deleted
+        """
+        self.ensure_loaded()
+        with self._write_lock():
+            self._sync()
+            ids = self.metadata_store.find_ids(conversation_id, message_ids)
+            if ids:
+                self.segment_log.append(np.zeros((0, self.dimension), dtype="float32"), [], ids)
+                self.metadata_store.add_rows(self.index.ntotal, [], ids)
+                self._set_tombstones(np.union1d(self._tombstones, ids))
+                self._change_token = self.segment_log.change_token()
+        
+        if ids:
+            logger.info(f"Deleted {len(ids)} messages from conversation {conversation_id}")
+            self._maybe_purge()
+            self._maybe_compact()
+        return len(ids)
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Semantic search over stored conversations
         
         Args:
             query: Search query text
             top_k: Number of results to return
+            filters: Optional conversation_id, user_id, start_time and end_time
+                (see search_embeddings)
             
         Returns:
             List of matching conversations with similarity scores
         """
+        self.ensure_loaded()
+        if self.shared:
+            self.refresh()
         if self.index.ntotal == 0:
             logger.warning("Index is empty, no results to return")
             return []
         
         # Generate query embedding
-        query_embedding = self.encoder.encode([query], show_progress_bar=False)
-        query_embedding = np.array(query_embedding).astype('float32')
+        query_embedding = self.encode([query])
         
-        # Search in FAISS
-        k = min(top_k, self.index.ntotal)
-        distances, indices = self.index.search(query_embedding, k)
+        results = self.search_embeddings(query_embedding, top_k=top_k, filters=filters)
+        logger.info(f"Search returned {len(results)} results for query: {query[:50]}")
+        return results
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_ks: List[int],
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Semantic search for several queries with one encode and one FAISS call
+        
+        Args:
+            queries: Search query texts
+            top_ks: Number of results per query
+            filters: Per-query filters (see search_embeddings)
+            
+        Returns:
+            One result list per query, in query order
+        """
+        self.ensure_loaded()
+        if not queries:
+            return []
+        return self.search_embeddings_batch(self.encode(queries), top_ks, filters)
+    
+    def search_embeddings(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Nearest-neighbour search for a single precomputed query embedding
+        
+        Args:
+            query_embedding: float32 array of shape (1, dimension)
+            top_k: Number of results to return
+            filters: Restrict results to messages matching every given key:
+                conversation_id, user_id, start_time and end_time (inclusive,
+                epoch ms or ISO-8601)
+            
+        Returns:
+            List of matching conversations with similarity scores
+        """
+        return self.search_embeddings_batch(query_embedding, [top_k], [filters])[0]
+    
+    def search_embeddings_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_ks: List[int],
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Nearest-neighbour search for several precomputed query embeddings
+        
+        Unfiltered queries share one FAISS call at the largest top_k and are
+        cut back to their own; filtered queries each search their selection.
+        Metadata rows for all hits are read in one query.
+        
+        Args:
+            query_embeddings: float32 array of shape (n, dimension)
+            top_ks: Number of results per query
+            filters: Per-query filters as in search_embeddings (default: none)
+            
+        Returns:
+            One result list per query, in query order
+        """
+        self.ensure_loaded()
+        if self.shared:
+            self.refresh()
+        filters = [
+            {key: value for key, value in (query_filters or {}).items() if value is not None}
+            for query_filters in (filters or [None] * len(top_ks))
+        ]
+        empty = (np.zeros((1, 0), dtype="float32"), np.zeros((1, 0), dtype="int64"))
+        hits = [empty] * len(top_ks)
+        
+        unfiltered = []
+        for position, query_filters in enumerate(filters):
+            if query_filters:
+                with metrics.stage_timer(FAISS_SEARCH_SECONDS, "faiss", kind="filtered"):
+                    hits[position] = self._filtered_search(
+                        query_embeddings[position:position + 1], top_ks[position], query_filters
+                    )
+            elif top_ks[position] > 0:
+                unfiltered.append(position)
+        
+        if unfiltered:
+            with self._lock, metrics.stage_timer(FAISS_SEARCH_SECONDS, "faiss", kind="unfiltered"):
+                live = self.index.ntotal - self._tombstones.size
+                if live > 0:
+                    # Search in FAISS
+                    queries = query_embeddings[unfiltered]
+                    k = min(max(top_ks[position] for position in unfiltered), live)
+                    if self._tombstones.size:
+                        distances, indices = self._search_live(queries, k)
+                    else:
+                        distances, indices = self.index.search(queries, k)
+                    for row, position in enumerate(unfiltered):
+                        own_k = min(top_ks[position], k)
+                        hits[position] = (distances[row:row + 1, :own_k], indices[row:row + 1, :own_k])
+        
+        # Only the top-k rows are read from the metadata store
+        rows = self.metadata_store.get_rows(
+            sorted({int(idx) for _, indices in hits for idx in indices[0] if idx >= 0})
+        )
         
         # Build results
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):
-                metadata = self.metadata[idx].copy()
-                # Convert L2 distance to similarity score (lower distance = higher similarity)
-                distance = float(distances[0][i])
-                similarity = 1.0 / (1.0 + distance)  # Convert distance to similarity
-                metadata["similarity_score"] = round(similarity, 4)
-                metadata["distance"] = round(distance, 4)
-                results.append(metadata)
+        all_results = []
+        for distances, indices in hits:
+            results = []
+            for i, idx in enumerate(indices[0]):
+                row = rows.get(int(idx))
+                if row is not None:
+                    # Queries can share hits, so each gets its own copy
+                    metadata = dict(row)
+                    # Convert L2 distance to similarity score (lower distance = higher similarity)
+                    distance = float(distances[0][i])
+                    similarity = 1.0 / (1.0 + distance)  # Convert distance to similarity
+                    metadata["similarity_score"] = round(similarity, 4)
+                    metadata["distance"] = round(distance, 4)
+                    results.append(metadata)
+            all_results.append(results)
         
-        logger.info(f"Search returned {len(results)} results for query: {query[:50]}")
-        return results
+        return all_results
+    
+    def _search_live(self, query_embeddings: np.ndarray, k: int):
+        """Index search skipping tombstoned ids; caller holds the lock"""
+        if self._tombstone_selector is None:
+            self._tombstone_selector = excluding_selector(self._tombstones)
+        params = self.index_config.search_parameters(self.index, self._tombstone_selector)
+        distances, indices = self.index.search(query_embeddings, k, params=params)
+        if not (indices < 0).any():
+            return distances, indices
+        
+        # An approximate search ran out of candidates inside the selection;
+        # over-fetch by the tombstone count and drop them
+        fetch = min(self.index.ntotal, k + self._tombstones.size)
+        all_distances, all_indices = self.index.search(query_embeddings, fetch)
+        distances = np.full((len(query_embeddings), k), np.inf, dtype="float32")
+        indices = np.full((len(query_embeddings), k), -1, dtype="int64")
+        for row in range(len(query_embeddings)):
+            keep = (all_indices[row] >= 0) & ~np.isin(all_indices[row], self._tombstones)
+            found = all_indices[row][keep][:k]
+            distances[row, :len(found)] = all_distances[row][keep][:k]
+            indices[row, :len(found)] = found
+        return distances, indices
+    
+    def _filtered_search(self, query_embedding: np.ndarray, top_k: int, filters: Dict[str, Any]):
+        """
+        Search only the vectors matching ``filters``
+        
+        Candidate ids come from the metadata store's indexes, so the cost
+        follows the number of matching messages rather than the index size.
+        Small candidate sets are scanned exactly; larger ones are searched
+        through the index with an id selector, falling back to the exact scan
+        if the approximate search cannot fill ``top_k`` inside the selection.
+        """
+        ids = self.metadata_store.filter_ids(**filters)
+        k = min(top_k, len(ids))
+        if k <= 0:
+            return np.zeros((1, 0), dtype="float32"), np.zeros((1, 0), dtype="int64")
+        
+        with self._lock:
+            if len(ids) <= self.exact_filter_threshold:
+                return exact_search(self.index, query_embedding, ids, k)
+            
+            # ``ids`` backs the selector and must outlive the search
+            params = self.index_config.search_parameters(self.index, id_selector(ids))
+            distances, indices = self.index.search(query_embedding, k, params=params)
+            if (indices[0] < 0).any():
+                logger.debug(f"Filtered index search returned fewer than {k} hits, scanning exactly")
+                return exact_search(self.index, query_embedding, ids, k)
+            return distances, indices
+    
+    def _disk_bytes(self) -> int:
+        """Size of the store directory: snapshots, segments and metadata"""
+        total = 0
+        for directory, _, files in os.walk(self.store_path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    pass  # Removed by a concurrent compaction
+        return total
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector store"""
-        return {
-            "total_vectors": self.index.ntotal,
-            "dimension": self.dimension,
-            "conversations": len(set(m.get("conversation_id") for m in self.metadata))
-        }
+        self.ensure_loaded()
+        if self.shared:
+            self.refresh()
+        with self._lock:
+            stats = {
+                "total_vectors": self.index.ntotal,
+                "deleted_vectors": int(self._tombstones.size),
+                "dimension": self.dimension,
+                "encoder_backend": self.encoder_backend,
+                "index_type": describe_index(self.index),
+                "index_memory_bytes": index_memory_bytes(self.index),
+                "index_mapped_bytes": mapped_bytes(self.index),
+                "index_config": self.index_config.to_dict(),
+                "conversations": self.metadata_store.count_conversations(),
+                "pending_segments": self.segment_log.pending_segments,
+                "shared": self.shared,
+                "primary": self.primary,
+                "mmap": self.mmap,
+                "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None
+            }
+        # Outside the lock: searches need not wait for the directory walk
+        stats["disk_bytes"] = self._disk_bytes()
+        return stats
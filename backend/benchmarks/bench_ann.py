@@ -0,0 +1,91 @@
+"""
+Recall@k and query latency of IVF and HNSW indexes against the flat baseline
+
+Run from backend/:
+    python -m benchmarks.bench_ann --vectors 200000 --queries 500 --k 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ai.ann_index import AnnIndexConfig
+
+
+def make_vectors(count: int, projection: np.ndarray, clusters: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Clustered unit vectors with a low intrinsic dimension, closer to sentence
+    embeddings than isotropic noise
+    """
+    assignment = rng.integers(0, len(clusters), size=count)
+    latent = clusters[assignment] + 0.3 * rng.standard_normal((count, clusters.shape[1]))
+    vectors = (latent @ projection).astype("float32")
+    vectors += 0.01 * rng.standard_normal(vectors.shape).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    """Search one query at a time, as /vector/search does"""
+    started = time.perf_counter()
+    results = [index.search(queries[i:i + 1], k)[1][0] for i in range(len(queries))]
+    elapsed = time.perf_counter() - started
+    return np.array(results), elapsed / len(queries) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    projection = rng.standard_normal((32, args.dimension))
+    clusters = rng.standard_normal((256, 32))
+    vectors = make_vectors(args.vectors, projection, clusters, rng)
+    queries = make_vectors(args.queries, projection, clusters, rng)
+
+    rows = []
+
+    flat_config = AnnIndexConfig("flat")
+    flat = flat_config.build(args.dimension, vectors)
+    truth, flat_ms = timed_search(flat, queries, args.k)
+    rows.append(("flat", "-", 0.0, 1.0, flat_ms))
+
+    ivf_config = AnnIndexConfig("ivf", nlist=args.nlist)
+    started = time.perf_counter()
+    ivf = ivf_config.build(args.dimension, vectors)
+    ivf_build = time.perf_counter() - started
+    for nprobe in (1, 4, 16, 64):
+        ivf.nprobe = nprobe
+        found, ms = timed_search(ivf, queries, args.k)
+        rows.append(("ivf", f"nprobe={nprobe}", ivf_build, recall_at_k(found, truth), ms))
+
+    hnsw_config = AnnIndexConfig("hnsw")
+    started = time.perf_counter()
+    hnsw = hnsw_config.build(args.dimension, vectors)
+    hnsw_build = time.perf_counter() - started
+    for ef_search in (16, 32, 64, 128):
+        hnsw.hnsw.efSearch = ef_search
+        found, ms = timed_search(hnsw, queries, args.k)
+        rows.append(("hnsw", f"efSearch={ef_search}", hnsw_build, recall_at_k(found, truth), ms))
+
+    print(f"{args.vectors} vectors, dim {args.dimension}, {args.queries} queries, k={args.k}")
+    print(f"| index | params | build (s) | recall@{args.k} | latency (ms/query) | speedup |")
+    print("|---|---|---|---|---|---|")
+    for name, params, build, recall, ms in rows:
+        print(f"| {name} | {params} | {build:.1f} | {recall:.3f} | {ms:.3f} | {flat_ms / ms:.1f}x |")
+
+
+if __name__ == "__main__":
+    main()
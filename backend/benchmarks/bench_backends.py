@@ -0,0 +1,124 @@
+"""
+Accuracy and latency of the int8 and ONNX inference backends against torch fp32
+
+Needs the models (transformers + torch, and optimum[onnxruntime] for onnx).
+Summaries are compared with the fp32 summary of the same text (ROUGE-1 F1),
+embeddings by cosine similarity with the fp32 embedding and by how many of
+the fp32 top-10 neighbours each backend retrieves.
+
+Run from backend/:
+    python -m benchmarks.bench_backends --backends torch int8 onnx --onnx-dir /tmp/onnx
+"""
+
+import argparse
+import random
+import re
+import statistics
+import time
+
+import numpy as np
+
+from ai.inference_backend import INFERENCE_BACKENDS
+from ai.summarizer import ConversationSummarizer
+from ai.vector_store import VectorStore
+from benchmarks.bench_long_summary import FILLER, TOPICS
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def rouge1_f1(candidate: str, reference: str) -> float:
+    candidate_words = _WORD.findall(candidate.lower())
+    reference_words = _WORD.findall(reference.lower())
+    if not candidate_words or not reference_words:
+        return 0.0
+    overlap = sum(min(candidate_words.count(w), reference_words.count(w)) for w in set(candidate_words))
+    precision = overlap / len(candidate_words)
+    recall = overlap / len(reference_words)
+    return 2 * precision * recall / (precision + recall) if overlap else 0.0
+
+
+def make_chats(count: int, lines: int, rng: random.Random):
+    """Short chats mixing filler with the topic sentences of bench_long_summary"""
+    sentences = FILLER + [sentence for _, sentence in TOPICS]
+    return [" ".join(rng.choice(sentences) for _ in range(lines)) for _ in range(count)]
+
+
+def make_phrases(count: int, rng: random.Random):
+    """Distinct message-sized texts drawn from the same vocabulary"""
+    vocabulary = sorted(set(_WORD.findall(" ".join(FILLER + [sentence for _, sentence in TOPICS]).lower())))
+    return [" ".join(rng.sample(vocabulary, rng.randint(5, 15))) for _ in range(count)]
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_summarizer(backends, texts, onnx_dir):
+    print("| summarizer backend | load (s) | p50 latency (s) | mean latency (s) | ROUGE-1 F1 vs fp32 |")
+    print("|---|---|---|---|---|")
+    reference = None
+    for backend in backends:
+        summarizer, load_seconds = timed(ConversationSummarizer, backend=backend, onnx_export_dir=onnx_dir)
+        summarizer.warm_up()
+        summaries, latencies = [], []
+        for text in texts:
+            summary, seconds = timed(summarizer.summarize, text, max_length=80, min_length=20)
+            summaries.append(summary)
+            latencies.append(seconds)
+        reference = reference or summaries
+        agreement = statistics.mean(rouge1_f1(s, r) for s, r in zip(summaries, reference))
+        print(
+            f"| {backend} | {load_seconds:.1f} | {statistics.median(latencies):.3f} | "
+            f"{statistics.mean(latencies):.3f} | {agreement:.3f} |"
+        )
+
+
+def bench_encoder(backends, texts, onnx_dir, store_path):
+    print("| encoder backend | load (s) | texts/s | mean cosine vs fp32 | min cosine | top-10 overlap |")
+    print("|---|---|---|---|---|---|")
+    reference = None
+    for backend in backends:
+        store, load_seconds = timed(
+            VectorStore, store_path=f"{store_path}/{backend}", encoder_backend=backend, onnx_export_dir=onnx_dir
+        )
+        store.warm_up()
+        embeddings, seconds = timed(store._encode_uncached, texts)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        reference = embeddings if reference is None else reference
+        cosine = (embeddings * reference).sum(axis=1)
+
+        # Nearest neighbours of the first 100 texts among all of them
+        queries = min(100, len(texts))
+        ours = np.argsort(-(embeddings[:queries] @ embeddings.T), axis=1)[:, 1:11]
+        theirs = np.argsort(-(reference[:queries] @ reference.T), axis=1)[:, 1:11]
+        overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(ours, theirs)])
+        print(
+            f"| {backend} | {load_seconds:.1f} | {len(texts) / seconds:.0f} | "
+            f"{cosine.mean():.4f} | {cosine.min():.4f} | {overlap:.3f} |"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=INFERENCE_BACKENDS, default=list(INFERENCE_BACKENDS))
+    parser.add_argument("--components", nargs="+", choices=("summarizer", "encoder"), default=["summarizer", "encoder"])
+    parser.add_argument("--summaries", type=int, default=20)
+    parser.add_argument("--embeddings", type=int, default=2000)
+    parser.add_argument("--onnx-dir", default=None, help="Keep ONNX exports here between runs")
+    parser.add_argument("--store-path", default="/tmp/bench_backends")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # fp32 is the reference, so it always runs first
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+    if "summarizer" in args.components:
+        bench_summarizer(backends, make_chats(args.summaries, 40, rng), args.onnx_dir)
+    if "encoder" in args.components:
+        bench_encoder(backends, make_phrases(args.embeddings, rng), args.onnx_dir, args.store_path)
+
+
+if __name__ == "__main__":
+    main()
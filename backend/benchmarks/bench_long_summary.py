@@ -0,0 +1,103 @@
+"""
+Quality and latency of map-reduce summaries against the single-pass summary on long chats
+
+Needs the summarization model (transformers + torch), like the service.
+
+Run from backend/:
+    python -m benchmarks.bench_long_summary --messages 400 800 1600
+"""
+
+import argparse
+import random
+import re
+import time
+
+from ai.summarizer import ConversationSummarizer
+
+# One thread of the day per topic; each keyword should survive into a good summary
+TOPICS = [
+    ("invoice", "The invoice for the Berlin client is still unpaid and finance wants it settled."),
+    ("outage", "The database outage last night took checkout down for forty minutes."),
+    ("hiring", "We are hiring two backend engineers and interviews start on Monday."),
+    ("launch", "The mobile launch moves to Thursday because the review is not done."),
+    ("budget", "Marketing asked for a bigger budget for the spring campaign."),
+    ("migration", "The storage migration to the new cluster finished without data loss."),
+    ("security", "Security found an exposed token in the logs and rotated it."),
+    ("offsite", "The team offsite is booked in Lisbon for the second week of May."),
+]
+
+FILLER = [
+    "ok sounds good",
+    "thanks, will check",
+    "can you share the link again?",
+    "lol yes",
+    "brb, grabbing coffee",
+    "I'll update the ticket",
+    "let's sync after lunch",
+    "agreed",
+]
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def make_conversation(messages: int, rng: random.Random):
+    """Filler chat with each topic mentioned a few times, spread over the day"""
+    lines = [rng.choice(FILLER) for _ in range(messages)]
+    for keyword, sentence in TOPICS:
+        for _ in range(3):
+            lines[rng.randrange(messages)] = sentence
+    reference = " ".join(sentence for _, sentence in TOPICS)
+    return lines, reference
+
+
+def rouge1_recall(summary: str, reference: str) -> float:
+    summary_words = set(_WORD.findall(summary.lower()))
+    reference_words = _WORD.findall(reference.lower())
+    return sum(word in summary_words for word in reference_words) / len(reference_words)
+
+
+def topic_coverage(summary: str) -> float:
+    lowered = summary.lower()
+    return sum(keyword in lowered for keyword, _ in TOPICS) / len(TOPICS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, nargs="+", default=[400, 800, 1600])
+    parser.add_argument("--token-budget", type=int, default=16000)
+    parser.add_argument("--time-budget", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summarizer = ConversationSummarizer()
+    summarizer.warm_up()
+    rng = random.Random(args.seed)
+
+    print("| messages | mode | latency (s) | topic coverage | ROUGE-1 recall |")
+    print("|---|---|---|---|---|")
+    for count in args.messages:
+        lines, reference = make_conversation(count, rng)
+
+        started = time.perf_counter()
+        single = summarizer.summarize(" ".join(lines), max_length=200, min_length=50)
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        long = summarizer.summarize_long(
+            lines,
+            max_length=200,
+            min_length=50,
+            token_budget=args.token_budget,
+            time_budget=args.time_budget
+        )
+        long_seconds = time.perf_counter() - started
+
+        for mode, summary, seconds in (("single pass", single, single_seconds), ("map-reduce", long, long_seconds)):
+            print(
+                f"| {count} | {mode} | {seconds:.2f} | "
+                f"{topic_coverage(summary):.2f} | {rouge1_recall(summary, reference):.2f} |"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Load time and resident memory: metadata.json list-of-dicts vs. the SQLite metadata store
+
+Run from backend/:
+    python -m benchmarks.bench_metadata --rows 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from ai.metadata_store import MetadataStore
+
+
+def make_rows(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    request_metadata = {"source": "matrix", "bridge": "mautrix-instagram", "synced_by": "backfill"}
+    rows = []
+    for i in range(count):
+        rows.append({
+            "conversation_id": f"!room{rng.randint(0, 2000)}:dailyfix.local",
+            "message_id": f"$event{i}",
+            "body": " ".join(rng.choice(["ok", "thanks", "order", "shipping", "when", "help", "today"]) for _ in range(12)),
+            "user_id": f"@user{rng.randint(0, 500)}:dailyfix.local",
+            "timestamp": 1700000000000 + i * 1000,
+            "metadata": request_metadata
+        })
+    return rows
+
+
+def measure(load):
+    """(seconds, peak traced bytes, result) of calling ``load``"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "metadata.json")
+        with open(json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+        sqlite_path = os.path.join(directory, "metadata.sqlite3")
+        store = MetadataStore(sqlite_path)
+        store.add_rows(0, rows)
+        store.close()
+        del rows
+
+        def load_json():
+            with open(json_path) as f:
+                return json.load(f)
+
+        json_seconds, json_bytes, loaded = measure(load_json)
+        sqlite_seconds, sqlite_bytes, store = measure(lambda: MetadataStore(sqlite_path))
+
+        started = time.perf_counter()
+        for _ in range(args.lookups):
+            store.get_rows([rng.randrange(args.rows) for _ in range(args.k)])
+        lookup_ms = (time.perf_counter() - started) / args.lookups * 1000.0
+
+        sizes = (os.path.getsize(json_path), os.path.getsize(sqlite_path))
+        store.close()
+        del loaded
+
+    print(f"rows: {args.rows}")
+    print(f"| backend | file (MB) | load (s) | peak memory (MB) |")
+    print(f"|---|---|---|---|")
+    print(f"| metadata.json | {sizes[0] / 1e6:.1f} | {json_seconds:.3f} | {json_bytes / 1e6:.1f} |")
+    print(f"| sqlite | {sizes[1] / 1e6:.1f} | {sqlite_seconds:.3f} | {sqlite_bytes / 1e6:.1f} |")
+    print(f"top-{args.k} row fetch from sqlite: {lookup_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
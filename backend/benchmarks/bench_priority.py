@@ -0,0 +1,77 @@
+"""
+Throughput of batch priority scoring against scoring one message at a time
+
+Also checks that both give exactly the same scores.
+
+Run from backend/:
+    python -m benchmarks.bench_priority --messages 100000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from ai.priority import MessagePrioritizer
+
+WORDS = [
+    "the", "deploy", "is", "urgent", "error", "how", "do", "we", "fix", "it", "now",
+    "broken", "build", "please", "help", "outage", "on", "prod", "thanks", "lunch",
+    "réunion", "demain", "サーバー", "ダウン", "why", "not", "working", "ok", "critical",
+]
+USERS = ["@alice:example.org", "@support:example.org", "@bob:example.org", "@admin:example.org"]
+
+
+def make_messages(count: int, now: datetime, rng: random.Random):
+    """Chat-like messages with every timestamp form the scorer accepts, plus some it rejects"""
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(0, 40))]
+        if rng.random() < 0.2:
+            words.append(rng.choice(["?", "!!", "!", "@carol"]))
+        sent = now - timedelta(seconds=rng.uniform(0, 48 * 3600))
+        timestamp = rng.choice([
+            int(sent.timestamp() * 1000),
+            sent.timestamp() * 1000,
+            sent.isoformat(),
+            None,
+            "not a date",
+        ])
+        message = {"body": " ".join(words).capitalize(), "user_id": rng.choice(USERS)}
+        message["origin_server_ts" if rng.random() < 0.5 else "timestamp"] = timestamp
+        messages.append(message)
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    prioritizer = MessagePrioritizer()
+    now = datetime.now()
+    rng = random.Random(args.seed)
+
+    print("| messages | per message (msg/s) | batch (msg/s) | speedup | mismatches |")
+    print("|---|---|---|---|---|")
+    for count in args.messages:
+        messages = make_messages(count, now, rng)
+
+        started = time.perf_counter()
+        single = [prioritizer._calculate_priority_score(msg, now) for msg in messages]
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch = prioritizer.score_batch(messages, now)
+        batch_seconds = time.perf_counter() - started
+
+        mismatches = sum(a != b for a, b in zip(single, batch))
+        print(
+            f"| {count} | {count / single_seconds:.0f} | {count / batch_seconds:.0f} | "
+            f"{single_seconds / batch_seconds:.1f}x | {mismatches} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
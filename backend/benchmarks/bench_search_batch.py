@@ -0,0 +1,55 @@
+"""
+Query throughput of batched FAISS searches against one search per query
+
+Run from backend/:
+    python -m benchmarks.bench_search_batch --vectors 200000 --queries 256 --k 10
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from ai.ann_index import AnnIndexConfig
+from benchmarks.bench_ann import make_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index", choices=AnnIndexConfig.INDEX_TYPES, default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    projection = rng.standard_normal((32, args.dimension))
+    clusters = rng.standard_normal((256, 32))
+    index = AnnIndexConfig(args.index).build(
+        args.dimension, make_vectors(args.vectors, projection, clusters, rng)
+    )
+    queries = make_vectors(args.queries, projection, clusters, rng)
+
+    print(
+        f"{args.vectors} vectors ({args.index}), dim {args.dimension}, {args.queries} queries, "
+        f"k={args.k}, {faiss.omp_get_max_threads()} FAISS threads"
+    )
+    print("| batch size | queries/s | speedup |")
+    print("|---|---|---|")
+    baseline = None
+    batch_size = 1
+    while batch_size <= args.queries:
+        started = time.perf_counter()
+        for offset in range(0, args.queries, batch_size):
+            index.search(queries[offset:offset + batch_size], args.k)
+        qps = args.queries / (time.perf_counter() - started)
+        baseline = baseline or qps
+        print(f"| {batch_size} | {qps:.0f} | {qps / baseline:.1f}x |")
+        batch_size *= 4
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Vector store startup time and memory against store size: reading vs. mapping the base snapshot
+
+Each store is opened in a fresh process, so the resident memory is that
+process's own. The snapshot files were just written and sit in the page
+cache; on a cold cache the read path also pays for reading the whole file
+from disk, the mapped one only for the pages its searches touch.
+
+Run from backend/:
+    python -m benchmarks.bench_startup --sizes 10000 100000 300000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Messages per add_embeddings call while building a store
+BATCH = 1000
+
+
+def build_store(path: str, size: int, seed: int = 0):
+    """A compacted store of ``size`` random vectors"""
+    from ai.vector_store import VectorStore
+
+    rng = np.random.default_rng(seed)
+    store = VectorStore(store_path=path, encoder_backend="stub", compact_after_segments=10 ** 9, purge_ratio=0)
+    for offset in range(0, size, BATCH):
+        count = min(BATCH, size - offset)
+        messages = [
+            {"id": f"$event{offset + i}", "body": f"message {offset + i}", "timestamp": 1700000000000 + offset + i}
+            for i in range(count)
+        ]
+        store.add_embeddings(f"!room{offset // BATCH}:example.org", messages, rng.random((count, store.dimension), dtype=np.float32))
+    store.compact()
+    store.metadata_store.close()
+
+
+def resident_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def open_store(path: str, mmap: bool, queries: int):
+    """Child process: open the store, run some searches and print the timings as JSON"""
+    from ai.vector_store import VectorStore
+
+    store = VectorStore(store_path=path, encoder_backend="stub", lazy=True, mmap=mmap)
+    store.load_encoder()
+    before = resident_mb()
+    started = time.perf_counter()
+    store.ensure_loaded()
+    load_seconds = time.perf_counter() - started
+    loaded = resident_mb()
+
+    rng = np.random.default_rng(1)
+    latencies = []
+    for _ in range(queries):
+        query = rng.random((1, store.dimension), dtype=np.float32)
+        started = time.perf_counter()
+        store.search_embeddings(query, top_k=10)
+        latencies.append(time.perf_counter() - started)
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "load_rss_mb": loaded - before,
+        "search_rss_mb": resident_mb() - before,
+        "first_search_ms": latencies[0] * 1000.0,
+        "search_p50_ms": float(np.percentile(latencies, 50)) * 1000.0
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--open", help=argparse.SUPPRESS)
+    parser.add_argument("--mmap", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.open:
+        open_store(args.open, args.mmap, args.queries)
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f"store-{size}")
+            build_store(path, size)
+            snapshot_mb = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith(".faiss")) / 1e6
+            for mmap in (False, True):
+                command = [sys.executable, "-m", "benchmarks.bench_startup", "--open", path, "--queries", str(args.queries)]
+                output = subprocess.run(command + (["--mmap"] if mmap else []), capture_output=True, text=True, check=True).stdout
+                rows.append((size, snapshot_mb, "mmap" if mmap else "read", json.loads(output.strip().splitlines()[-1])))
+
+    print("| vectors | snapshot (MB) | load | load (s) | RSS after load (MB) | RSS after searches (MB) | first search (ms) | search p50 (ms) |")
+    print("|---|---|---|---|---|---|---|---|")
+    for size, snapshot_mb, mode, result in rows:
+        print(
+            f"| {size} | {snapshot_mb:.1f} | {mode} | {result['load_seconds']:.3f} | {result['load_rss_mb']:.1f} | "
+            f"{result['search_rss_mb']:.1f} | {result['first_search_ms']:.2f} | {result['search_p50_ms']:.2f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Compare two benchmark suite result files, e.g. from two commits
+
+Run from backend/:
+    python -m benchmarks.compare baseline.json results.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path: str):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(result["name"], result["size"]): result for result in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Throughput drop reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on any regression")
+    args = parser.parse_args()
+
+    baseline_report, baseline = load(args.baseline)
+    candidate_report, candidate = load(args.candidate)
+    print(f"{baseline_report['commit']} -> {candidate_report['commit']}")
+    print("| benchmark | size | baseline items/s | candidate items/s | change | p50 ms (baseline -> candidate) |")
+    print("|---|---|---|---|---|---|")
+
+    regressions = 0
+    for key in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[key], candidate[key]
+        change = new["items_per_second"] / old["items_per_second"] - 1.0
+        flag = ""
+        if change < -args.threshold:
+            flag = " (regression)"
+            regressions += 1
+        print(
+            f"| {key[0]} | {key[1]} | {old['items_per_second']:.1f} | {new['items_per_second']:.1f} | "
+            f"{change:+.1%}{flag} | {old['latency_ms']['p50']:.3f} -> {new['latency_ms']['p50']:.3f} |"
+        )
+    for key in sorted(set(baseline) ^ set(candidate)):
+        print(f"| {key[0]} | {key[1]} | only in {'baseline' if key in baseline else 'candidate'} | | | |")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Synthetic Matrix-style message corpus for benchmarks
+
+Messages look like the ones the bridge sends: ``event_id``, ``room_id``,
+``user_id``, ``origin_server_ts`` (ms) and a text ``body``. Size, languages
+and the share of exact duplicate bodies (forwards, retries, bot spam) are
+configurable, and the same seed always gives the same corpus.
+
+Run from backend/ to write a corpus as NDJSON, one message per line:
+    python -m benchmarks.corpus --messages 10000 --languages en es de --duplicate-rate 0.1 > corpus.ndjson
+"""
+
+import argparse
+import json
+import random
+import sys
+from typing import Any, Dict, Iterator, List, Sequence
+
+# Message templates per language; {x} slots are filled from the topic words
+TEMPLATES = {
+    "en": [
+        "ok", "thanks!", "lol", "good morning team", "see you tomorrow",
+        "Can you help me with the {x}? It throws an error",
+        "URGENT: the {x} is down, we need a fix asap!",
+        "How do I reset the {x}?",
+        "The {x} is broken and not working since this morning",
+        "I moved the {x} review to Thursday, does that work for everyone?",
+        "Please check the {x} ticket when you have a minute",
+        "We shipped the new {x} last night, no issues so far",
+        "What is the status of the {x} migration?",
+        "@{u} can you take a look at the {x}?",
+        "Where are the meeting notes about the {x}?",
+    ],
+    "es": [
+        "vale", "gracias!", "buenos días equipo", "hasta mañana",
+        "¿Me ayudas con el {x}? Da un error",
+        "URGENTE: el {x} no funciona, necesitamos una solución ya",
+        "¿Cómo reinicio el {x}?",
+        "Moví la revisión del {x} al jueves",
+        "Revisa el ticket del {x} cuando puedas",
+    ],
+    "de": [
+        "ok", "danke!", "guten Morgen zusammen", "bis morgen",
+        "Kannst du mir mit dem {x} helfen? Es kommt ein Fehler",
+        "DRINGEND: {x} ist ausgefallen, bitte sofort prüfen!",
+        "Wie setze ich das {x} zurück?",
+        "Das {x} Review ist jetzt am Donnerstag",
+    ],
+    "fr": [
+        "ok", "merci !", "bonjour l'équipe", "à demain",
+        "Tu peux m'aider avec le {x} ? Il y a une erreur",
+        "URGENT : le {x} est en panne, il faut corriger vite",
+        "Comment réinitialiser le {x} ?",
+        "J'ai déplacé la revue du {x} à jeudi",
+    ],
+    "ja": [
+        "了解", "ありがとう！", "おはようございます", "また明日",
+        "{x}でエラーが出ます。助けてもらえますか？",
+        "緊急：{x}が停止しています。すぐに対応お願いします！",
+        "{x}のリセット方法は？",
+        "{x}のレビューを木曜日に移しました",
+    ],
+}
+
+TOPICS = [
+    "invoice", "database", "checkout", "login page", "deploy", "API", "dashboard",
+    "mobile app", "payment", "search", "backup", "release", "VPN", "printer",
+]
+
+LANGUAGES = tuple(TEMPLATES)
+
+
+def generate_messages(
+    count: int,
+    rooms: int = 20,
+    users: int = 50,
+    languages: Sequence[str] = ("en",),
+    duplicate_rate: float = 0.0,
+    start_ms: int = 1704067200000,
+    span_hours: float = 24.0,
+    seed: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield ``count`` messages in timestamp order
+
+    Args:
+        count: Number of messages
+        rooms: Number of rooms they are spread over
+        users: Number of senders
+        languages: Template languages, picked uniformly per message
+        duplicate_rate: Probability that a message repeats an earlier body verbatim
+        start_ms: Timestamp of the first message (epoch ms)
+        span_hours: Time the messages are spread over
+        seed: Random seed
+    """
+    unknown = set(languages) - set(TEMPLATES)
+    if unknown:
+        raise ValueError(f"Unknown languages {sorted(unknown)}, expected some of {LANGUAGES}")
+    rng = random.Random(seed)
+    room_ids = [f"!room{index}:example.org" for index in range(rooms)]
+    user_ids = [f"@user{index}:example.org" for index in range(users)]
+    # A few senders are support staff, who rank higher
+    user_ids[:max(1, users // 10)] = [f"@support{index}:example.org" for index in range(max(1, users // 10))]
+    step_ms = span_hours * 3600 * 1000 / max(count, 1)
+    bodies: List[str] = []
+
+    for index in range(count):
+        if bodies and rng.random() < duplicate_rate:
+            body = rng.choice(bodies)
+        else:
+            template = rng.choice(TEMPLATES[rng.choice(languages)])
+            body = template.format(x=rng.choice(TOPICS), u=rng.choice(user_ids)[1:].split(":")[0])
+            if rng.random() < 0.3:
+                # Longer messages: a second sentence, possibly in another language
+                body += " " + rng.choice(TEMPLATES[rng.choice(languages)]).format(
+                    x=rng.choice(TOPICS), u="team"
+                )
+            bodies.append(body)
+        yield {
+            "event_id": f"${seed}-{index}:example.org",
+            "room_id": rng.choice(room_ids),
+            "user_id": rng.choice(user_ids),
+            "origin_server_ts": int(start_ms + index * step_ms),
+            "body": body,
+        }
+
+
+def generate_conversations(count: int, **kwargs) -> List[Dict[str, Any]]:
+    """
+    Messages of generate_messages grouped by room, in the shape /daily-report takes
+
+    Returns:
+        [{"room_id": ..., "messages": [...]}, ...]
+    """
+    rooms: Dict[str, List[Dict[str, Any]]] = {}
+    for message in generate_messages(count, **kwargs):
+        rooms.setdefault(message["room_id"], []).append(message)
+    return [{"room_id": room_id, "messages": messages} for room_id, messages in sorted(rooms.items())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--languages", nargs="+", choices=LANGUAGES, default=["en"])
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for message in generate_messages(
+        args.messages,
+        rooms=args.rooms,
+        users=args.users,
+        languages=args.languages,
+        duplicate_rate=args.duplicate_rate,
+        seed=args.seed
+    ):
+        sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
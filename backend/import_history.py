@@ -0,0 +1,102 @@
+"""
+Bulk import of message history: NDJSON files or Matrix room exports
+
+Reads the file a block at a time and stores it in chunks, checkpointing
+after each one under <VECTOR_STORE_PATH>/imports/<import id>.json. Run it
+again with the same --import-id to resume an interrupted import.
+
+By default the store is opened directly, with the settings main.py reads
+from the environment; stop the service first, only one process may write
+to the store. With --url the file is uploaded to a running service's
+/vector/import instead.
+
+Run from backend/:
+    python import_history.py room-export.json
+    python import_history.py history.ndjson --import-id history-2024
+    python import_history.py history.ndjson --url http://localhost:8000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+logger = logging.getLogger("import_history")
+
+
+def guess_format(path: str) -> str:
+    """Element's room exports are .json; everything else is taken as NDJSON"""
+    return "matrix" if path.endswith(".json") else "ndjson"
+
+
+def import_local(args) -> dict:
+    import main as app_module
+    from ai.bulk_import import BulkImporter, ImportCheckpoint
+
+    vector_store = app_module.vector_store
+    vector_store.ensure_loaded()
+    checkpoint = ImportCheckpoint.for_import(app_module.import_directory, args.import_id)
+    size = os.path.getsize(args.file)
+    started = time.perf_counter()
+
+    def progress(state):
+        # Matrix exports have no record offsets; show records instead
+        done = f"{state['bytes'] / size:.1%} of the file, " if state["bytes"] and size else ""
+        rate = state["messages_stored"] / max(time.perf_counter() - started, 1e-9)
+        print(
+            f"\r{done}{state['records']} records, {state['messages_stored']} messages stored ({rate:.0f}/s)",
+            end="", file=sys.stderr, flush=True
+        )
+
+    importer = BulkImporter(vector_store, chunk_size=args.chunk_size, encode_batch_size=args.encode_batch_size)
+    with open(args.file, "rb") as f:
+        state = importer.run(f, args.format, checkpoint, args.room_id, progress)
+    print(file=sys.stderr)
+    # Fold the import's segments into the snapshot before the service opens the store
+    vector_store.compact()
+    return state
+
+
+def import_remote(args) -> dict:
+    query = {"format": args.format, "import_id": args.import_id}
+    if args.room_id:
+        query["room_id"] = args.room_id
+    url = f"{args.url.rstrip('/')}/vector/import?{urllib.parse.urlencode(query)}"
+    with open(args.file, "rb") as f:
+        request = urllib.request.Request(
+            url,
+            data=f,
+            method="POST",
+            headers={"Content-Type": "application/octet-stream", "Content-Length": str(os.path.getsize(args.file))}
+        )
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("file", help="NDJSON file or Matrix room export")
+    parser.add_argument("--format", choices=["ndjson", "matrix"], help="Default: matrix for .json files, else ndjson")
+    parser.add_argument("--import-id", help="Checkpoint name (default: the file name)")
+    parser.add_argument("--room-id", help="Conversation of messages that do not name their room")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("IMPORT_CHUNK_SIZE", "1000")))
+    parser.add_argument("--encode-batch-size", type=int, default=int(os.getenv("INGEST_ENCODE_BATCH_SIZE", "64")))
+    parser.add_argument("--url", help="Upload to a running service instead of opening the store")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    args.format = args.format or guess_format(args.file)
+    args.import_id = args.import_id or "".join(
+        char if char.isalnum() or char in "._-" else "_" for char in os.path.basename(args.file)
+    )[:128]
+
+    state = import_remote(args) if args.url else import_local(args)
+    print(json.dumps(state, indent=2))
+
+
+if __name__ == "__main__":
+    main()
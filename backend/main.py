@@ -3,20 +3,37 @@ Dailyfix AI Backend - FastAPI Service
 Provides AI-powered conversation analysis features
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
+from collections import Counter
 from datetime import datetime, date
+import asyncio
+import json
 import logging
+import os
+import threading
+import time
 
+from ai import metrics, profiling
 from ai.summarizer import ConversationSummarizer
 from ai.intent import IntentParser
 from ai.priority import MessagePrioritizer
 from ai.vector_store import VectorStore
+from ai.ann_index import AnnIndexConfig
+from ai.embedding_cache import EmbeddingCache
+from ai.summary_cache import SummaryCache
+from ai.batching import SummaryBatcher
+from ai.daily_aggregates import DailyReportAggregator, key_insights
+from ai.executors import InferencePool, PoolRejectedError
+from ai.ingestion import IngestionQueue, run_on_pool
+from ai.bulk_import import FORMATS as IMPORT_FORMATS, IMPORT_ID_RE, BulkImporter, ImportCheckpoint, StreamReader
+from ai.profiling import FlightRecorder
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging; per-request messages are DEBUG, LOG_LEVEL=DEBUG shows them
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -35,20 +52,248 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AI components
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Request latency per endpoint", ["method", "path", "status"]
+)
+
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """
+    Per-endpoint latency histogram, a Server-Timing header with the request's
+    stages and, when enabled, the slow-request flight recorder
+    """
+    stages, token = metrics.begin_request()
+    profile = flight_recorder.start(request.method, request.url.path) if flight_recorder is not None else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        with profiling.activate((profile,) if profile is not None else ()):
+            response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.end_request(token)
+        elapsed = time.perf_counter() - started
+        # The route template, so /vector/conversation/{conversation_id} is one series
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, path=path, status=status)
+        if profile is not None:
+            flight_recorder.finish(profile, status, path)
+    response.headers["Server-Timing"] = metrics.server_timing(stages, elapsed)
+    return response
+
+
+# Initialize AI components (models load in the background or on first use)
 logger.info("Initializing AI components...")
-summarizer = ConversationSummarizer()
-intent_parser = IntentParser()
+# Inference backend per model: torch (fp32), int8 (dynamic quantization) or onnx
+inference_backend = os.getenv("INFERENCE_BACKEND", "torch")
+summarizer_backend = os.getenv("SUMMARIZER_BACKEND", inference_backend)
+encoder_backend = os.getenv("ENCODER_BACKEND", inference_backend)
+onnx_export_dir = os.getenv("ONNX_EXPORT_DIR", "/app/onnx")
+summary_cache_size = int(os.getenv("SUMMARY_CACHE_SIZE", "2048"))
+summarizer = ConversationSummarizer(
+    lazy=True,
+    chunk_tokens=int(os.getenv("SUMMARY_CHUNK_TOKENS", "900")),
+    chunk_batch_size=int(os.getenv("SUMMARY_CHUNK_BATCH_SIZE", "8")),
+    cache=SummaryCache(
+        max_entries=summary_cache_size,
+        ttl_seconds=float(os.getenv("SUMMARY_CACHE_TTL", "0")),
+        disk_path=os.getenv("SUMMARY_CACHE_PATH") or None
+    ) if summary_cache_size > 0 else None,
+    backend=summarizer_backend,
+    onnx_export_dir=onnx_export_dir
+)
+# Bounds on long-document (map-reduce) summaries
+summary_long_token_budget = int(os.getenv("SUMMARY_LONG_TOKEN_BUDGET", "16000"))
+summary_long_time_budget = float(os.getenv("SUMMARY_LONG_TIME_BUDGET", "20"))
+intent_parser = IntentParser(lazy=True)
 prioritizer = MessagePrioritizer()
-vector_store = VectorStore()
+# Lines per chunk written by /priority in streaming mode
+priority_stream_chunk = int(os.getenv("PRIORITY_STREAM_CHUNK", "500"))
+vector_store_path = os.getenv("VECTOR_STORE_PATH", "/app/vector_store")
+embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+vector_store = VectorStore(
+    store_path=vector_store_path,
+    lazy=True,
+    compact_after_segments=int(os.getenv("VECTOR_COMPACT_SEGMENTS", "64")),
+    index_config=AnnIndexConfig(
+        index_type=os.getenv("VECTOR_INDEX_TYPE", "flat"),
+        nlist=int(os.getenv("VECTOR_IVF_NLIST", "1024")),
+        nprobe=int(os.getenv("VECTOR_IVF_NPROBE", "16")),
+        hnsw_m=int(os.getenv("VECTOR_HNSW_M", "32")),
+        ef_construction=int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "200")),
+        ef_search=int(os.getenv("VECTOR_HNSW_EF_SEARCH", "64")),
+        migrate_threshold=int(os.getenv("VECTOR_INDEX_MIGRATE_THRESHOLD", "100000"))
+    ),
+    exact_filter_threshold=int(os.getenv("VECTOR_EXACT_FILTER_THRESHOLD", "20000")),
+    purge_ratio=float(os.getenv("VECTOR_PURGE_RATIO", "0.2")),
+    mmap=os.getenv("VECTOR_STORE_MMAP", "true").lower() in ("1", "true", "yes"),
+    encoder_backend=encoder_backend,
+    onnx_export_dir=onnx_export_dir,
+    embedding_cache=EmbeddingCache(
+        dimension=384,
+        max_entries=embedding_cache_size,
+        disk_path=(
+            # Backends embed slightly differently: keep their caches apart
+            os.path.join(
+                vector_store_path,
+                "embedding_cache" if encoder_backend == "torch" else f"embedding_cache-{encoder_backend}"
+            )
+            if os.getenv("EMBEDDING_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+            else None
+        )
+    ) if embedding_cache_size > 0 else None
+)
+report_aggregator = DailyReportAggregator(
+    intent_parser,
+    prioritizer,
+    summarizer,
+    top_n=5,
+    retention_days=int(os.getenv("REPORT_RETENTION_DAYS", "7"))
+)
+model_components = [intent_parser, vector_store, summarizer]
 logger.info("AI components initialized successfully")
 
+# Dedicated worker pools so blocking inference never runs on the event loop
+summarizer_pool = InferencePool(
+    "summarizer",
+    max_workers=int(os.getenv("SUMMARIZER_WORKERS", "1")),
+    max_queue=int(os.getenv("SUMMARIZER_MAX_QUEUE", "32")),
+    timeout=float(os.getenv("SUMMARIZER_TIMEOUT", "60"))
+)
+encoder_pool = InferencePool(
+    "encoder",
+    max_workers=int(os.getenv("ENCODER_WORKERS", "1")),
+    max_queue=int(os.getenv("ENCODER_MAX_QUEUE", "64")),
+    timeout=float(os.getenv("ENCODER_TIMEOUT", "10"))
+)
+faiss_pool = InferencePool(
+    "faiss",
+    max_workers=int(os.getenv("FAISS_WORKERS", "2")),
+    max_queue=int(os.getenv("FAISS_MAX_QUEUE", "64")),
+    timeout=float(os.getenv("FAISS_TIMEOUT", "5"))
+)
+intent_pool = InferencePool(
+    "intent",
+    max_workers=int(os.getenv("INTENT_WORKERS", "1")),
+    max_queue=int(os.getenv("INTENT_MAX_QUEUE", "16")),
+    timeout=float(os.getenv("INTENT_TIMEOUT", "30"))
+)
+# Priority selection has its own threads, so /daily-report runs it alongside intent parsing
+priority_pool = InferencePool(
+    "priority",
+    max_workers=int(os.getenv("PRIORITY_WORKERS", "1")),
+    max_queue=int(os.getenv("PRIORITY_MAX_QUEUE", "16")),
+    timeout=float(os.getenv("PRIORITY_TIMEOUT", "30"))
+)
+summary_batcher = SummaryBatcher(
+    summarizer,
+    max_batch_size=int(os.getenv("SUMMARY_BATCH_MAX_SIZE", "8")),
+    max_wait_ms=float(os.getenv("SUMMARY_BATCH_WINDOW_MS", "20")),
+    pool=summarizer_pool,
+    max_queue_size=summarizer_pool.max_queue,
+    timeout=summarizer_pool.timeout
+)
+# /vector/store requests are stored in the background, many per encoder batch
+ingestion_queue = IngestionQueue(
+    vector_store,
+    encoder_pool=encoder_pool,
+    faiss_pool=faiss_pool,
+    max_batch_messages=int(os.getenv("INGEST_BATCH_MESSAGES", "1024")),
+    max_wait_ms=float(os.getenv("INGEST_BATCH_WINDOW_MS", "50")),
+    encode_batch_size=int(os.getenv("INGEST_ENCODE_BATCH_SIZE", "64")),
+    max_queue_size=int(os.getenv("INGEST_MAX_QUEUE", "20000")),
+    job_history=int(os.getenv("INGEST_JOB_HISTORY", "10000"))
+)
+# Bulk imports (POST /vector/import) and their checkpoints
+import_directory = os.path.join(vector_store_path, "imports")
+import_chunk_size = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+active_imports = set()
+
+# Slow-request flight recorder: off unless PROFILE_SLOW_REQUEST_MS is set
+profile_threshold_ms = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+flight_recorder = FlightRecorder(
+    threshold_ms=profile_threshold_ms,
+    capacity=int(os.getenv("PROFILE_RING_SIZE", "20")),
+    interval_ms=float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+) if profile_threshold_ms > 0 else None
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def load_components(warm_up: bool = False):
+    """Load every model component and log a startup-time breakdown"""
+    started = time.perf_counter()
+    for component in model_components:
+        try:
+            if warm_up:
+                component.warm_up()
+            else:
+                component.ensure_loaded()
+        except Exception as e:
+            logger.error(f"{component.component_name} is not available: {e}")
+    
+    breakdown = ", ".join(
+        f"{component.component_name}={component.get_status()['load_seconds']}s"
+        for component in model_components
+    )
+    logger.info(
+        f"Startup time breakdown: {breakdown} "
+        f"(total {time.perf_counter() - started:.2f}s)"
+    )
+
+
+def init_worker(worker: int, workers: int):
+    """
+    Per-process setup of a serve.py worker, right after the fork
+
+    All workers share the vector store directory; worker 0 is its primary
+    (compaction, migration, purges) and the only writer of the disk
+    embedding cache.
+    """
+    vector_store.shared = workers > 1
+    vector_store.primary = worker == 0
+    if vector_store.embedding_cache is not None:
+        vector_store.embedding_cache.disk_read_only = worker != 0
+
+
+@app.on_event("startup")
+async def startup():
+    # Serve /health immediately; /ready flips once the models are loaded
+    if _env_flag("PRELOAD_MODELS", "true"):
+        threading.Thread(
+            target=load_components,
+            kwargs={"warm_up": _env_flag("WARMUP_MODELS", "false")},
+            name="model-loader",
+            daemon=True
+        ).start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await summary_batcher.close()
+    # Before the pools it runs on shut down
+    await ingestion_queue.close()
+    if summarizer.cache is not None:
+        summarizer.cache.close()
+    if vector_store.embedding_cache is not None:
+        vector_store.embedding_cache.close()
+    for pool in (summarizer_pool, encoder_pool, faiss_pool, intent_pool, priority_pool):
+        pool.shutdown()
+    if flight_recorder is not None:
+        flight_recorder.stop()
+
 
 # Request/Response Models
 class SummarizeRequest(BaseModel):
     text: str
     max_length: Optional[int] = 150
     min_length: Optional[int] = 30
+    # Read the whole text with map-reduce summarization instead of its first 1024 tokens
+    long_document: Optional[bool] = False
 
 
 class SummarizeResponse(BaseModel):
@@ -68,8 +313,21 @@ class IntentResponse(BaseModel):
     entities: List[Dict[str, Any]]
 
 
+class IntentBatchRequest(BaseModel):
+    messages: List[str]
+
+
+class IntentBatchResponse(BaseModel):
+    results: List[IntentResponse]
+
+
 class PriorityRequest(BaseModel):
     messages: List[Dict[str, Any]]
+    top_k: Optional[int] = None  # Only the k highest-priority messages (default: all)
+    # Return {index, id, priority_score} per message instead of the messages
+    ids_only: Optional[bool] = False
+    # Stream the result as NDJSON, one ranked entry per line
+    stream: Optional[bool] = False
 
 
 class PriorityResponse(BaseModel):
@@ -85,18 +343,38 @@ class VectorStoreRequest(BaseModel):
 class VectorSearchRequest(BaseModel):
     query: str
     top_k: Optional[int] = 5
+    # Optional filters, applied inside the search
+    conversation_id: Optional[str] = None
+    user_id: Optional[str] = None
+    start_time: Optional[Union[int, float, str]] = None  # epoch ms or ISO-8601, inclusive
+    end_time: Optional[Union[int, float, str]] = None
 
 
 class VectorSearchResponse(BaseModel):
     results: List[Dict[str, Any]]
 
 
+class VectorSearchBatchRequest(BaseModel):
+    queries: List[VectorSearchRequest]
+
+
+class VectorSearchBatchResponse(BaseModel):
+    results: List[VectorSearchResponse]  # One entry per query, in request order
+
+
 class DailyReportRequest(BaseModel):
     user_id: str
     date: str  # YYYY-MM-DD format
     conversations: Optional[List[Dict[str, Any]]] = None
 
 
+class DailyReportIngestRequest(BaseModel):
+    user_id: str
+    messages: List[Dict[str, Any]]
+    conversation_id: Optional[str] = None
+    date: Optional[str] = None  # YYYY-MM-DD for messages without a timestamp
+
+
 class DailyReportResponse(BaseModel):
     user_id: str
     date: str
@@ -106,6 +384,7 @@ class DailyReportResponse(BaseModel):
     priority_messages: List[Dict[str, Any]]
     intent_distribution: Dict[str, int]
     key_insights: List[str]
+    timings_ms: Optional[Dict[str, float]] = None  # Wall time per pipeline stage
 
 
 # Health check endpoint
@@ -120,22 +399,184 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "inference_backends": {
+            "summarizer": summarizer.backend,
+            "encoder": vector_store.encoder_backend
+        }
+    }
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once every model component is loaded, 503 before
+    """
+    components = {
+        component.component_name: component.get_status()
+        for component in model_components
+    }
+    is_ready = all(component.ready for component in model_components)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "status": "ready" if is_ready else "not_ready",
+            "components": components
+        }
+    )
+
+
+@app.get("/pools")
+async def pool_stats():
+    """
+    Queue depth and rejection counters for the inference worker pools
+    """
+    return {
+        "pools": [
+            pool.get_stats()
+            for pool in (summarizer_pool, encoder_pool, faiss_pool, intent_pool, priority_pool)
+        ]
+    }
+
+
+def collect_component_metrics():
+    """Scrape-time gauges and counters read from the components' get_stats"""
+    pools = [pool.get_stats() for pool in (summarizer_pool, encoder_pool, faiss_pool, intent_pool, priority_pool)]
+    families = [
+        (f"inference_pool_{key}", "gauge", description, [({"pool": stats["name"]}, stats[key]) for stats in pools])
+        for key, description in (
+            ("in_flight", "Jobs running or queued on the pool"),
+            ("queue_depth", "Jobs waiting for a worker"),
+        )
+    ]
+    families.extend(
+        (f"inference_pool_{key}_total", "counter", description, [({"pool": stats["name"]}, stats[key]) for stats in pools])
+        for key, description in (
+            ("completed", "Jobs finished"),
+            ("rejected", "Jobs rejected because the queue was full"),
+            ("timed_out", "Jobs that exceeded the pool timeout"),
+        )
+    )
+
+    batcher = summary_batcher.get_stats()
+    families.extend([
+        ("summary_batcher_queue_depth", "gauge", "Summaries waiting to be batched", [({}, batcher["queue_depth"])]),
+        ("summary_batcher_batches_total", "counter", "Summarization batches run", [({}, batcher["batches"])]),
+        ("summary_batcher_requests_total", "counter", "Summaries requested through the batcher", [({}, batcher["requests"])]),
+    ])
+
+    ingestion = ingestion_queue.get_stats()
+    families.extend([
+        ("ingest_queue_messages", "gauge", "Messages waiting to be stored", [({}, ingestion["queued_messages"])]),
+        ("ingest_jobs_total", "counter", "Ingestion jobs by outcome", [
+            ({"outcome": outcome}, ingestion[outcome]) for outcome in ("completed", "failed", "rejected")
+        ]),
+    ])
+
+    caches = [
+        (name, cache.get_stats())
+        for name, cache in (("summary", summarizer.cache), ("embedding", vector_store.embedding_cache))
+        if cache is not None
+    ]
+    families.extend([
+        ("cache_hits_total", "counter", "Cache hits (memory and disk tiers)", [
+            ({"cache": name, "tier": tier}, stats[f"{tier}_hits"]) for name, stats in caches for tier in ("memory", "disk")
+        ]),
+        ("cache_misses_total", "counter", "Cache misses", [({"cache": name}, stats["misses"]) for name, stats in caches]),
+        ("cache_hit_rate", "gauge", "Hits over lookups since start", [({"cache": name}, stats["hit_rate"]) for name, stats in caches]),
+        ("cache_entries", "gauge", "Entries held in memory", [({"cache": name}, stats["memory_entries"]) for name, stats in caches]),
+    ])
+
+    if vector_store.ready:
+        stats = vector_store.get_stats()
+        families.extend(
+            (f"vector_store_{key}", "gauge", description, [({}, stats[key])])
+            for key, description in (
+                ("total_vectors", "Vectors in the index, including deleted ones awaiting purge"),
+                ("deleted_vectors", "Deleted vectors still in the index"),
+                ("index_memory_bytes", "Estimated heap memory held by the FAISS index"),
+                ("index_mapped_bytes", "Estimated size of the FAISS index served from mapped snapshot files"),
+                ("disk_bytes", "Size of the store directory"),
+                ("pending_segments", "Segments written since the last snapshot"),
+            )
+        )
+    return families
+
+
+metrics.registry.add_collector(collect_component_metrics)
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus scrape endpoint: latency histograms, model stage timings,
+    pool queues, cache hit rates and index size
+    """
+    # Sync handler: the collectors take component locks, keep them off the event loop
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/profiles")
+async def slow_request_profiles():
+    """
+    Slow requests kept by the flight recorder, newest first
+    """
+    if flight_recorder is None:
+        return {"enabled": False, "profiles": []}
+    return {
+        "enabled": True,
+        **flight_recorder.get_stats(),
+        "profiles": [profile.summary() for profile in reversed(flight_recorder.profiles())]
+    }
+
+
+@app.get("/admin/profiles/collapsed")
+async def slow_request_stacks(profile_id: Optional[int] = None):
+    """
+    Sampled stacks of the kept slow requests (or one of them) in collapsed
+    format, for flamegraph.pl or speedscope
+    """
+    if flight_recorder is None:
+        raise HTTPException(status_code=404, detail="Flight recorder is disabled, set PROFILE_SLOW_REQUEST_MS")
+    profiles = flight_recorder.profiles()
+    if profile_id is not None:
+        profiles = [profile for profile in profiles if profile.id == profile_id]
+        if not profiles:
+            raise HTTPException(status_code=404, detail=f"No profile {profile_id} in the flight recorder")
+    return PlainTextResponse(profiling.collapsed(profiles))
 
 
 # Summarization endpoint
+async def summarize_long(messages: Union[str, List[str]], max_length: int, min_length: int) -> str:
+    """Map-reduce summary on the summarizer pool, bounded by the long-summary budgets"""
+    return await summarizer_pool.run(
+        summarizer.summarize_long,
+        messages,
+        max_length=max_length,
+        min_length=min_length,
+        token_budget=summary_long_token_budget,
+        time_budget=summary_long_time_budget,
+        # time_budget bounds the work itself
+        timeout=0
+    )
+
+
 @app.post("/summarize", response_model=SummarizeResponse)
 async def summarize(request: SummarizeRequest):
     """
     Summarize a conversation using BART model
     """
     try:
-        logger.info(f"Summarizing text of length {len(request.text)}")
-        summary = summarizer.summarize(
-            request.text,
-            max_length=request.max_length,
-            min_length=request.min_length
-        )
+        logger.debug(f"Summarizing text of length {len(request.text)}")
+        if request.long_document:
+            summary = await summarize_long(request.text, request.max_length, request.min_length)
+        else:
+            summary = await summary_batcher.submit(
+                request.text,
+                max_length=request.max_length,
+                min_length=request.min_length
+            )
         
         original_length = len(request.text.split())
         summary_length = len(summary.split())
@@ -147,11 +588,24 @@ async def summarize(request: SummarizeRequest):
             summary_length=summary_length,
             compression_ratio=compression_ratio
         )
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error in summarization: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
 
 
+@app.get("/summarize/stats")
+async def summarize_stats():
+    """
+    Batch size and queue wait statistics for the summarization batcher,
+    plus summary cache hit rates
+    """
+    stats = summary_batcher.get_stats()
+    stats["cache"] = summarizer.cache.get_stats() if summarizer.cache is not None else None
+    return stats
+
+
 # Intent parsing endpoint
 @app.post("/intent", response_model=IntentResponse)
 async def parse_intent(request: IntentRequest):
@@ -159,7 +613,7 @@ async def parse_intent(request: IntentRequest):
     Parse user intent from a message
     """
     try:
-        logger.info(f"Parsing intent for message: {request.message[:50]}...")
+        logger.debug(f"Parsing intent for message: {request.message[:50]}...")
         result = intent_parser.parse(request.message)
         
         return IntentResponse(
@@ -172,46 +626,223 @@ async def parse_intent(request: IntentRequest):
         raise HTTPException(status_code=500, detail=f"Intent parsing failed: {str(e)}")
 
 
+# Batched intent parsing endpoint
+@app.post("/intent/batch", response_model=IntentBatchResponse)
+async def parse_intent_batch(request: IntentBatchRequest):
+    """
+    Parse user intent for many messages in one request
+    """
+    try:
+        logger.debug(f"Parsing intent for {len(request.messages)} messages")
+        results = await intent_pool.run(intent_parser.parse_batch, request.messages)
+        
+        return IntentBatchResponse(
+            results=[
+                IntentResponse(
+                    intent=result["intent"],
+                    confidence=result["confidence"],
+                    entities=result.get("entities", [])
+                )
+                for result in results
+            ]
+        )
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in batch intent parsing: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Intent parsing failed: {str(e)}")
+
+
 # Priority ranking endpoint
+def priority_entry(messages: List[Dict[str, Any]], position: int, score: float, ids_only: bool) -> Dict[str, Any]:
+    """One ranked entry of a /priority response"""
+    message = messages[position]
+    if ids_only:
+        return {
+            "index": position,
+            "id": message.get("id") or message.get("event_id"),
+            "priority_score": score
+        }
+    entry = message.copy()
+    entry["priority_score"] = score
+    return entry
+
+
+def priority_lines(messages: List[Dict[str, Any]], positions: List[int], scores: List[float], ids_only: bool):
+    """NDJSON lines of a ranked response, built a chunk at a time"""
+    for offset in range(0, len(positions), priority_stream_chunk):
+        yield "".join(
+            json.dumps(priority_entry(messages, position, scores[position], ids_only)) + "\n"
+            for position in positions[offset:offset + priority_stream_chunk]
+        )
+
+
 @app.post("/priority", response_model=PriorityResponse)
 async def prioritize_messages(request: PriorityRequest):
     """
     Rank messages by importance/priority
+    
+    With ``top_k`` only the best k are selected and sorted. ``ids_only``
+    returns input positions, ids and scores instead of echoing the messages.
+    ``stream`` writes the ranking as NDJSON (``application/x-ndjson``) so the
+    response is never held in memory as a whole.
     """
     try:
-        logger.info(f"Prioritizing {len(request.messages)} messages")
-        ranked = prioritizer.rank(request.messages)
+        logger.debug(f"Prioritizing {len(request.messages)} messages")
+        positions, scores = await priority_pool.run(prioritizer.select, request.messages, request.top_k)
         
-        return PriorityResponse(ranked_messages=ranked)
+        if request.stream:
+            return StreamingResponse(
+                priority_lines(request.messages, positions, scores, request.ids_only),
+                media_type="application/x-ndjson"
+            )
+        return PriorityResponse(ranked_messages=[
+            priority_entry(request.messages, position, scores[position], request.ids_only)
+            for position in positions
+        ])
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error in prioritization: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prioritization failed: {str(e)}")
 
 
 # Vector storage endpoint
-@app.post("/vector/store")
-async def store_vectors(request: VectorStoreRequest):
+@app.post("/vector/store", status_code=202)
+async def store_vectors(request: VectorStoreRequest, wait: bool = False):
     """
-    Store conversation embeddings in FAISS
+    Queue conversation messages to be embedded and stored in FAISS
+    
+    Returns the job id right away (202); ``GET /vector/store/jobs/{job_id}``
+    reports when the messages are searchable. With ``wait=true`` the
+    response is sent once they are (200).
     """
     try:
-        logger.info(f"Storing vectors for conversation {request.conversation_id}")
-        vector_store.store_conversation(
-            conversation_id=request.conversation_id,
-            messages=request.messages,
-            metadata=request.metadata
-        )
+        logger.debug(f"Queueing vectors for conversation {request.conversation_id}")
+        job = ingestion_queue.submit(request.conversation_id, request.messages, request.metadata)
+        if not wait:
+            return {
+                "status": "queued",
+                "job_id": job.id,
+                "conversation_id": request.conversation_id,
+                "messages_queued": len(request.messages)
+            }
         
-        return {
+        await job.done.wait()
+        if job.error is not None:
+            raise HTTPException(status_code=500, detail=f"Vector storage failed: {job.error}")
+        return JSONResponse({
             "status": "success",
+            "job_id": job.id,
             "conversation_id": request.conversation_id,
-            "messages_stored": len(request.messages)
-        }
+            "messages_stored": job.stored
+        })
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error storing vectors: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Vector storage failed: {str(e)}")
 
 
+@app.get("/vector/store/jobs/{job_id}")
+async def vector_store_job(job_id: str):
+    """
+    Status of a queued store request: queued, running, done or failed
+    """
+    job = ingestion_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job {job_id}")
+    return job.summary()
+
+
+@app.get("/vector/store/stats")
+async def vector_store_queue_stats():
+    """
+    Ingestion queue depth, job counters and batch sizes
+    """
+    return ingestion_queue.get_stats()
+
+
+@app.post("/vector/import")
+async def import_vectors(
+    request: Request,
+    format: str = "ndjson",
+    import_id: Optional[str] = None,
+    room_id: Optional[str] = None
+):
+    """
+    Stream an NDJSON file or Matrix room export into the vector store
+    
+    The request body is parsed as it arrives and stored ``IMPORT_CHUNK_SIZE``
+    messages at a time; the response is the import's final checkpoint. An
+    interrupted import is resumed by uploading the same file again with the
+    same ``import_id``: the records it already stored are skipped.
+    """
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}, expected one of {list(IMPORT_FORMATS)}")
+    import_id = import_id or f"import-{os.getpid():x}-{int(time.time() * 1000):x}"
+    try:
+        checkpoint = ImportCheckpoint.for_import(import_directory, import_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if import_id in active_imports:
+        raise HTTPException(status_code=409, detail=f"Import {import_id} is already running")
+    
+    loop = asyncio.get_running_loop()
+    
+    def on_pool(pool: InferencePool, fn):
+        # The importer runs in a thread; its encoder and index work queues on the pools like everything else
+        return lambda *args: asyncio.run_coroutine_threadsafe(run_on_pool(pool, fn, *args), loop).result()
+    
+    importer = BulkImporter(
+        vector_store,
+        chunk_size=import_chunk_size,
+        encode_batch_size=ingestion_queue.encode_batch_size,
+        encode=on_pool(encoder_pool, vector_store.encode),
+        add_batch=on_pool(faiss_pool, vector_store.add_batch)
+    )
+    reader = StreamReader()
+    active_imports.add(import_id)
+    try:
+        task = loop.run_in_executor(None, importer.run, reader, format, checkpoint, room_id)
+        # Once the importer stops (e.g. on a parse error) nothing reads the body any more
+        task.add_done_callback(lambda _: reader.close())
+        try:
+            async for data in request.stream():
+                if data and not await asyncio.to_thread(reader.put, data):
+                    break
+            await asyncio.to_thread(reader.put, b"")
+        except Exception as e:
+            reader.fail(f"Upload interrupted ({type(e).__name__})")
+        
+        state = await task
+        logger.info(f"Import {import_id}: {state['messages_stored']} messages from {state['records']} records")
+        return state
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Import {import_id} failed: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error importing vectors: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Import {import_id} failed: {str(e)}")
+    finally:
+        active_imports.discard(import_id)
+        reader.close()
+
+
+@app.get("/vector/import/{import_id}")
+async def import_status(import_id: str):
+    """
+    Checkpoint of a bulk import: records and messages stored so far and its status
+    """
+    path = os.path.join(import_directory, f"{import_id}.json")
+    if not IMPORT_ID_RE.match(import_id) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Unknown import {import_id}")
+    return ImportCheckpoint(path).state
+
+
 # Vector search endpoint
 @app.post("/vector/search", response_model=VectorSearchResponse)
 async def search_vectors(request: VectorSearchRequest):
@@ -219,26 +850,156 @@ async def search_vectors(request: VectorSearchRequest):
     Semantic search over stored conversations
     """
     try:
-        logger.info(f"Searching vectors for query: {request.query[:50]}...")
-        results = vector_store.search(request.query, top_k=request.top_k)
+        logger.debug(f"Searching vectors for query: {request.query[:50]}...")
+        query_embedding = await encoder_pool.run(vector_store.encode, [request.query])
+        results = await faiss_pool.run(
+            vector_store.search_embeddings,
+            query_embedding,
+            top_k=request.top_k,
+            filters={
+                "conversation_id": request.conversation_id,
+                "user_id": request.user_id,
+                "start_time": request.start_time,
+                "end_time": request.end_time
+            }
+        )
         
         return VectorSearchResponse(results=results)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error in vector search: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Vector search failed: {str(e)}")
 
 
+# Batched vector search endpoint
+@app.post("/vector/search/batch", response_model=VectorSearchBatchResponse)
+async def search_vectors_batch(request: VectorSearchBatchRequest):
+    """
+    Semantic search for many queries with one encoder call and one FAISS call
+    """
+    try:
+        logger.debug(f"Searching vectors for {len(request.queries)} queries")
+        if not request.queries:
+            return VectorSearchBatchResponse(results=[])
+        query_embeddings = await encoder_pool.run(
+            vector_store.encode, [query.query for query in request.queries]
+        )
+        results = await faiss_pool.run(
+            vector_store.search_embeddings_batch,
+            query_embeddings,
+            [5 if query.top_k is None else query.top_k for query in request.queries],
+            [
+                {
+                    "conversation_id": query.conversation_id,
+                    "user_id": query.user_id,
+                    "start_time": query.start_time,
+                    "end_time": query.end_time
+                }
+                for query in request.queries
+            ]
+        )
+        
+        return VectorSearchBatchResponse(
+            results=[VectorSearchResponse(results=query_results) for query_results in results]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in batch vector search: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Vector search failed: {str(e)}")
+
+
+# Vector delete endpoints
+@app.delete("/vector/conversation/{conversation_id}")
+async def delete_conversation_vectors(conversation_id: str):
+    """
+    Delete every stored message of a conversation
+    """
+    try:
+        deleted = await faiss_pool.run(vector_store.delete, conversation_id)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        return {"status": "success", "conversation_id": conversation_id, "messages_deleted": deleted}
+    except HTTPException:
+        raise
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error deleting vectors: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Vector delete failed: {str(e)}")
+
+
+@app.delete("/vector/conversation/{conversation_id}/messages/{message_id}")
+async def delete_message_vector(conversation_id: str, message_id: str):
+    """
+    Delete one stored message
+    """
+    try:
+        deleted = await faiss_pool.run(vector_store.delete, conversation_id, [message_id])
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Message not found")
+        return {"status": "success", "conversation_id": conversation_id, "messages_deleted": deleted}
+    except HTTPException:
+        raise
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error deleting vectors: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Vector delete failed: {str(e)}")
+
+
+# Vector store stats endpoint
+@app.get("/vector/stats")
+async def vector_stats():
+    """
+    Index size, persistence and embedding cache statistics
+    """
+    try:
+        return await faiss_pool.run(vector_store.get_stats)
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading vector stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Vector stats failed: {str(e)}")
+
+
 # Daily report endpoint
+async def timed_stage(timings: Dict[str, float], name: str, awaitable):
+    """Await ``awaitable`` and record its wall time in ms under ``name``"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[name] = round(elapsed * 1000.0, 1)
+        metrics.record_stage(f"report.{name}", elapsed)
+
+
 @app.post("/daily-report", response_model=DailyReportResponse)
 async def generate_daily_report(request: DailyReportRequest):
     """
     Generate a comprehensive daily report for a user
     """
     try:
-        logger.info(f"Generating daily report for user {request.user_id} on {request.date}")
+        logger.debug(f"Generating daily report for user {request.user_id} on {request.date}")
         
-        # If conversations not provided, return template
+        # If conversations not provided, serve the pre-aggregated report
         if not request.conversations:
+            report = await summarizer_pool.run(
+                report_aggregator.report,
+                request.user_id,
+                request.date,
+                token_budget=summary_long_token_budget,
+                time_budget=summary_long_time_budget,
+                timeout=0
+            )
+            if report is not None:
+                return DailyReportResponse(**report)
             return DailyReportResponse(
                 user_id=request.user_id,
                 date=request.date,
@@ -250,51 +1011,42 @@ async def generate_daily_report(request: DailyReportRequest):
                 key_insights=["No data available"]
             )
         
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        
         # Aggregate data
         total_conversations = len(request.conversations)
         total_messages = sum(len(conv.get("messages", [])) for conv in request.conversations)
         
-        # Combine all messages for summarization
         all_text = []
         all_messages = []
-        intents = []
-        
         for conv in request.conversations:
-            messages = conv.get("messages", [])
-            for msg in messages:
+            for msg in conv.get("messages", []):
                 text = msg.get("body", "")
                 if text:
                     all_text.append(text)
                     all_messages.append(msg)
-                    # Parse intent for each message
-                    intent_result = intent_parser.parse(text)
-                    intents.append(intent_result["intent"])
+        timings["collect"] = round((time.perf_counter() - started) * 1000.0, 1)
         
-        # Generate summary
-        combined_text = " ".join(all_text)
-        if combined_text:
-            summary = summarizer.summarize(combined_text, max_length=200, min_length=50)
+        # Summarization, intent parsing and priority scoring run concurrently,
+        # each as one batched job on its worker pool
+        if all_text:
+            summary, intent_results, ranked_messages = await asyncio.gather(
+                # Over the whole day, not just its first chunk
+                timed_stage(timings, "summarize", summarize_long(all_text, max_length=200, min_length=50)),
+                timed_stage(timings, "intent", intent_pool.run(intent_parser.parse_batch, all_text)),
+                timed_stage(timings, "priority", priority_pool.run(prioritizer.top, all_messages, 5))
+            )
         else:
-            summary = "No messages to summarize."
-        
-        # Prioritize messages
-        ranked_messages = prioritizer.rank(all_messages)[:5]  # Top 5
+            summary, intent_results, ranked_messages = "No messages to summarize.", [], []
         
         # Intent distribution
-        intent_dist = {}
-        for intent in intents:
-            intent_dist[intent] = intent_dist.get(intent, 0) + 1
+        intent_dist = dict(Counter(result["intent"] for result in intent_results))
+        
+        insights = key_insights(total_messages, intent_dist)
         
-        # Key insights
-        insights = []
-        if total_messages > 50:
-            insights.append("High message volume detected - may need attention")
-        if "complaint" in intent_dist and intent_dist["complaint"] > 0:
-            insights.append(f"{intent_dist['complaint']} complaint(s) require follow-up")
-        if "question" in intent_dist and intent_dist["question"] > 5:
-            insights.append("Multiple questions detected - consider FAQ or documentation")
-        if not insights:
-            insights.append("Normal activity level")
+        timings["total"] = round((time.perf_counter() - started) * 1000.0, 1)
+        logger.debug(f"Daily report stage timings (ms): {timings}")
         
         return DailyReportResponse(
             user_id=request.user_id,
@@ -304,14 +1056,41 @@ async def generate_daily_report(request: DailyReportRequest):
             summary=summary,
             priority_messages=ranked_messages,
             intent_distribution=intent_dist,
-            key_insights=insights
+            key_insights=insights,
+            timings_ms=timings
         )
         
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating daily report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
 
 
+# Incremental daily report ingestion endpoint
+@app.post("/daily-report/ingest")
+async def ingest_daily_report(request: DailyReportIngestRequest):
+    """
+    Fold new messages into the user's pre-aggregated daily reports
+    """
+    try:
+        added = await intent_pool.run(
+            report_aggregator.ingest,
+            request.user_id,
+            request.messages,
+            conversation_id=request.conversation_id,
+            date=request.date
+        )
+        return {"status": "success", "user_id": request.user_id, "messages_added": added}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error ingesting report messages: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Report ingestion failed: {str(e)}")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
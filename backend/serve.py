@@ -0,0 +1,131 @@
+"""
+Pre-fork server: load the models once, then fork workers that share them
+
+``uvicorn --workers`` starts every worker from scratch, so each process
+loads its own copy of BART and MiniLM. Here the parent loads the model
+weights (without running them), moves everything it allocated out of the
+garbage collector's reach and forks; the workers keep sharing those pages
+copy-on-write. Each worker loads the vector index itself and all of them
+accept on the same listening socket. Worker 0 is the vector store's primary
+(see ``VectorStore(shared=..., primary=...)``); a worker that dies is
+restarted under the same number.
+
+Run from backend/:
+    python serve.py --workers 4 --port 8000
+
+With one worker this is plain uvicorn.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import sys
+import time
+
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+
+def preload(app_module):
+    """Load the model weights in the parent; inference, and with it the thread pools, starts in the workers"""
+    app_module.intent_parser.ensure_loaded()
+    app_module.summarizer.ensure_loaded()
+    app_module.vector_store.load_encoder()
+
+
+def limit_threads(threads: int):
+    """Split the cores between workers instead of every worker using all of them"""
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    import faiss
+    faiss.omp_set_num_threads(threads)
+
+
+def run_worker(app_module, config: uvicorn.Config, sock, worker: int, workers: int, threads: int):
+    app_module.init_worker(worker, workers)
+    limit_threads(threads)
+    logger.info(f"Worker {worker} started (pid {os.getpid()}, {threads} threads)")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", "1")))
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=int(os.getenv("SERVE_THREADS_PER_WORKER", "0")),
+        help="torch/FAISS threads per worker (default: cores / workers)"
+    )
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run("main:app", host=args.host, port=args.port)
+        return
+
+    import main as app_module
+
+    preload(app_module)
+    # Objects created so far are never collected: the collector would
+    # otherwise write to their pages and unshare them
+    gc.collect()
+    gc.freeze()
+
+    config = uvicorn.Config(app_module.app, host=args.host, port=args.port)
+    sock = config.bind_socket()
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+
+    children = {}
+    stopping = False
+
+    def spawn(worker: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                run_worker(app_module, config, sock, worker, args.workers, threads)
+            except BaseException:
+                logger.exception(f"Worker {worker} failed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = worker
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker in range(args.workers):
+        spawn(worker)
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker = children.pop(pid, None)
+        if worker is not None and not stopping:
+            logger.warning(f"Worker {worker} (pid {pid}) exited with status {status}, restarting")
+            # Do not spin if it fails right away
+            time.sleep(1.0)
+            spawn(worker)
+
+
+if __name__ == "__main__":
+    main()